@@ -0,0 +1,426 @@
+#!/usr/bin/env python3
+"""
+Benchmark the simulated boards at the protocol level, without Webots.
+
+The board simulators are set up from the device configuration against a
+stand-in for the Webots controller module, which provides fake devices and a
+fake simulation clock. Each board link from links_formatted() is then driven by
+its own client thread replaying a mix of commands, as sr-robot3 would. Each
+board only accepts a single connection, so there is one client per board.
+
+The number of commands per second and the latency percentiles of each board are
+reported, along with the server's own command metrics, and saved as JSON so
+changes to the socket server or boards can be compared over time.
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import platform
+import socket
+import struct
+import sys
+import threading
+import time
+import types
+from datetime import datetime
+from pathlib import Path
+from typing import Any
+from urllib.parse import urlparse
+
+SIM_ROOT = Path(__file__).parents[1] / 'simulator'
+DEFAULT_CONFIG = SIM_ROOT / 'protos' / 'SR2025bot.json'
+
+# The commands sent to each type of board in each workload, the commands for a
+# board are sent in order, repeating until the end of the workload
+WORKLOADS: dict[str, dict[str, list[str]]] = {
+    'motor': {
+        'MotorBoard': ['MOT:0:SET:500', 'MOT:1:SET:-500', 'MOT:0:GET?', 'MOT:1:GET?'],
+        'ServoBoard': ['SERVO:0:SET:1500', 'SERVO:0:GET?', 'SERVO:0:SET:1000'],
+    },
+    'sensor': {
+        'Arduino': ['ucd', 'uef', 'ugh', 'uij', 'rk', 'rl', 'ao', 'ap'],
+        'PowerBoard': ['BTN:START:GET?', 'BATT:V?', 'BATT:I?'],
+        'TimeServer': ['TIME?'],
+    },
+    'camera': {
+        'CameraBoard': ['CAM:FRAME!'],
+    },
+}
+WORKLOADS['mixed'] = {
+    board_type: commands
+    for workload in list(WORKLOADS.values())
+    for board_type, commands in workload.items()
+}
+
+# The Webots device class used for each type of device in the configuration
+DEVICE_KINDS = {
+    'Motor': 'Motor',
+    'Servo': 'Motor',
+    'Led': 'LED',
+    'UltrasonicSensor': 'DistanceSensor',
+    'ReflectanceSensor': 'DistanceSensor',
+    'MicroSwitch': 'TouchSensor',
+    'PressureSensor': 'TouchSensor',
+    'Camera': 'Camera',
+    'ConnectorOutput': 'Connector',
+}
+WEBOTS_DEVICE_CLASSES = [
+    'GPS', 'LED', 'Accelerometer', 'Camera', 'Compass', 'Connector', 'DistanceSensor',
+    'Emitter', 'Gyro', 'InertialUnit', 'Lidar', 'LightSensor', 'Motor', 'PositionSensor',
+    'Radar', 'RangeFinder', 'Receiver', 'Speaker', 'TouchSensor', 'VacuumGripper',
+]
+
+
+class BenchmarkParams(argparse.Namespace):
+    """Parameters for running the benchmark."""
+
+    workloads: list[str]
+    duration: float
+    config: Path
+    resolution: tuple[int, int]
+    step_delay: float
+    output: Path | None
+
+
+def install_fake_controller(
+    config_path: Path,
+    resolution: tuple[int, int],
+    step_delay: float,
+) -> None:
+    """
+    Install a stand-in for the Webots controller module.
+
+    The devices named in the configuration are created as fake devices with
+    fixed readings. Stepping advances a fake clock without waiting, unless a
+    step delay is given to stand in for the cost of the physics.
+
+    :param config_path: The device configuration, used to find the type of each device.
+    :param resolution: The width and height of the fake camera's frames.
+    :param step_delay: The wall-clock time each simulation step takes in seconds.
+    """
+    controller = types.ModuleType('controller')
+    device_module = types.ModuleType('controller.device')
+
+    class Device:
+        def __init__(self, name: str) -> None:
+            self.name = name
+
+        def enable(self, sampling_period: int) -> None:
+            pass
+
+        def disable(self) -> None:
+            pass
+
+        def getValue(self) -> float:
+            return 0.5
+
+    class Motor(Device):
+        def setPosition(self, position: float) -> None:
+            pass
+
+        def setVelocity(self, velocity: float) -> None:
+            pass
+
+        def setAvailableTorque(self, torque: float) -> None:
+            pass
+
+        def getMaxVelocity(self) -> float:
+            return 10.0
+
+        def getMinPosition(self) -> float:
+            return -1.0
+
+        def getMaxPosition(self) -> float:
+            return 1.0
+
+        def getPositionSensor(self) -> Device:
+            return device_classes['PositionSensor'](f'{self.name} sensor')
+
+    class LED(Device):
+        def __init__(self, name: str) -> None:
+            super().__init__(name)
+            self.value = 0
+
+        def set(self, value: int) -> None:
+            self.value = value
+
+        def get(self) -> int:
+            return self.value
+
+    class Connector(Device):
+        def __init__(self, name: str) -> None:
+            super().__init__(name)
+            self.locked = False
+
+        def lock(self) -> None:
+            self.locked = True
+
+        def unlock(self) -> None:
+            self.locked = False
+
+        def isLocked(self) -> bool:
+            return self.locked
+
+    frame = bytes(resolution[0] * resolution[1] * 4)
+
+    class Camera(Device):
+        def getWidth(self) -> int:
+            return resolution[0]
+
+        def getHeight(self) -> int:
+            return resolution[1]
+
+        def getFov(self) -> float:
+            return 1.0
+
+        def getImage(self) -> bytes:
+            return frame
+
+    device_classes: dict[str, type[Device]] = {
+        name: type(name, (Device,), {}) for name in WEBOTS_DEVICE_CLASSES
+    }
+    device_classes.update(Motor=Motor, LED=LED, Connector=Connector, Camera=Camera)
+
+    device_types = {}
+    for board in json.loads(config_path.read_text())['boards']:
+        for key in ('outputs', 'motors', 'servos', 'leds', 'pins', 'camera'):
+            channels = board.get(key, [])
+            for device in channels if isinstance(channels, list) else [channels]:
+                if device is not None:
+                    device_types[device['device']] = DEVICE_KINDS[device['type']]
+
+    class Robot:
+        created: Robot | None = None
+
+        def __init__(self) -> None:
+            Robot.created = self
+            self.time = 0.0
+            self.custom_data = 'start'
+
+        def getBasicTimeStep(self) -> float:
+            return 8.0
+
+        def getTime(self) -> float:
+            return self.time
+
+        def step(self, duration: int = 8) -> int:
+            if step_delay:
+                time.sleep(step_delay)
+            self.time += duration / 1000
+            return 0
+
+        def getCustomData(self) -> str:
+            return self.custom_data
+
+        def setCustomData(self, data: str) -> None:
+            self.custom_data = data
+
+        def getDevice(self, name: str) -> Device | None:
+            if name not in device_types:
+                return None
+            return device_classes[device_types[name]](name)
+
+    for name, device_class in device_classes.items():
+        setattr(controller, name, device_class)
+    controller.Robot = Robot  # type: ignore[attr-defined]
+    controller.device = device_module  # type: ignore[attr-defined]
+    device_module.Device = Device  # type: ignore[attr-defined]
+    sys.modules['controller'] = controller
+    sys.modules['controller.device'] = device_module
+
+
+class BoardClient:
+    """
+    A client replaying a list of commands to a single board.
+
+    :param link: The board's link, as given by links_formatted().
+    :param commands: The commands to send in turn.
+    """
+
+    def __init__(self, link: str, commands: list[str]) -> None:
+        from sbot_interface.metrics import LatencyHistogram
+
+        url = urlparse(link)
+        self.board_type, self.asset_tag = url.path.strip('/').split('/')
+        self.address = (url.hostname or '127.0.0.1', url.port or 0)
+        self.commands = [f'{command}\n'.encode() for command in commands]
+        self.latency_ns = LatencyHistogram()
+        self.errors = 0
+
+    def run(self, end_time: float) -> None:
+        """Send commands until the end time, recording the latency of each."""
+        with socket.create_connection(self.address) as sock, sock.makefile('rb') as reader:
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            index = 0
+            while time.perf_counter() < end_time:
+                command = self.commands[index]
+                index = (index + 1) % len(self.commands)
+
+                start = time.perf_counter_ns()
+                sock.sendall(command)
+                if command == b'CAM:FRAME!\n':
+                    # Frames are tag-length-value encoded rather than a line
+                    _, length = struct.unpack('>BI', reader.read(5))
+                    reader.read(length)
+                elif reader.readline().startswith(b'NACK'):
+                    self.errors += 1
+                self.latency_ns.record(time.perf_counter_ns() - start)
+
+    def summary(self, duration: float) -> dict[str, Any]:
+        """Return a JSON serialisable summary of the client's commands."""
+        latency = self.latency_ns
+        return {
+            'board_type': self.board_type,
+            'commands': latency.count,
+            'commands_per_s': round(latency.count / duration, 1),
+            'errors': self.errors,
+            'latency_p50_ms': latency.percentile(50) / 1e6,
+            'latency_p99_ms': latency.percentile(99) / 1e6,
+            'latency_max_ms': latency.max / 1e6,
+        }
+
+
+def run_workload(name: str, params: BenchmarkParams) -> dict[str, Any]:
+    """
+    Run a single workload against a fresh set of board simulators.
+
+    :param name: The name of the workload to run.
+    :param params: The benchmark parameters.
+    :return: A JSON serialisable summary of the workload's results.
+    """
+    from sbot_interface.devices.util import get_globals
+    from sbot_interface.metrics import LatencyHistogram
+    from sbot_interface.setup import setup_devices
+
+    devices = setup_devices(config_path=params.config, noise_seed=0)
+    server_thread = threading.Thread(target=devices.run, name='devices')
+    server_thread.start()
+
+    workload = WORKLOADS[name]
+    clients = [
+        BoardClient(link, workload[link.split('/')[-2]])
+        for link in devices.links_formatted().splitlines()
+        if link.split('/')[-2] in workload
+    ]
+    start_time = time.perf_counter()
+    sim_start = get_globals().robot.getTime()
+    end_time = start_time + params.duration
+    client_threads = [
+        threading.Thread(target=client.run, args=(end_time,), name=client.asset_tag)
+        for client in clients
+    ]
+    for thread in client_threads:
+        thread.start()
+    for thread in client_threads:
+        thread.join()
+    duration = time.perf_counter() - start_time
+    sim_duration = get_globals().robot.getTime() - sim_start
+
+    devices.completed = True
+    devices.stop_event.set()
+    server_thread.join()
+
+    overall = LatencyHistogram()
+    for client in clients:
+        overall.merge(client.latency_ns)
+
+    result = {
+        'workload': name,
+        'duration_s': round(duration, 3),
+        'sim_duration_s': round(sim_duration, 3),
+        'commands': overall.count,
+        'commands_per_s': round(overall.count / duration, 1),
+        'latency_p50_ms': overall.percentile(50) / 1e6,
+        'latency_p99_ms': overall.percentile(99) / 1e6,
+        'latency_max_ms': overall.max / 1e6,
+        'boards': {client.asset_tag: client.summary(duration) for client in clients},
+        'server': devices.metrics_summary(),
+    }
+    print(
+        f"{name}: {result['commands']} commands in {result['duration_s']}s, "
+        f"{result['commands_per_s']} commands/s, "
+        f"p50 {result['latency_p50_ms']:0.3f}ms, p99 {result['latency_p99_ms']:0.3f}ms"
+    )
+    return result
+
+
+def run_benchmark(params: BenchmarkParams) -> dict[str, Any]:
+    """Run each of the selected workloads and return the results."""
+    install_fake_controller(params.config, params.resolution, params.step_delay)
+    sys.path.insert(0, str(SIM_ROOT / 'modules'))
+
+    return {
+        'timestamp': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'platform': f'{platform.system()}-{platform.machine()}',
+        'config': str(params.config),
+        'camera_resolution': list(params.resolution),
+        'step_delay_s': params.step_delay,
+        'results': [run_workload(name, params) for name in params.workloads],
+    }
+
+
+def parse_args() -> BenchmarkParams:
+    """Parse command line arguments."""
+    parser = argparse.ArgumentParser(
+        description="Benchmark the simulated boards without Webots.",
+    )
+    parser.add_argument(
+        '--workload',
+        action='append',
+        choices=sorted(WORKLOADS),
+        dest='workloads',
+        help="A workload to run, can be given multiple times. Defaults to all workloads.",
+    )
+    parser.add_argument(
+        '--duration',
+        type=float,
+        default=5.0,
+        help="The wall-clock duration of each workload (in seconds).",
+    )
+    parser.add_argument(
+        '--config',
+        type=Path,
+        default=DEFAULT_CONFIG,
+        help="The device configuration file to set up the boards from.",
+    )
+    parser.add_argument(
+        '--resolution',
+        type=int,
+        nargs=2,
+        default=[640, 480],
+        metavar=('width', 'height'),
+        help="The resolution of the fake camera's frames.",
+    )
+    parser.add_argument(
+        '--step-delay',
+        type=float,
+        default=0.0,
+        help=(
+            "The wall-clock time each simulation step takes (in seconds), "
+            "to stand in for the cost of the physics."
+        ),
+    )
+    parser.add_argument(
+        '--output',
+        type=Path,
+        help="The file to save the results to as JSON.",
+    )
+    params = parser.parse_args(namespace=BenchmarkParams())
+    if not params.workloads:
+        params.workloads = sorted(WORKLOADS)
+    return params
+
+
+def main() -> None:
+    """Run the benchmark entrypoint."""
+    params = parse_args()
+    results = run_benchmark(params)
+    if params.output is not None:
+        params.output.write_text(json.dumps(results, indent=4))
+        print(f"Saved results to {params.output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,449 @@
+#!/usr/bin/env python3
+"""
+Index the logs in a competition archive for fast searching.
+
+Walks the archive directory written by run_comp_match.py: the zone logs in each
+team's match-N-zone-Z.zip files, the logs in supervisor_logs/ and the match
+files in matches/. Every line of every log is added to an SQLite full text
+index, along with the team, match and zone it came from, and tracebacks are
+extracted so crashes can be listed without searching.
+
+Indexing is incremental: files that have already been indexed are skipped
+unless they have changed, so the index can be updated after each match.
+
+For example, to list the matches where team ABC's robot crashed, or search
+the logs of match 12:
+
+    index_logs.py archives crashes --team ABC
+    index_logs.py archives search '"motor board" AND timeout' --match 12
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import re
+import sqlite3
+import sys
+import zipfile
+from pathlib import Path, PurePosixPath
+from typing import Callable, Iterator, NamedTuple, TextIO
+
+sys.path.append(str(Path(__file__).parents[1] / 'simulator/modules'))
+
+from log_files import open_log, wrap_log
+
+DEFAULT_DATABASE_NAME = 'log_index.sqlite'
+
+ZONE_ARCHIVE_RE = re.compile(r'match-(\d+)-zone-(\d+)\.zip')
+ZONE_LOG_RE = re.compile(r'log-zone-\d+-.*\.(txt|jsonl)(\.gz|\.xz)?')
+SUPERVISOR_LOG_RE = re.compile(r'supervisor-log-match-(\d+)(\.\d+)?\.(txt|jsonl)(\.gz|\.xz)?')
+# The prefix of each line of the text logs, '[zone| time] ' or '[time] ' for the supervisor
+PREFIX_RE = re.compile(r'\[(?:\d+\| )?\s*(-?[\d.]+)\] ')
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS sources (
+    path TEXT PRIMARY KEY,
+    mtime_ns INTEGER NOT NULL,
+    size INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS matches (
+    match INTEGER PRIMARY KEY,
+    source TEXT NOT NULL,
+    data TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS logs (
+    id INTEGER PRIMARY KEY,
+    source TEXT NOT NULL,
+    member TEXT,
+    team TEXT,
+    match INTEGER,
+    zone INTEGER,
+    num_lines INTEGER NOT NULL,
+    last_sim_time REAL
+);
+CREATE INDEX IF NOT EXISTS logs_by_team ON logs (team, match, zone);
+CREATE TABLE IF NOT EXISTS tracebacks (
+    log_id INTEGER NOT NULL REFERENCES logs (id),
+    line INTEGER NOT NULL,
+    sim_time REAL,
+    exception TEXT NOT NULL,
+    traceback TEXT NOT NULL
+);
+CREATE VIRTUAL TABLE IF NOT EXISTS lines USING fts5(
+    text,
+    log_id UNINDEXED,
+    line UNINDEXED,
+    sim_time UNINDEXED
+);
+'''
+
+
+class LogSource(NamedTuple):
+    """A log file to index and where it came from."""
+
+    team: str | None
+    match: int
+    zone: int | None
+
+
+class Traceback(NamedTuple):
+    """A traceback found in a log."""
+
+    line: int
+    sim_time: float | None
+    exception: str
+    text: str
+
+
+def parse_lines(log_file: TextIO, structured: bool) -> Iterator[tuple[float | None, str]]:
+    """
+    Get the simulated time and text of each line of a log.
+
+    :param log_file: The log to read.
+    :param structured: Whether the log contains JSON records rather than text.
+    """
+    sim_time: float | None = None
+    for line in log_file:
+        if structured:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                record = None
+            if isinstance(record, dict) and 'text' in record:
+                sim_time = record.get('sim')
+                line = record['text']
+        elif match := PREFIX_RE.match(line):
+            sim_time = float(match.group(1))
+            line = line[match.end():]
+        yield sim_time, line.rstrip('\n')
+
+
+class TracebackFinder:
+    """Finds the tracebacks printed in a log, fed a line at a time."""
+
+    def __init__(self) -> None:
+        self._current: list[str] = []
+        self._start: tuple[int, float | None] = (0, None)
+
+    def feed(self, number: int, sim_time: float | None, text: str) -> Traceback | None:
+        """
+        Add the next line of the log.
+
+        :param number: The line number.
+        :param sim_time: The simulated time of the line.
+        :param text: The text of the line.
+        :return: The traceback this line completes, if any.
+        """
+        if text.startswith('Traceback (most recent call last):'):
+            self._current = [text]
+            self._start = (number, sim_time)
+        elif self._current:
+            self._current.append(text)
+            if text and not text[0].isspace():
+                # The exception ends the traceback
+                traceback = Traceback(*self._start, text, '\n'.join(self._current))
+                self._current = []
+                return traceback
+        return None
+
+
+class LogIndex:
+    """
+    An SQLite full text index of the logs in an archive.
+
+    :param archives_dir: The archive directory written by run_comp_match.py.
+    :param database: The SQLite database to store the index in.
+    """
+
+    def __init__(self, archives_dir: Path, database: Path) -> None:
+        self.archives_dir = archives_dir
+        self.connection = sqlite3.connect(database)
+        try:
+            self.connection.executescript(SCHEMA)
+        except sqlite3.OperationalError as e:
+            raise RuntimeError(
+                f"Failed to create the index, SQLite may lack FTS5 support: {e}") from e
+
+    def close(self) -> None:
+        """Close the database."""
+        self.connection.close()
+
+    def update(self) -> int:
+        """
+        Index the files in the archive that are new or have changed.
+
+        :return: The number of files indexed.
+        """
+        indexed = 0
+        for path, indexer in self._archive_files():
+            if self._is_current(path):
+                continue
+            print(f"Indexing {path.relative_to(self.archives_dir)}")
+            with self.connection:
+                self._remove(path)
+                indexer(path)
+                self._mark_current(path)
+            indexed += 1
+        return indexed
+
+    def _archive_files(self) -> Iterator[tuple[Path, Callable[[Path], None]]]:
+        matches_dir = self.archives_dir / 'matches'
+        for path in sorted(matches_dir.glob('*.yaml')):
+            yield path, self._index_match_file
+
+        for path in sorted((self.archives_dir / 'supervisor_logs').glob('*')):
+            if SUPERVISOR_LOG_RE.fullmatch(path.name):
+                yield path, self._index_supervisor_log
+
+        for team_dir in sorted(self.archives_dir.iterdir()):
+            if not team_dir.is_dir():
+                continue
+            for path in sorted(team_dir.glob('match-*-zone-*.zip')):
+                if ZONE_ARCHIVE_RE.fullmatch(path.name):
+                    yield path, self._index_zone_archive
+
+    def _key(self, path: Path) -> str:
+        return path.relative_to(self.archives_dir).as_posix()
+
+    def _is_current(self, path: Path) -> bool:
+        stat = path.stat()
+        row = self.connection.execute(
+            'SELECT mtime_ns, size FROM sources WHERE path = ?', (self._key(path),),
+        ).fetchone()
+        return row is not None and tuple(row) == (stat.st_mtime_ns, stat.st_size)
+
+    def _mark_current(self, path: Path) -> None:
+        stat = path.stat()
+        self.connection.execute(
+            'INSERT OR REPLACE INTO sources (path, mtime_ns, size) VALUES (?, ?, ?)',
+            (self._key(path), stat.st_mtime_ns, stat.st_size),
+        )
+
+    def _remove(self, path: Path) -> None:
+        key = self._key(path)
+        log_ids = 'SELECT id FROM logs WHERE source = ?'
+        self.connection.execute(f'DELETE FROM lines WHERE log_id IN ({log_ids})', (key,))
+        self.connection.execute(f'DELETE FROM tracebacks WHERE log_id IN ({log_ids})', (key,))
+        self.connection.execute('DELETE FROM logs WHERE source = ?', (key,))
+        self.connection.execute('DELETE FROM matches WHERE source = ?', (key,))
+
+    def _index_match_file(self, path: Path) -> None:
+        text = path.read_text()
+        try:
+            match_number = int(json.loads(text)['match_number'])
+        except (ValueError, KeyError, TypeError):
+            # Fall back to the file name, the file may have been edited as YAML
+            try:
+                match_number = int(path.stem)
+            except ValueError:
+                print(f"Skipping {path.name}, failed to find its match number")
+                return
+        self.connection.execute(
+            'INSERT OR REPLACE INTO matches (match, source, data) VALUES (?, ?, ?)',
+            (match_number, self._key(path), text),
+        )
+
+    def _index_supervisor_log(self, path: Path) -> None:
+        match = SUPERVISOR_LOG_RE.fullmatch(path.name)
+        assert match is not None
+        with open_log(path) as log_file:
+            self._index_log(
+                log_file, path, None, LogSource(None, int(match.group(1)), None))
+
+    def _index_zone_archive(self, path: Path) -> None:
+        match = ZONE_ARCHIVE_RE.fullmatch(path.name)
+        assert match is not None
+        source = LogSource(path.parent.name, int(match.group(1)), int(match.group(2)))
+        with zipfile.ZipFile(path) as archive:
+            for member in archive.namelist():
+                name = PurePosixPath(member).name
+                if not ZONE_LOG_RE.fullmatch(name):
+                    continue
+                with archive.open(member) as raw, wrap_log(raw, name) as log_file:
+                    self._index_log(log_file, path, member, source)
+
+    def _index_log(
+        self,
+        log_file: TextIO,
+        path: Path,
+        member: str | None,
+        source: LogSource,
+    ) -> None:
+        cursor = self.connection.execute(
+            'INSERT INTO logs (source, member, team, match, zone, num_lines) '
+            'VALUES (?, ?, ?, ?, ?, 0)',
+            (self._key(path), member, source.team, source.match, source.zone),
+        )
+        log_id = cursor.lastrowid
+        structured = '.jsonl' in (member or path.name)
+
+        # Stream the lines into the index, collecting the tracebacks and totals on the way
+        finder = TracebackFinder()
+        tracebacks: list[Traceback] = []
+        num_lines = 0
+        last_sim_time: float | None = None
+
+        def rows() -> Iterator[tuple[str, int | None, int, float | None]]:
+            nonlocal num_lines, last_sim_time
+            for number, (sim_time, text) in enumerate(parse_lines(log_file, structured), 1):
+                num_lines = number
+                if sim_time is not None:
+                    last_sim_time = sim_time
+                traceback = finder.feed(number, sim_time, text)
+                if traceback is not None:
+                    tracebacks.append(traceback)
+                yield text, log_id, number, sim_time
+
+        self.connection.executemany(
+            'INSERT INTO lines (text, log_id, line, sim_time) VALUES (?, ?, ?, ?)',
+            rows(),
+        )
+        self.connection.executemany(
+            'INSERT INTO tracebacks (log_id, line, sim_time, exception, traceback) '
+            'VALUES (?, ?, ?, ?, ?)',
+            ((log_id, *traceback) for traceback in tracebacks),
+        )
+        self.connection.execute(
+            'UPDATE logs SET num_lines = ?, last_sim_time = ? WHERE id = ?',
+            (num_lines, last_sim_time, log_id),
+        )
+
+    def search(
+        self,
+        query: str,
+        team: str | None = None,
+        match: int | None = None,
+        zone: int | None = None,
+        limit: int = 50,
+    ) -> list[sqlite3.Row]:
+        """
+        Search the log lines using an FTS5 query.
+
+        :param query: The FTS5 query, such as 'motor AND timeout' or '"exact phrase"'.
+        :param team: Only return lines from this team's logs.
+        :param match: Only return lines from this match.
+        :param zone: Only return lines from this zone.
+        :param limit: The maximum number of lines to return.
+        :return: The matching lines, ordered by match, zone and line.
+        """
+        self.connection.row_factory = sqlite3.Row
+        return self.connection.execute(
+            'SELECT logs.team, logs.match, logs.zone, lines.line, lines.sim_time, lines.text '
+            'FROM lines JOIN logs ON logs.id = lines.log_id '
+            'WHERE lines MATCH :query '
+            'AND (:team IS NULL OR logs.team = :team) '
+            'AND (:match IS NULL OR logs.match = :match) '
+            'AND (:zone IS NULL OR logs.zone = :zone) '
+            'ORDER BY logs.match, logs.zone, logs.id, lines.line LIMIT :limit',
+            {'query': query, 'team': team, 'match': match, 'zone': zone, 'limit': limit},
+        ).fetchall()
+
+    def crashes(self, team: str | None = None, match: int | None = None) -> list[sqlite3.Row]:
+        """
+        List the zone logs containing a traceback, with the first exception in each.
+
+        :param team: Only list this team's crashes.
+        :param match: Only list crashes in this match.
+        :return: The logs with tracebacks, ordered by match and zone.
+        """
+        self.connection.row_factory = sqlite3.Row
+        return self.connection.execute(
+            'SELECT logs.team, logs.match, logs.zone, '
+            'MIN(tracebacks.sim_time) AS sim_time, tracebacks.exception, '
+            'COUNT(*) AS tracebacks '
+            'FROM tracebacks JOIN logs ON logs.id = tracebacks.log_id '
+            'WHERE logs.zone IS NOT NULL '
+            'AND (:team IS NULL OR logs.team = :team) '
+            'AND (:match IS NULL OR logs.match = :match) '
+            'GROUP BY logs.team, logs.match, logs.zone '
+            'ORDER BY logs.match, logs.zone',
+            {'team': team, 'match': match},
+        ).fetchall()
+
+
+def format_location(row: sqlite3.Row) -> str:
+    """Describe where a log line came from."""
+    if row['zone'] is None:
+        return f"match-{row['match']} supervisor"
+    return f"match-{row['match']} zone {row['zone']} ({row['team']})"
+
+
+def format_time(sim_time: float | None) -> str:
+    """Format a simulated time, which may not be known."""
+    return '?' if sim_time is None else f'{sim_time:0.3f}'
+
+
+def parse_args() -> argparse.Namespace:
+    """Parse command line arguments."""
+    parser = argparse.ArgumentParser(
+        description="Index the logs in a competition archive and search them.",
+    )
+    parser.add_argument(
+        'archives_dir',
+        type=Path,
+        help="The archive directory written by run_comp_match.py.",
+    )
+    parser.add_argument(
+        '--database',
+        type=Path,
+        help=f"The index database, defaults to {DEFAULT_DATABASE_NAME} in the archives.",
+    )
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    subparsers.add_parser('index', help="Index new and changed files in the archive.")
+
+    search = subparsers.add_parser('search', help="Search the indexed log lines.")
+    search.add_argument('query', help="An SQLite FTS5 query, such as 'motor AND timeout'.")
+    search.add_argument('--team', help="Only search this team's logs.")
+    search.add_argument('--match', type=int, help="Only search this match.")
+    search.add_argument('--zone', type=int, help="Only search this zone.")
+    search.add_argument('--limit', type=int, default=50, help="The maximum lines to show.")
+
+    crashes = subparsers.add_parser('crashes', help="List the matches where robots crashed.")
+    crashes.add_argument('--team', help="Only list this team's crashes.")
+    crashes.add_argument('--match', type=int, help="Only list crashes in this match.")
+
+    for subparser in (search, crashes):
+        subparser.add_argument(
+            '--no-update',
+            action='store_false',
+            dest='update',
+            help="Don't index new files in the archive first.",
+        )
+    return parser.parse_args()
+
+
+def main() -> None:
+    """Run the log indexer."""
+    args = parse_args()
+    database = args.database or args.archives_dir / DEFAULT_DATABASE_NAME
+    index = LogIndex(args.archives_dir, database)
+
+    try:
+        if args.command == 'index' or args.update:
+            indexed = index.update()
+            if args.command == 'index':
+                print(f"Indexed {indexed} new or changed files")
+
+        if args.command == 'search':
+            try:
+                rows = index.search(args.query, args.team, args.match, args.zone, args.limit)
+            except sqlite3.OperationalError as e:
+                sys.exit(f"Invalid search query: {e}")
+            for row in rows:
+                print(
+                    f"{format_location(row)} line {row['line']} "
+                    f"[{format_time(row['sim_time'])}] {row['text']}"
+                )
+        elif args.command == 'crashes':
+            for row in index.crashes(args.team, args.match):
+                print(
+                    f"{format_location(row)} at {format_time(row['sim_time'])}s: "
+                    f"{row['exception']} ({row['tracebacks']} tracebacks)"
+                )
+    finally:
+        index.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+"""
+Render structured simulator logs as text, merging multiple logs by time.
+
+When WEBOTS_LOG_FORMAT is set to 'jsonl', the robot and supervisor logs are
+written as JSON records, one per line, holding the simulated and wall-clock
+time, zone, stream and text of each line of output. This renders those records
+in the same format as the text logs. Given multiple logs, such as every zone of
+a match and the supervisor, the records are merged in order of simulated time.
+
+Lines that aren't records, such as a traceback written by a hard crash, are
+rendered as they are, at the time of the record before them. Rotated and
+compressed logs are read across all of their segments.
+"""
+from __future__ import annotations
+
+import argparse
+import heapq
+import json
+import sys
+from pathlib import Path
+from typing import Any, Iterable, Iterator, TextIO
+
+sys.path.append(str(Path(__file__).parents[1] / 'simulator/modules'))
+
+from log_files import read_log
+
+
+def read_records(path: Path) -> Iterator[dict[str, Any]]:
+    """
+    Read the records from a structured log file.
+
+    :param path: The log file to read, or the compressed log itself.
+    :return: An iterator of the records in the file, in the order they were written.
+    """
+    sim_time = wall_time = 0.0
+    for line in read_log(path):
+        try:
+            record = json.loads(line)
+        except json.JSONDecodeError:
+            record = None
+        if not isinstance(record, dict) or 'text' not in record:
+            record = {
+                'sim': sim_time,
+                'wall': wall_time,
+                'zone': None,
+                'stream': 'raw',
+                'text': line,
+            }
+        sim_time, wall_time = record['sim'], record['wall']
+        yield record
+
+
+def merge_records(logs: Iterable[Iterator[dict[str, Any]]]) -> Iterable[dict[str, Any]]:
+    """
+    Merge the records of multiple logs in order of simulated time.
+
+    Each log is already in order, so records at the same simulated time are
+    ordered by wall-clock time, and records from the same log keep their order.
+    """
+    return heapq.merge(*logs, key=lambda record: (record['sim'], record['wall']))
+
+
+def format_prefix(record: dict[str, Any]) -> str:
+    """Get the prefix the text logs use for a record's line."""
+    if record['zone'] is None:
+        return f"[{record['sim']:0.3f}] "
+    return f"[{record['zone']}| {record['sim']:0.3f}] "
+
+
+def render_records(records: Iterable[dict[str, Any]], output: TextIO) -> None:
+    """
+    Write records in the format of the text logs.
+
+    :param records: The records to render.
+    :param output: The stream to write the text to.
+    """
+    line_start = True
+    source = None
+    for record in records:
+        record_source = (record['zone'], record['stream'])
+        if not line_start and record_source != source:
+            # Don't continue another stream's partial line
+            output.write('\n')
+            line_start = True
+        source = record_source
+
+        text = record['text']
+        if record['stream'] != 'raw' and line_start:
+            text = format_prefix(record) + text
+        output.write(text)
+        line_start = text.endswith('\n')
+
+    if not line_start:
+        output.write('\n')
+
+
+def main() -> None:
+    """Render the given structured logs."""
+    parser = argparse.ArgumentParser(
+        description="Render structured simulator logs as text, merging them by time.",
+    )
+    parser.add_argument(
+        'logs',
+        type=Path,
+        nargs='+',
+        help="The .jsonl log files to render.",
+    )
+    parser.add_argument(
+        '--output',
+        type=Path,
+        help="The file to write the rendered log to, defaults to stdout.",
+    )
+    args = parser.parse_args()
+
+    records = merge_records(read_records(path) for path in args.logs)
+    if args.output is None:
+        render_records(records, sys.stdout)
+    else:
+        with args.output.open('w') as output:
+            render_records(records, output)
+
+
+if __name__ == '__main__':
+    main()
@@ -10,16 +10,21 @@ import subprocess
 import sys
 from pathlib import Path
 from tempfile import TemporaryDirectory
-from zipfile import ZipFile
+from zipfile import ZIP_DEFLATED, ZIP_STORED, ZipFile
 
 if (Path(__file__).parents[1] / 'simulator/VERSION').exists():
     # Running in release mode, run_simulator will be in folder above
     sys.path.append(str(Path(__file__).parents[1]))
+sys.path.append(str(Path(__file__).parents[1] / 'simulator/modules'))
 
+from log_files import COMPRESSION_SUFFIXES, compress_log
 from run_simulator import get_webots_parameters
 
 NUM_ZONES = 4
 GAME_DURATION_SECONDS = 150
+LOG_COMPRESSION_CHOICES = (*COMPRESSION_SUFFIXES, 'none')
+# Files that are already compressed, so are stored in the zone archives as they are
+COMPRESSED_SUFFIXES = (*COMPRESSION_SUFFIXES.values(), '.zip', '.mp4', '.jpg', '.png')
 
 
 class MatchParams(argparse.Namespace):
@@ -31,6 +36,7 @@ class MatchParams(argparse.Namespace):
     duration: int
     video_enabled: bool
     video_resolution: tuple[int, int]
+    log_compression: str
 
 
 def load_team_code(
@@ -83,16 +89,32 @@ def set_comp_mode(arena_root: Path) -> None:
     (arena_root / 'mode.txt').write_text('comp')
 
 
+def compress_logs(directory: Path, pattern: str, log_compression: str) -> None:
+    """Compress the uncompressed log files in a directory that match a glob pattern."""
+    if log_compression == 'none':
+        return
+    for log_file in directory.glob(pattern):
+        if log_file.suffix in ('.txt', '.jsonl'):
+            compress_log(log_file, log_compression)
+
+
 def archive_zone_files(
     team_archives_dir: Path,
     arena_root: Path,
     zone: int,
     match_id: str,
+    log_compression: str = 'gzip',
 ) -> None:
     """Zip the files in the zone directory and save them to the team archives directory."""
     zone_dir = arena_root / f'zone_{zone}'
+    compress_logs(zone_dir, 'log-zone-*', log_compression)
 
-    shutil.make_archive(str(team_archives_dir / f'{match_id}-zone-{zone}'), 'zip', zone_dir)
+    archive = team_archives_dir / f'{match_id}-zone-{zone}.zip'
+    with ZipFile(archive, 'w', ZIP_DEFLATED) as zipfile:
+        for path in sorted(zone_dir.rglob('*')):
+            # Compressing already compressed files again only costs time
+            compress_type = ZIP_STORED if path.suffix in COMPRESSED_SUFFIXES else ZIP_DEFLATED
+            zipfile.write(path, path.relative_to(zone_dir), compress_type=compress_type)
 
 
 def archive_zone_folders(
@@ -100,6 +122,7 @@ def archive_zone_folders(
     arena_root: Path,
     teams: list[str],
     match_id: str,
+    log_compression: str = 'gzip',
 ) -> None:
     """Zip the zone folders and save them to the archives directory."""
     for zone_id, tla in enumerate(teams):
@@ -110,7 +133,7 @@ def archive_zone_folders(
         tla_dir = archives_dir / tla
         tla_dir.mkdir(exist_ok=True)
 
-        archive_zone_files(tla_dir, arena_root, zone_id, match_id)
+        archive_zone_files(tla_dir, arena_root, zone_id, match_id, log_compression)
 
 
 def archive_match_recordings(archives_dir: Path, arena_root: Path, match_id: str) -> None:
@@ -144,6 +167,11 @@ def archive_match_recordings(archives_dir: Path, arena_root: Path, match_id: str
     image_file = match_recordings / f'{match_id}.jpg'
     shutil.copy(image_file, recordings_dir)
 
+    # Copy the recorded poses of the robots and tokens
+    poses_file = match_recordings / f'{match_id}-poses.npy'
+    if poses_file.exists():
+        shutil.copy(poses_file, recordings_dir)
+
 
 def archive_match_file(archives_dir: Path, match_file: Path, match_number: int) -> None:
     """
@@ -160,14 +188,20 @@ def archive_match_file(archives_dir: Path, match_file: Path, match_number: int)
     shutil.copy(match_file, completed_match_file)
 
 
-def archive_supervisor_log(archives_dir: Path, arena_root: Path, match_id: str) -> None:
-    """Archive the supervisor log file."""
+def archive_supervisor_log(
+    archives_dir: Path,
+    arena_root: Path,
+    match_id: str,
+    log_compression: str = 'gzip',
+) -> None:
+    """Archive the supervisor log file, along with any rotated segments of it."""
     log_archive_dir = archives_dir / 'supervisor_logs'
     log_archive_dir.mkdir(exist_ok=True)
 
-    log_file = arena_root / f'supervisor-log-{match_id}.txt'
-
-    shutil.copy(log_file, log_archive_dir)
+    # The log is either text or, if structured logs are enabled, JSON lines
+    compress_logs(arena_root, f'supervisor-log-{match_id}.*', log_compression)
+    for log_file in arena_root.glob(f'supervisor-log-{match_id}.*'):
+        shutil.copy(log_file, log_archive_dir)
 
 
 def execute_match(arena_root: Path) -> None:
@@ -204,6 +238,7 @@ def run_match(match_parameters: MatchParams) -> None:
         match_num = match_parameters.match_num
         match_id = f'match-{match_num}'
         archives_dir = match_parameters.archives_dir
+        log_compression = match_parameters.log_compression
 
         # unzip teams code into zone_N folders under this folder
         load_team_code(archives_dir, arena_root, match_parameters)
@@ -219,13 +254,14 @@ def run_match(match_parameters: MatchParams) -> None:
         except (FileNotFoundError, RuntimeError) as e:
             print(f"Failed to run match: {e}")
             # Save the supervisor log as it may contain useful information
-            archive_supervisor_log(archives_dir, arena_root, match_id)
+            archive_supervisor_log(archives_dir, arena_root, match_id, log_compression)
             raise
 
         # Archive the supervisor log first in case any collation fails
-        archive_supervisor_log(archives_dir, arena_root, match_id)
+        archive_supervisor_log(archives_dir, arena_root, match_id, log_compression)
         # Zip up and collect all files for each zone
-        archive_zone_folders(archives_dir, arena_root, match_parameters.teams, match_id)
+        archive_zone_folders(
+            archives_dir, arena_root, match_parameters.teams, match_id, log_compression)
         # Collect video, animation & image
         archive_match_recordings(archives_dir, arena_root, match_id)
         # Collect ancillary files
@@ -285,6 +321,12 @@ def parse_args() -> MatchParams:
         metavar=('width', 'height'),
         dest='video_resolution',
     )
+    parser.add_argument(
+        '--log-compression',
+        help="How to compress the archived log files.",
+        choices=LOG_COMPRESSION_CHOICES,
+        default='gzip',
+    )
     return parser.parse_args(namespace=MatchParams())
 
 
@@ -0,0 +1,52 @@
+#!/usr/bin/env python3
+"""
+Print the end of a simulator log, optionally following it as it is written.
+
+Logs are rotated as they grow, with the older segments compressed, and are
+compressed when matches are archived. This reads across all of a log's
+segments, whichever compression they use, and follows the log across rotations.
+"""
+from __future__ import annotations
+
+import argparse
+import sys
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parents[1] / 'simulator/modules'))
+
+from log_files import tail_log
+
+
+def main() -> None:
+    """Print the end of the given log."""
+    parser = argparse.ArgumentParser(
+        description="Print the end of a simulator log, including rotated and compressed logs.",
+    )
+    parser.add_argument(
+        'log',
+        type=Path,
+        help="The log file, as it was written, or the compressed log.",
+    )
+    parser.add_argument(
+        '-n', '--lines',
+        type=int,
+        default=10,
+        help="The number of lines to print from the end of the log.",
+    )
+    parser.add_argument(
+        '-f', '--follow',
+        action='store_true',
+        help="Continue printing lines as they are written.",
+    )
+    args = parser.parse_args()
+
+    try:
+        for line in tail_log(args.log, args.lines, follow=args.follow):
+            sys.stdout.write(line)
+            sys.stdout.flush()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
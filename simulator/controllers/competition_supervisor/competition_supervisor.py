@@ -1,26 +1,48 @@
 """."""
 from __future__ import annotations
 
+import json
+import math
+import os
 import sys
 import time
 from contextlib import contextmanager
 from pathlib import Path
-from typing import Iterator
+from typing import Any, Iterator, Mapping
 
 from controller import Supervisor
 
 # Robot constructor lacks a return type annotation in R2023b
 sys.path.insert(0, Supervisor().getProjectPath())  # type: ignore[no-untyped-call]
 import environment  # configure path to include modules
+from event_schedule import EventSchedule
 from lighting_control import LightingControl
-from robot_logging import get_match_identifier, prefix_and_tee_streams
-from robot_utils import get_game_mode, get_match_data, get_robot_file
+from pose_recorder import PoseRecorder, pose_period, pose_rate_from_env, start_pose_recording
+from resource_sampler import summarise_resources
+from robot_logging import (
+    get_match_identifier,
+    log_records_from_env,
+    prefix_and_tee_streams,
+)
+from robot_utils import get_game_mode, get_match_data, get_robot_file, update_match_file
+from scoring import (
+    Scorer,
+    find_tokens,
+    live_scoring,
+    load_arena_grid,
+    scoring_interval_from_env,
+)
+from speed_monitor import SpeedMonitor
 
 # Get the robot object that was created when setting up the environment
 _robot = Supervisor.created
 assert _robot is not None, "Robot object not created"
 supervisor: Supervisor = _robot  # type: ignore[assignment]
 
+# The simulated time allowed for each robot to reach wait_start(). Controllers
+# start at the same time and compete for the host, so this scales with the robots.
+READY_TIMEOUT_PER_ROBOT = 5.0
+
 
 class RobotData:
     """Data about a robot in the arena."""
@@ -31,6 +53,8 @@ class RobotData:
         self.robot = supervisor.getFromDef(f'ROBOT{zone}')
         if self.robot is None:
             raise ValueError(f"Failed to get Webots node for zone {zone}")
+        # Look up the field once, it is read every step while waiting for the robot
+        self._custom_data = self.robot.getField('customData')  # type: ignore[attr-defined]
 
     def zone_occupied(self) -> bool:
         """Check if this zone has a robot.py file associated with it."""
@@ -46,15 +70,48 @@ class RobotData:
 
     def preset_robot(self) -> None:
         """Arm the robot so that it waits for the start signal."""
-        self.robot.getField('customData').setSFString('prestart')  # type: ignore[attr-defined]
+        self._custom_data.setSFString('prestart')
 
     def robot_ready(self) -> bool:
         """Check if robot has set its pre-start flag."""
-        return bool(self.robot.getField('customData').getSFString() == 'ready')  # type: ignore[attr-defined]
+        return bool(self._custom_data.getSFString() == 'ready')
 
     def start_robot(self) -> None:
         """Signal to the robot that the start button has been pressed."""
-        self.robot.getField('customData').setSFString('start')  # type: ignore[attr-defined]
+        self._custom_data.setSFString('start')
+
+    def _zone_file(self, prefix: str, suffix: str) -> Path:
+        """Get the path of a file written by the robot's controller alongside its log."""
+        return (
+            get_robot_file(self.zone).parent
+            / f'{prefix}-zone-{self.zone}-{get_match_identifier()}{suffix}'
+        )
+
+    def stall_summary(self) -> dict[str, Any] | None:
+        """
+        Load the summary of the time the robot's controller spent between steps.
+
+        The robot's controller periodically writes this alongside its log.
+        """
+        try:
+            summary: dict[str, Any] = json.loads(
+                self._zone_file('stalls', '.json').read_text())
+        except (OSError, ValueError) as e:
+            print(f"Failed to load stall summary for zone {self.zone}: {e}")
+            return None
+        return summary
+
+    def resource_summary(self) -> dict[str, Any] | None:
+        """
+        Summarise the resources used by the robot's controller process.
+
+        The robot's controller samples these into a CSV file alongside its log.
+        """
+        try:
+            return summarise_resources(self._zone_file('resources', '.csv'))
+        except (OSError, ValueError) as e:
+            print(f"Failed to load resource usage for zone {self.zone}: {e}")
+            return None
 
 
 class Robots:
@@ -84,29 +141,50 @@ class Robots:
             robot.preset_robot()
 
     def wait_for_ready(self, timeout: float) -> None:
-        """Wait for all robots to set their pre-start flags."""
-        end_time = supervisor.getTime() + timeout
-        while supervisor.getTime() < end_time:
-            all_ready = True
-            # Sleep in individual timesteps to allow the robots to update
-            supervisor.step()
-
-            for zone, robot in self.robots.items():
-                if not robot.registered_ready:
-                    if robot.robot_ready():
-                        print(f"Robot in zone {zone} is ready.")
-                        # Log only once per robot when ready
-                        robot.registered_ready = True
-                    else:
-                        all_ready = False
-            if all_ready:
+        """
+        Wait for all robots to set their pre-start flags.
+
+        Each robot is reported as soon as it is seen to be ready, and only the
+        robots that aren't yet ready are checked after each step. The checks and
+        the deadline are run from an event schedule, as during the match.
+        """
+        pending = {
+            zone: robot
+            for zone, robot in self.robots.items()
+            if not robot.registered_ready
+        }
+        timed_out = False
+
+        def check_ready(timestep: int) -> int | None:
+            for zone, robot in list(pending.items()):
+                if robot.robot_ready():
+                    print(f"Robot in zone {zone} is ready.")
+                    robot.registered_ready = True
+                    del pending[zone]
+            # Check in individual timesteps to allow the robots to update
+            return timestep + 1 if pending else None
+
+        def deadline(_: int) -> None:
+            nonlocal timed_out
+            timed_out = True
+
+        time_step = int(supervisor.getBasicTimeStep())
+        schedule = EventSchedule()
+        schedule.add(1, 'ready check', check_ready)
+        schedule.add(max(math.ceil(timeout * 1000 / time_step), 1), 'ready deadline', deadline)
+
+        current_step = 0
+        while pending and not timed_out:
+            next_step = schedule.next_timestep()
+            assert next_step is not None, "The deadline is always scheduled"
+            if supervisor.step((next_step - current_step) * time_step) == -1:
+                # Webots is exiting
                 break
-        else:
-            pending_robots = ', '.join([
-                str(zone)
-                for zone, robot in self.robots.items()
-                if not robot.robot_ready()
-            ])
+            current_step = next_step
+            schedule.run_due(current_step)
+
+        if pending:
+            pending_robots = ', '.join(str(zone) for zone in pending)
             raise TimeoutError(
                 f"Robots in zones {pending_robots} failed to initialise. "
                 f"Failed to reach wait_start() within {timeout} seconds."
@@ -117,6 +195,77 @@ class Robots:
         for robot in self.robots.values():
             robot.start_robot()
 
+    def stall_summaries(self) -> dict[str, dict[str, Any]]:
+        """
+        Load and print which robots held up the simulation.
+
+        Webots only advances once every controller has stepped, so the time a
+        controller spends between steps is time the whole arena may wait for it.
+        """
+        summaries: dict[str, dict[str, Any]] = {}
+        for zone, robot in self.robots.items():
+            summary = robot.stall_summary()
+            if summary is not None:
+                summaries[str(zone)] = summary
+
+        ranked = sorted(
+            summaries.items(),
+            key=lambda item: item[1]['stall_total_s'],
+            reverse=True,
+        )
+        for zone_name, summary in ranked:
+            print(
+                f"Zone {zone_name} held up the simulation for {summary['stall_total_s']}s "
+                f"in {summary['stalls']} stalls, longest {summary['longest_ms']:0.1f}ms "
+                f"at {summary['longest_at_sim_time_s']}s "
+                f"({summary['between_steps_total_s']}s between steps in total)"
+            )
+        if ranked and ranked[0][1]['stalls'] > 0:
+            print(f"Zone {ranked[0][0]} stalled the simulation the most")
+        return summaries
+
+    def resource_summaries(self) -> dict[str, dict[str, Any]]:
+        """Load and print the resources used by each robot's controller process."""
+        summaries: dict[str, dict[str, Any]] = {}
+        for zone, robot in self.robots.items():
+            summary = robot.resource_summary()
+            if summary is None:
+                continue
+            summaries[str(zone)] = summary
+            print(
+                f"Zone {zone} used {summary['cpu_s']}s of CPU "
+                f"(mean {summary['mean_cpu_percent']}%, peak {summary['peak_cpu_percent']}%), "
+                f"peak memory {summary['peak_rss_mb']}MB, {summary['max_threads']} threads, "
+                f"{summary['gc_collections']} GC collections "
+                f"pausing {summary['gc_pause_ms']:0.1f}ms"
+            )
+        return summaries
+
+
+def ready_timeout(num_robots: int) -> float:
+    """
+    Get the time to wait for the robots to be ready, in simulated seconds.
+
+    This is set by WEBOTS_READY_TIMEOUT, otherwise it is scaled to the number of robots.
+
+    :param num_robots: The number of robots in the arena.
+    """
+    default = READY_TIMEOUT_PER_ROBOT * max(num_robots, 1)
+    timeout = os.environ.get('WEBOTS_READY_TIMEOUT')
+    if not timeout:
+        return default
+    try:
+        value = float(timeout)
+    except ValueError:
+        value = 0
+    if value <= 0:
+        print(
+            f"Ignoring invalid WEBOTS_READY_TIMEOUT value {timeout!r}, "
+            f"expected a positive number of seconds, using {default}s"
+        )
+        return default
+    return value
+
 
 def is_dev_mode() -> bool:
     """Load the mode file and check if we are in dev mode."""
@@ -175,23 +324,102 @@ def save_image(filename: Path) -> None:
     supervisor.exportImage(str(filename), 100)
 
 
+def schedule_match(
+    match_timesteps: int,
+    lighting_control: LightingControl,
+    speed_monitor: SpeedMonitor,
+    scorer: Scorer | None = None,
+    scoring_interval: float | None = None,
+    pose_recorder: PoseRecorder | None = None,
+    pose_timesteps: int = 1,
+) -> EventSchedule:
+    """
+    Schedule the events that happen during the match.
+
+    :param match_timesteps: The number of timesteps in the match.
+    :param lighting_control: The lighting to service at each lighting cue.
+    :param speed_monitor: The monitor to sample at the end of each of its windows.
+    :param scorer: The scorer to sample during the match.
+    :param scoring_interval: The simulated seconds between each live score sample,
+        or None to only score the end of the match.
+    :param pose_recorder: The recorder to sample the poses of the robots and tokens into.
+    :param pose_timesteps: The number of timesteps between each pose sample.
+    """
+    schedule = EventSchedule()
+
+    def service_lighting(timestep: int) -> int | None:
+        if timestep >= match_timesteps:
+            # All remaining lighting steps are run at the end of the match
+            return None
+        steps_to_next = lighting_control.service_lighting(timestep)
+        if steps_to_next <= 0:
+            return None
+        return min(timestep + steps_to_next, match_timesteps)
+
+    schedule.add(0, 'lighting', service_lighting)
+
+    time_step = supervisor.getBasicTimeStep()
+    window_timesteps = math.ceil(speed_monitor.window * 1000 / time_step)
+    schedule.add_periodic(
+        window_timesteps,
+        window_timesteps,
+        'speed sample',
+        lambda _: speed_monitor.sample(supervisor.getTime()),
+    )
+
+    if scorer is not None and scoring_interval is not None:
+        scoring_timesteps = max(math.ceil(scoring_interval * 1000 / time_step), 1)
+        schedule.add_periodic(
+            scoring_timesteps,
+            scoring_timesteps,
+            'live scoring',
+            live_scoring(scorer, supervisor.getTime),
+        )
+
+    if pose_recorder is not None:
+        schedule.add_periodic(
+            0,
+            pose_timesteps,
+            'pose sample',
+            lambda _: pose_recorder.sample(supervisor.getTime()),
+        )
+    return schedule
+
+
 def run_match(
     match_duration: int,
     media_path_stem: Path,
     video_resolution: tuple[int, int],
     skip_video: bool,
+    teams: Mapping[str, Mapping[str, Any]],
 ) -> None:
     """Run a match in the arena."""
     robots = Robots()
     robots.remove_unoccupied_robots()
+    tokens = find_tokens(supervisor)
+    robot_nodes = {zone: robot.robot for zone, robot in robots.robots.items()}
+    scorer = Scorer(load_arena_grid(supervisor), tokens, robot_nodes)
 
     time_step = int(supervisor.getBasicTimeStep())
     match_timesteps = (match_duration * 1000) // time_step
+
+    pose_recorder = None
+    pose_timesteps = 1
+    pose_rate = pose_rate_from_env()
+    if pose_rate is not None:
+        pose_timesteps = pose_period(pose_rate, time_step)
+        pose_recorder = start_pose_recording(
+            media_path_stem.with_name(f'{media_path_stem.name}-poses.npy'),
+            {**{f'ROBOT{zone}': node for zone, node in robot_nodes.items()}, **tokens},
+            # Samples at the start and end of the match, and each period between
+            num_samples=match_timesteps // pose_timesteps + 2,
+        )
     lighting_control = LightingControl(supervisor, match_timesteps)
+    speed_monitor = SpeedMonitor()
 
     robots.preset_robots()
 
-    robots.wait_for_ready(5)
+    robots.wait_for_ready(ready_timeout(len(robots.robots)))
 
     with record_animation(media_path_stem.with_suffix('.html')):
         # Animations don't support lighting changes so start the animation before
@@ -207,11 +435,40 @@ def run_match(
             # We are ready to start the match now. "Press" the start button on the robots
             robots.start_robots()
             supervisor.simulationSetMode(Supervisor.SIMULATION_MODE_FAST)  # type: ignore[attr-defined]
-
-            for current_step in range(match_timesteps + 1):
+            speed_monitor.start(supervisor.getTime())
+
+            # Step straight to each scheduled event rather than every timestep
+            schedule = schedule_match(
+                match_timesteps,
+                lighting_control,
+                speed_monitor,
+                scorer,
+                scoring_interval_from_env(),
+                pose_recorder,
+                pose_timesteps,
+            )
+            current_step = 0
+            while current_step < match_timesteps:
+                schedule.run_due(current_step)
+                next_step = schedule.next_timestep()
+                if next_step is None or next_step > match_timesteps:
+                    next_step = match_timesteps
+                if supervisor.step((next_step - current_step) * time_step) == -1:
+                    # Webots is exiting
+                    break
+                current_step = next_step
+            else:
+                schedule.run_due(current_step)
+                # Run the final lighting steps and step once more so they are in the video
                 lighting_control.service_lighting(current_step)
                 supervisor.step(time_step)
+                scorer.sample(supervisor.getTime())
+                if pose_recorder is not None:
+                    pose_recorder.sample(supervisor.getTime())
 
+            speed_monitor.finish(supervisor.getTime())
+            if pose_recorder is not None:
+                pose_recorder.finish()
             print("==================")
             print("Game over, pausing")
             print("==================")
@@ -220,7 +477,17 @@ def run_match(
         # To allow for a clear image of the final state, we have reset the
         # lighting after the final frame of the video.
         save_image(media_path_stem.with_suffix('.jpg'))
-        # TODO score match
+
+        speed_monitor.print_summary()
+        update_match_file({
+            'simulation_speed': speed_monitor.summary(),
+            'lockstep_stalls': robots.stall_summaries(),
+            'resources': robots.resource_summaries(),
+        })
+        if scorer.sim_time is not None:
+            scorer.print_scores()
+            # The scores are provisional, so are kept out of the teams SRComp reads
+            update_match_file({'scoring_diagnostics': scorer.diagnostics(teams)})
 
 
 def main() -> None:
@@ -234,6 +501,7 @@ def main() -> None:
     prefix_and_tee_streams(
         environment.ARENA_ROOT / f'supervisor-log-{match_id}.txt',
         prefix=lambda: f'[{supervisor.getTime():0.3f}] ',
+        records=log_records_from_env(supervisor.getTime),
     )
 
     try:
@@ -244,6 +512,7 @@ def main() -> None:
             environment.ARENA_ROOT / 'recordings' / match_id,
             video_resolution=match_data.video_resolution,
             skip_video=(not match_data.video_enabled),
+            teams=match_data.teams,
         )
         # Set the overall Webots exit code to follow the supervisor's exit code
     except Exception as e:
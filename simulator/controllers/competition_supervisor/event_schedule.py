@@ -0,0 +1,98 @@
+"""
+A schedule of events to run at simulation timesteps.
+
+Rather than stepping the simulation one timestep at a time and checking whether
+anything needs doing, the supervisor steps straight to the timestep of the next
+scheduled event. Each step is a round trip into Webots, so this saves most of
+them when nothing is happening.
+"""
+from __future__ import annotations
+
+import heapq
+import itertools
+from typing import Callable, NamedTuple
+
+# Called with the current timestep, returns the timestep to run it again at, or
+# None if it shouldn't run again
+EventCallback = Callable[[int], 'int | None']
+
+
+class ScheduledEvent(NamedTuple):
+    """An event scheduled to run at a timestep."""
+
+    timestep: int
+    # Events at the same timestep run in the order they were scheduled
+    order: int
+    name: str
+    callback: EventCallback
+
+
+class EventSchedule:
+    """A schedule of events, run in order of the timestep they are scheduled for."""
+
+    def __init__(self) -> None:
+        self._events: list[ScheduledEvent] = []
+        self._order = itertools.count()
+
+    def add(self, timestep: int, name: str, callback: EventCallback) -> None:
+        """
+        Schedule an event.
+
+        :param timestep: The timestep to run the event at.
+        :param name: The name of the event, used in errors.
+        :param callback: The function to run, which returns the timestep to run
+            it again at, or None.
+        """
+        heapq.heappush(
+            self._events,
+            ScheduledEvent(timestep, next(self._order), name, callback),
+        )
+
+    def add_periodic(
+        self,
+        first_timestep: int,
+        period: int,
+        name: str,
+        callback: Callable[[int], None],
+    ) -> None:
+        """
+        Schedule an event to run repeatedly.
+
+        :param first_timestep: The timestep to first run the event at.
+        :param period: The number of timesteps between each run of the event.
+        :param name: The name of the event, used in errors.
+        :param callback: The function to run, called with the current timestep.
+        """
+        if period <= 0:
+            raise ValueError(f"Period of event {name!r} must be positive, not {period}")
+
+        def run(timestep: int) -> int:
+            callback(timestep)
+            return timestep + period
+
+        self.add(first_timestep, name, run)
+
+    def next_timestep(self) -> int | None:
+        """Get the timestep of the next event, or None if there are no events."""
+        if not self._events:
+            return None
+        return self._events[0].timestep
+
+    def run_due(self, timestep: int) -> None:
+        """
+        Run all events scheduled at or before the given timestep.
+
+        :param timestep: The current timestep.
+        :raises ValueError: If an event reschedules itself without moving forward.
+        """
+        while self._events and self._events[0].timestep <= timestep:
+            event = heapq.heappop(self._events)
+            next_timestep = event.callback(timestep)
+            if next_timestep is None:
+                continue
+            if next_timestep <= timestep:
+                raise ValueError(
+                    f"Event {event.name!r} rescheduled to timestep {next_timestep}, "
+                    f"which isn't after the current timestep {timestep}"
+                )
+            self.add(next_timestep, event.name, event.callback)
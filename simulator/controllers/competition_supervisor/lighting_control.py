@@ -1,17 +1,26 @@
 """
 The controller for altering arena lighting provided by a DirectionalLight and a Background.
 
+The cue stack is compiled into a timeline of segments, each changing a light
+either instantly or as a fade. Fades are interpolated when they are serviced,
+at no more than the video frame rate, and fields are only written when their
+value changes, as every lighting change causes extra rendering work in Webots.
+
 Currently doesn't support:
 - Timed pre-match lighting changes
 """
 from __future__ import annotations
 
+import math
 from typing import NamedTuple
 
 from controller import Node, Supervisor
 
 MATCH_LIGHTING_INTENSITY = 1.5
 DEFAULT_LUMINOSITY = 1
+# Fades are written at most this many times per simulated second, faster
+# changes than the video frame rate can't be seen
+VIDEO_FRAME_RATE = 25
 
 
 class FromEnd(NamedTuple):
@@ -56,15 +65,45 @@ class LightingEffect(NamedTuple):
         )
 
 
-class LightingStep(NamedTuple):
-    """Represents a step in a lighting fade."""
+class LightingState(NamedTuple):
+    """The state of a light along with the ambient luminosity."""
+
+    intensity: float
+    colour: tuple[float, float, float]
+    luminosity: float
+
 
-    timestep: int
-    light_node: Node
-    intensity: float | None
-    colour: tuple[float, float, float] | None
-    luminosity: float | None
-    name: str | None = None
+class LightingSegment(NamedTuple):
+    """
+    A change to a light's state, compiled from one or more cues.
+
+    The state changes linearly from the start state at the start timestep to
+    the end state at the end timestep. Segments for instant changes start and
+    end at the same timestep.
+    """
+
+    start: int
+    end: int
+    light_def: str
+    start_state: LightingState
+    end_state: LightingState
+    names: tuple[str, ...] = ()
+
+    def state_at(self, timestep: int) -> LightingState:
+        """Get the state of the light at a timestep during the segment."""
+        if timestep >= self.end:
+            return self.end_state
+        fraction = max(timestep - self.start, 0) / (self.end - self.start)
+        start, end = self.start_state, self.end_state
+        return LightingState(
+            start.intensity + (end.intensity - start.intensity) * fraction,
+            (
+                start.colour[0] + (end.colour[0] - start.colour[0]) * fraction,
+                start.colour[1] + (end.colour[1] - start.colour[1]) * fraction,
+                start.colour[2] + (end.colour[2] - start.colour[2]) * fraction,
+            ),
+            start.luminosity + (end.luminosity - start.luminosity) * fraction,
+        )
 
 
 CUE_STACK = [
@@ -97,13 +136,29 @@ CUE_STACK = [
 
 
 class LightingControl:
-    """Controller for managing lighting effects in the arena."""
+    """
+    Controller for managing lighting effects in the arena.
 
-    def __init__(self, supervisor: Supervisor, duration: int) -> None:
+    :param supervisor: The supervisor controlling the arena.
+    :param duration: The length of the match in timesteps.
+    :param write_rate: The maximum number of times per simulated second to
+        write the lighting during a fade, or None to write every timestep.
+    """
+
+    def __init__(
+        self,
+        supervisor: Supervisor,
+        duration: int,
+        write_rate: float | None = VIDEO_FRAME_RATE,
+    ) -> None:
         self._robot = supervisor
         self._final_timestep = duration
         self.timestep = self._robot.getBasicTimeStep()
         self.ambient_node = supervisor.getFromDef('AMBIENT')
+        if write_rate is None:
+            self.write_interval = 1
+        else:
+            self.write_interval = max(1, math.ceil(1000 / (write_rate * self.timestep)))
 
         # fetch all nodes used in effects, any missing nodes will be flagged here
         light_names = set(effect.lighting.light_def for effect in CUE_STACK)
@@ -118,7 +173,13 @@ class LightingControl:
         # Convert FromEnd times to absolute times
         cue_stack = self.convert_from_end_times(CUE_STACK)
 
-        self.lighting_steps = self.generate_lighting_steps(cue_stack)
+        self.timeline = self.compile_timeline(cue_stack)
+        # The index of the next segment in the timeline to start
+        self._cursor = 0
+        # The segments that have started but not yet reached their end state
+        self._active: list[LightingSegment] = []
+        # The last value written to each field, keyed by node and field name
+        self._written: dict[tuple[str, str], float | tuple[float, float, float]] = {}
 
     def convert_from_end_times(self, cue_stack: list[LightingEffect]) -> list[LightingEffect]:
         """Convert FromEnd times to absolute times."""
@@ -135,106 +196,64 @@ class LightingControl:
 
         return new_cue_stack
 
-    def generate_lighting_steps(self, cue_stack: list[LightingEffect]) -> list[LightingStep]:
-        """Expand the cue stack into a list of lighting steps."""
-        steps: list[LightingStep] = []
+    def compile_timeline(self, cue_stack: list[LightingEffect]) -> list[LightingSegment]:
+        """
+        Compile the cue stack into a timeline of segments, ordered by start timestep.
 
-        # Generate current values for all lights
+        Each fade starts from the state left by the previous cue for the same
+        light. An instant cue immediately followed by another cue for the same
+        light at the same timestep has no visible effect, other than as the
+        starting state of the later cue, so is merged into it.
+        """
+        # Get the current values of all lights
         current_values = {
-            name: LightingStep(
-                0,
-                light,
+            name: LightingState(
                 light.getField('intensity').getSFFloat(),  # type: ignore[attr-defined]
-                light.getField('color').getSFColor(),  # type: ignore[attr-defined]
+                tuple(light.getField('color').getSFColor()),  # type: ignore[attr-defined]
                 0,
             )
             for name, light in self.lights.items()
         }
         current_luminosity = self.ambient_node.getField('luminosity').getSFFloat()  # type: ignore[attr-defined]
 
+        segments = []
         for cue in cue_stack:
-            # Get the current state of the light with the current luminosity
-            current_state = current_values[cue.lighting.light_def]
-            current_state = current_state._replace(luminosity=current_luminosity)
-
-            expanded_cue = self.expand_lighting_fade(cue, current_state)
-
-            # Update current values from the last step of the cue
-            current_values[cue.lighting.light_def] = expanded_cue[-1]
-            current_luminosity = expanded_cue[-1].luminosity
-
-            steps.extend(expanded_cue)
-
-        steps.sort(key=lambda x: x.timestep)
-        # TODO optimise steps to remove duplicate steps
-
-        return steps
-
-    def expand_lighting_fade(
-        self,
-        cue: LightingEffect,
-        current_state: LightingStep,
-    ) -> list[LightingStep]:
-        """Expand a fade effect into a list of steps."""
-        fades = []
-
-        assert isinstance(cue.start_time, (float, int)), \
-            "FromEnd times should be converted to absolute times"
-        cue_start = int((cue.start_time * 1000) / self.timestep)
-
-        if cue.fade_time is None:
-            # no fade, just set values
-            return [LightingStep(
-                cue_start,
-                self.lights[cue.lighting.light_def],
-                cue.lighting.intensity,
-                cue.lighting.colour,
-                cue.luminosity,
-                cue.name
-            )]
-
-        assert current_state.intensity is not None, "Current intensity should be set"
-        assert current_state.colour is not None, "Current colour should be set"
-        assert current_state.luminosity is not None, "Current luminosity should be set"
-
-        fade_steps = int((cue.fade_time * 1000) / self.timestep)
-        if fade_steps == 0:
-            fade_steps = 1
-        intensity_step = (cue.lighting.intensity - current_state.intensity) / fade_steps
-        colour_step = [
-            (cue.lighting.colour[0] - current_state.colour[0]) / fade_steps,
-            (cue.lighting.colour[1] - current_state.colour[1]) / fade_steps,
-            (cue.lighting.colour[2] - current_state.colour[2]) / fade_steps,
-        ]
-        luminosity_step = (cue.luminosity - current_state.luminosity) / fade_steps
-
-        for step in range(fade_steps):
-            fades.append(
-                LightingStep(
-                    cue_start + step,
-                    self.lights[cue.lighting.light_def],
-                    current_state.intensity + intensity_step * step,
-                    (
-                        current_state.colour[0] + (colour_step[0] * step),
-                        current_state.colour[1] + (colour_step[1] * step),
-                        current_state.colour[2] + (colour_step[2] * step),
-                    ),
-                    current_state.luminosity + luminosity_step * step,
-                    cue.name if step == 0 else None,
-                )
-            )
-
-        # Replace the last step with the final values
-        fades.pop()
-        fades.append(LightingStep(
-            cue_start + fade_steps,
-            self.lights[cue.lighting.light_def],
-            cue.lighting.intensity,
-            cue.lighting.colour,
-            cue.luminosity,
-        ))
-
-        return fades
+            assert isinstance(cue.start_time, (float, int)), \
+                "FromEnd times should be converted to absolute times"
+            start = int((cue.start_time * 1000) / self.timestep)
+            end = start
+            if cue.fade_time is not None:
+                end += max(1, int((cue.fade_time * 1000) / self.timestep))
+
+            light_def = cue.lighting.light_def
+            end_state = LightingState(
+                cue.lighting.intensity, cue.lighting.colour, cue.luminosity)
+            segments.append(LightingSegment(
+                start,
+                end,
+                light_def,
+                current_values[light_def]._replace(luminosity=current_luminosity),
+                end_state,
+                (cue.name,) if cue.name else (),
+            ))
+
+            current_values[light_def] = end_state
+            current_luminosity = cue.luminosity
+
+        segments.sort(key=lambda segment: segment.start)
+
+        timeline: list[LightingSegment] = []
+        for segment in segments:
+            previous = timeline[-1] if timeline else None
+            if (
+                previous is not None
+                and previous.start == previous.end == segment.start
+                and previous.light_def == segment.light_def
+            ):
+                timeline[-1] = segment._replace(names=previous.names + segment.names)
+            else:
+                timeline.append(segment)
+        return timeline
 
     def set_luminosity(self, luminosity: float) -> None:
         """Set the luminosity of the ambient node."""
@@ -248,40 +267,81 @@ class LightingControl:
         """Set the colour of a node."""
         node.getField('color').setSFColor(list(colour))  # type: ignore[attr-defined]
 
+    def _changed(
+        self,
+        node_def: str,
+        field: str,
+        value: float | tuple[float, float, float],
+    ) -> bool:
+        key = (node_def, field)
+        if self._written.get(key) == value:
+            return False
+        self._written[key] = value
+        return True
+
+    def apply_state(self, light_def: str, state: LightingState) -> None:
+        """Write the state of a light, skipping any fields that haven't changed."""
+        light_node = self.lights[light_def]
+        if self._changed(light_def, 'intensity', state.intensity):
+            self.set_node_intensity(light_node, state.intensity)
+        if self._changed(light_def, 'color', state.colour):
+            self.set_node_colour(light_node, state.colour)
+        if self._changed('AMBIENT', 'luminosity', state.luminosity):
+            self.set_luminosity(state.luminosity)
+
+    def _start_segment(self, segment: LightingSegment, current_timestep: int) -> None:
+        for name in segment.names:
+            print(
+                f"Running lighting effect: {name} @ "
+                f"{current_timestep * self.timestep / 1000}"
+            )
+        # A new segment for a light replaces any fade still running on it
+        self._active = [
+            active for active in self._active
+            if active.light_def != segment.light_def
+        ]
+        self._active.append(segment)
+
     def service_lighting(self, current_timestep: int) -> int:
-        """Service the lighting effects for the current timestep."""
-        index = 0
+        """
+        Service the lighting effects for the current timestep.
+
+        At or after the end of the match all remaining effects are run to their
+        final state.
 
-        if current_timestep >= self._final_timestep and self.lighting_steps:
+        :param current_timestep: The current timestep.
+        :return: The number of timesteps until the lighting next needs
+            servicing, or -1 if there are no more changes.
+        """
+        if current_timestep >= self._final_timestep:
             # Run all remaining steps
-            current_timestep = self.lighting_steps[-1].timestep
+            for segment in self.timeline[self._cursor:]:
+                self._start_segment(segment, current_timestep)
+            self._cursor = len(self.timeline)
+            for segment in self._active:
+                self.apply_state(segment.light_def, segment.end_state)
+            self._active = []
+            return -1
 
         while (
-            len(self.lighting_steps) > index
-            and self.lighting_steps[index].timestep == current_timestep
+            self._cursor < len(self.timeline)
+            and self.timeline[self._cursor].start <= current_timestep
         ):
-            lighting_step = self.lighting_steps[index]
-            if lighting_step.name is not None:
-                print(
-                    f"Running lighting effect: {lighting_step.name} @ "
-                    f"{current_timestep * self.timestep / 1000}"
-                )
-
-            if lighting_step.intensity is not None:
-                self.set_node_intensity(lighting_step.light_node, lighting_step.intensity)
-
-            if lighting_step.colour is not None:
-                self.set_node_colour(lighting_step.light_node, lighting_step.colour)
-
-            if lighting_step.luminosity is not None:
-                self.set_luminosity(lighting_step.luminosity)
-
-            index += 1
-
-        # Remove all steps that have been processed
-        self.lighting_steps = self.lighting_steps[index:]
+            self._start_segment(self.timeline[self._cursor], current_timestep)
+            self._cursor += 1
+
+        for segment in self._active:
+            self.apply_state(segment.light_def, segment.state_at(current_timestep))
+        self._active = [
+            segment for segment in self._active
+            if segment.end > current_timestep
+        ]
 
-        if self.lighting_steps:
-            return self.lighting_steps[0].timestep - current_timestep
-        else:
-            return -1
+        steps_to_next = [
+            # Always write the exact end state of a fade
+            min(self.write_interval, segment.end - current_timestep)
+            for segment in self._active
+        ]
+        if self._cursor < len(self.timeline):
+            steps_to_next.append(self.timeline[self._cursor].start - current_timestep)
+        return min(steps_to_next, default=-1)
@@ -0,0 +1,133 @@
+"""
+Record the pose of every robot and token during the match.
+
+The poses are written to a memory-mapped NumPy file, allocated for the whole
+match up front, so recording a sample only copies values into the array. The
+file is a single structured array with a row per sample, holding the simulated
+time and a field for each object, named by its DEF, with its world position and
+orientation matrix. The poses of a single object can be read with, for example:
+
+    poses = numpy.load('match-1-poses.npy', mmap_mode='r')
+    robot_positions = poses['ROBOT0']['position']
+
+Rows that weren't recorded, such as when the simulation exited early, have a
+time of NaN.
+
+Recording is off unless WEBOTS_POSE_RATE is set, as sampling every object
+slows the simulation. NumPy is only imported when recording starts, and poses
+aren't recorded if it isn't installed.
+"""
+from __future__ import annotations
+
+import math
+import os
+from pathlib import Path
+from typing import TYPE_CHECKING, Mapping
+
+from controller import Node
+
+if TYPE_CHECKING:
+    import numpy as np
+
+
+class PoseRecorder:
+    """
+    Records the pose of a set of nodes into a preallocated array.
+
+    :param path: The .npy file to write the poses to.
+    :param nodes: The nodes to record, by name.
+    :param num_samples: The maximum number of samples to record.
+    """
+
+    def __init__(self, path: Path, nodes: Mapping[str, Node], num_samples: int) -> None:
+        import numpy as np
+        from numpy.lib.format import open_memmap
+
+        pose_dtype = np.dtype([('position', 'f4', (3,)), ('orientation', 'f4', (3, 3))])
+        dtype = np.dtype([('time', 'f8')] + [(name, pose_dtype) for name in nodes])
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self.path = path
+        self._poses: np.memmap = open_memmap(  # type: ignore[no-untyped-call]
+            path, mode='w+', dtype=dtype, shape=(num_samples,))
+        self._poses['time'] = math.nan
+        self._times = self._poses['time']
+        # Take views of each object's columns once so a sample only copies values
+        self._columns = [
+            (
+                node,
+                self._poses[name]['position'],
+                self._poses[name]['orientation'].reshape(num_samples, 9),
+            )
+            for name, node in nodes.items()
+        ]
+        self.num_samples = 0
+
+    def sample(self, sim_time: float) -> None:
+        """
+        Record the current pose of every node.
+
+        Samples after the array is full are dropped.
+
+        :param sim_time: The current simulated time in seconds.
+        """
+        index = self.num_samples
+        if index >= len(self._times):
+            return
+        for node, positions, orientations in self._columns:
+            positions[index] = node.getPosition()
+            orientations[index] = node.getOrientation()
+        self._times[index] = sim_time
+        self.num_samples = index + 1
+
+    def finish(self) -> None:
+        """Flush the recorded poses to the file."""
+        self._poses.flush()
+        print(f"Recorded {self.num_samples} pose samples to {self.path}")
+
+
+def pose_rate_from_env() -> float | None:
+    """
+    Get the rate to record poses at from WEBOTS_POSE_RATE.
+
+    :return: The samples per simulated second, or None if recording is disabled.
+    """
+    rate = os.environ.get('WEBOTS_POSE_RATE')
+    if not rate:
+        return None
+    try:
+        value = float(rate)
+    except ValueError:
+        print(
+            f"Ignoring invalid WEBOTS_POSE_RATE value {rate!r}, "
+            "expected a number of samples per second"
+        )
+        return None
+    if value <= 0:
+        return None
+    return value
+
+
+def pose_period(rate: float, time_step: float) -> int:
+    """Get the number of timesteps between pose samples, to record at most at the rate."""
+    return max(math.ceil(1000 / (rate * time_step)), 1)
+
+
+def start_pose_recording(
+    path: Path,
+    nodes: Mapping[str, Node],
+    num_samples: int,
+) -> PoseRecorder | None:
+    """
+    Create a pose recorder, or return None if NumPy isn't available.
+
+    :param path: The .npy file to write the poses to.
+    :param nodes: The nodes to record, by name.
+    :param num_samples: The maximum number of samples to record.
+    """
+    try:
+        recorder = PoseRecorder(path, nodes, num_samples)
+    except ImportError:
+        print("NumPy is not installed, not recording poses")
+        return None
+    print(f"Recording poses to {path}")
+    return recorder
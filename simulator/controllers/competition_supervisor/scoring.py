@@ -0,0 +1,352 @@
+"""
+Score the match from the positions of the tokens in the arena.
+
+The arena floor is split into a quadrant for each zone, with pillars standing
+on it that tokens can be placed on top of. The areas of the arena are compiled
+once into a grid of cells, so finding where a token is only needs a lookup in
+the grid, however many areas the arena has.
+
+The node handles of the tokens and robots are looked up once, so taking a
+sample costs a single position read per object. This keeps live scoring during
+the match cheap enough to not slow the simulation.
+
+The points awarded are provisional rather than the official rules, so the
+scores are only diagnostics. They are stored in the match file under their own
+key, and never in the team entries that SRComp reads.
+"""
+from __future__ import annotations
+
+import math
+import os
+from typing import Any, Callable, Mapping, NamedTuple, Sequence
+
+from controller import Node, Supervisor
+
+# The side length of each grid cell in metres
+GRID_CELL_SIZE = 0.005
+# The zone owning each quadrant of the arena, indexed by whether x and y are positive.
+# This matches the starting positions of the robots in the world.
+ZONE_QUADRANTS = {
+    (True, False): 0,
+    (False, False): 1,
+    (False, True): 2,
+    (True, True): 3,
+}
+# The provisional points scored by a team for each of its tokens on top of a pillar,
+# by the model name of the pillar
+PILLAR_POINTS = {
+    'pillar_0': 1,
+    'pillar_1': 1,
+    'pillar_2': 1,
+    'pillar_3': 1,
+    'pillar_centre': 2,
+}
+# The provisional points scored by a team for each of its tokens in its own zone,
+# on the floor
+ZONE_POINTS = 0
+
+_OUTSIDE = 0
+# Cells store the zone in the low bits and the pillar in the high bits, offset by 1
+_ZONE_BITS = 3
+
+
+class Platform(NamedTuple):
+    """A raised area of the arena that tokens can be placed on."""
+
+    name: str
+    # The minimum and maximum x and y of the top of the platform
+    bounds: tuple[float, float, float, float]
+    top: float
+
+
+class Location(NamedTuple):
+    """Where an object is in the arena."""
+
+    zone: int | None
+    platform: str | None = None
+
+    def as_dict(self) -> dict[str, Any]:
+        """Get the location in the format stored in the match file."""
+        return {'zone': self.zone, 'platform': self.platform}
+
+
+class ArenaGrid:
+    """
+    A grid of cells covering the arena, each storing the zone and platform it is in.
+
+    :param size: The width and depth of the arena floor.
+    :param platforms: The raised areas of the arena, at most 31.
+    :param cell_size: The side length of each grid cell.
+    """
+
+    def __init__(
+        self,
+        size: tuple[float, float],
+        platforms: Sequence[Platform],
+        cell_size: float = GRID_CELL_SIZE,
+    ) -> None:
+        if len(platforms) >= 1 << (8 - _ZONE_BITS):
+            raise ValueError(f"Too many platforms in the arena: {len(platforms)}")
+        self.cell_size = cell_size
+        self.platforms = list(platforms)
+        # Align the cell edges with the axes, so each cell is in a single quadrant
+        self._half_cells = (
+            math.ceil(size[0] / 2 / cell_size),
+            math.ceil(size[1] / 2 / cell_size),
+        )
+        self._half_size = (size[0] / 2, size[1] / 2)
+        self._columns = 2 * self._half_cells[0]
+        self._rows = 2 * self._half_cells[1]
+        self._cells = bytearray(self._columns * self._rows)
+
+        for (x_positive, y_positive), zone in ZONE_QUADRANTS.items():
+            self._fill(
+                (
+                    0 if x_positive else -self._half_size[0],
+                    self._half_size[0] if x_positive else 0,
+                    0 if y_positive else -self._half_size[1],
+                    self._half_size[1] if y_positive else 0,
+                ),
+                zone + 1,
+                mask=0,
+            )
+        for index, platform in enumerate(self.platforms):
+            # Keep the zone of the floor under the platform
+            self._fill(platform.bounds, (index + 1) << _ZONE_BITS, mask=(1 << _ZONE_BITS) - 1)
+
+    def _cell(self, x: float, y: float) -> tuple[int, int]:
+        return (
+            math.floor(x / self.cell_size) + self._half_cells[0],
+            math.floor(y / self.cell_size) + self._half_cells[1],
+        )
+
+    def _fill(self, bounds: tuple[float, float, float, float], value: int, mask: int) -> None:
+        """Set the cells whose centres are within the bounds, keeping the masked bits."""
+        x_min, x_max, y_min, y_max = bounds
+        half_cell = self.cell_size / 2
+        first_column, first_row = self._cell(x_min + half_cell, y_min + half_cell)
+        end_column, end_row = self._cell(x_max + half_cell, y_max + half_cell)
+        first_column, end_column = max(first_column, 0), min(end_column, self._columns)
+        if first_column >= end_column:
+            return
+        cells = self._cells
+        filled = bytes([value]) * (end_column - first_column)
+        for row in range(max(first_row, 0), min(end_row, self._rows)):
+            start = row * self._columns
+            if mask:
+                filled = bytes(
+                    (cell & mask) | value
+                    for cell in cells[start + first_column:start + end_column]
+                )
+            cells[start + first_column:start + end_column] = filled
+
+    def locate(self, x: float, y: float, z: float) -> Location:
+        """
+        Find where a point is in the arena.
+
+        A point is only on a platform if it is above the platform's top.
+
+        :return: The location of the point, with no zone if it is outside the arena.
+        """
+        column, row = self._cell(x, y)
+        if not (0 <= column < self._columns and 0 <= row < self._rows):
+            return Location(None)
+        cell = self._cells[row * self._columns + column]
+        if cell == _OUTSIDE:
+            return Location(None)
+
+        zone = (cell & ((1 << _ZONE_BITS) - 1)) - 1
+        platform_index = cell >> _ZONE_BITS
+        if platform_index:
+            platform = self.platforms[platform_index - 1]
+            if z > platform.top:
+                return Location(zone, platform.name)
+        return Location(zone)
+
+
+def load_arena_grid(supervisor: Supervisor) -> ArenaGrid:
+    """
+    Build the grid of the arena from the arena and pillars in the world.
+
+    The arena is found by the DEF ARENA and the pillars are the children of DEF PILLARS.
+    The pillars are positioned relative to DEF PILLARS, which mustn't be rotated.
+    """
+    arena = supervisor.getFromDef('ARENA')
+    if arena is None:
+        raise ValueError("Failed to get Webots node for the arena")
+    size = arena.getField('size').getSFVec2f()
+
+    platforms = []
+    pillars = supervisor.getFromDef('PILLARS')
+    if pillars is not None:
+        offset_x, offset_y, offset_z = pillars.getField('translation').getSFVec3f()
+        children = pillars.getField('children')
+        for index in range(children.getCount()):
+            pillar = children.getMFNode(index)
+            x, y, z = pillar.getField('translation').getSFVec3f()
+            x, y, z = x + offset_x, y + offset_y, z + offset_z
+            width, depth, height = pillar.getField('size').getSFVec3f()
+            platforms.append(Platform(
+                pillar.getField('model').getSFString(),
+                (x - width / 2, x + width / 2, y - depth / 2, y + depth / 2),
+                z + height,
+            ))
+    return ArenaGrid((size[0], size[1]), platforms)
+
+
+def find_tokens(supervisor: Supervisor) -> dict[str, Node]:
+    """
+    Find the nodes of all tokens in the world.
+
+    Tokens are the children of DEF TOKENS, with DEF names of the form TOKEN<zone>_<n>.
+    """
+    tokens = supervisor.getFromDef('TOKENS')
+    if tokens is None:
+        return {}
+    children = tokens.getField('children')
+    nodes = {}
+    for index in range(children.getCount()):
+        node = children.getMFNode(index)
+        name = node.getDef()
+        if name.startswith('TOKEN'):
+            nodes[name] = node
+    return nodes
+
+
+def token_owner(name: str) -> int | None:
+    """Get the zone that owns a token from its DEF name, or None if it isn't owned."""
+    zone, sep, _ = name[len('TOKEN'):].partition('_')
+    if not sep or not zone.isdigit():
+        return None
+    return int(zone)
+
+
+class Scorer:
+    """
+    Samples the positions of the tokens and robots and scores them.
+
+    :param grid: The grid of the arena used to locate objects.
+    :param tokens: The nodes of the tokens, by DEF name.
+    :param robots: The nodes of the robots, by zone.
+    """
+
+    def __init__(
+        self,
+        grid: ArenaGrid,
+        tokens: Mapping[str, Node],
+        robots: Mapping[int, Node],
+    ) -> None:
+        self.grid = grid
+        # Look up the owner of each token once
+        self._tokens = [(name, node, token_owner(name)) for name, node in tokens.items()]
+        self._robots = list(robots.items())
+        self.token_locations: dict[str, Location] = {}
+        self.robot_locations: dict[int, Location] = {}
+        self.sim_time: float | None = None
+
+    def sample(self, sim_time: float) -> None:
+        """
+        Record the current location of every token and robot.
+
+        :param sim_time: The current simulated time in seconds.
+        """
+        locate = self.grid.locate
+        self.token_locations = {
+            name: locate(*node.getPosition())
+            for name, node, _ in self._tokens
+        }
+        self.robot_locations = {
+            zone: locate(*node.getPosition())
+            for zone, node in self._robots
+        }
+        self.sim_time = sim_time
+
+    def zone_scores(self) -> dict[int, dict[str, Any]]:
+        """Calculate the score of each zone from the last sample."""
+        scores: dict[int, dict[str, Any]] = {
+            zone: {'score': 0, 'tokens': {}} for zone in ZONE_QUADRANTS.values()
+        }
+        for name, _, owner in self._tokens:
+            if owner not in scores:
+                continue
+            location = self.token_locations.get(name, Location(None))
+            points = 0
+            if location.platform is not None:
+                points = PILLAR_POINTS.get(location.platform, 0)
+            elif location.zone == owner:
+                points = ZONE_POINTS
+            scores[owner]['tokens'][name] = location.as_dict()
+            scores[owner]['score'] += points
+        return scores
+
+    def diagnostics(self, teams: Mapping[str, Mapping[str, Any]]) -> dict[str, Any]:
+        """
+        Get the scoring data to store in the match file as diagnostics.
+
+        The scores are kept separate from the team entries that SRComp reads,
+        with the data used to calculate each team's score stored by its TLA.
+
+        :param teams: The teams in the match file, by TLA, each with their zone.
+        """
+        scores = self.zone_scores()
+        team_scores = {}
+        for tla, team in teams.items():
+            zone = team.get('zone')
+            if zone not in scores:
+                continue
+            robot = self.robot_locations.get(zone)
+            team_scores[tla] = {
+                'zone': zone,
+                'present': robot is not None,
+                'robot_location': robot.as_dict() if robot is not None else None,
+                **scores[zone],
+            }
+        return {
+            'sim_time': self.sim_time,
+            'zone_scores': {str(zone): data['score'] for zone, data in scores.items()},
+            'teams': team_scores,
+        }
+
+    def print_scores(self) -> None:
+        """Print the score of each zone from the last sample."""
+        for zone, data in self.zone_scores().items():
+            print(f"Zone {zone} scored {data['score']} at {self.sim_time:0.3f}s")
+
+
+def scoring_interval_from_env() -> float | None:
+    """
+    Get the interval to score the match at during the match, from WEBOTS_SCORING_INTERVAL.
+
+    :return: The interval in simulated seconds, or None to only score the end of the match.
+    """
+    interval = os.environ.get('WEBOTS_SCORING_INTERVAL')
+    if not interval:
+        return None
+    try:
+        value = float(interval)
+    except ValueError:
+        value = 0
+    if value <= 0:
+        print(
+            f"Ignoring invalid WEBOTS_SCORING_INTERVAL value {interval!r}, "
+            "expected a positive number of seconds"
+        )
+        return None
+    return value
+
+
+def live_scoring(scorer: Scorer, sim_time: Callable[[], float]) -> Callable[[int], None]:
+    """Get a scheduled event callback that samples the scores and prints any changes."""
+    last_scores: dict[int, int] = {}
+
+    def sample(_: int) -> None:
+        nonlocal last_scores
+        scorer.sample(sim_time())
+        scores = {zone: data['score'] for zone, data in scorer.zone_scores().items()}
+        if scores != last_scores:
+            print("Scores: " + ', '.join(
+                f"zone {zone}: {score}" for zone, score in scores.items()
+            ))
+        last_scores = scores
+
+    return sample
@@ -0,0 +1,152 @@
+"""
+Monitor how fast the simulation is running compared to real time.
+
+The real-time factor is the simulated time elapsed divided by the wall-clock
+time elapsed, so a value of 2 means the simulation is running at twice real time.
+It is measured over tumbling windows, consecutive windows of simulated time that
+don't overlap. A window with no measurable wall-clock time has no real-time
+factor, and is left out of the summary.
+"""
+from __future__ import annotations
+
+import time
+from typing import Any, NamedTuple
+
+
+class SpeedWindow(NamedTuple):
+    """The real-time factor over a window of simulated time."""
+
+    sim_start: float
+    sim_end: float
+    wall_duration: float
+
+    @property
+    def real_time_factor(self) -> float | None:
+        """The simulated time elapsed per second of wall-clock time, None if none passed."""
+        if self.wall_duration <= 0:
+            return None
+        return (self.sim_end - self.sim_start) / self.wall_duration
+
+
+class SpeedMonitor:
+    """
+    Samples the wall-clock time against the simulated time over tumbling windows.
+
+    :param window: The length of each window in simulated seconds.
+    :param num_slowest: The number of slowest windows to report in the summary.
+    """
+
+    def __init__(self, window: float = 5.0, num_slowest: int = 3) -> None:
+        self.window = window
+        self.num_slowest = num_slowest
+        self.windows: list[SpeedWindow] = []
+        self._sim_start = 0.0
+        self._wall_start = 0.0
+        self._window_sim_start = 0.0
+        self._window_wall_start = 0.0
+        self._sim_end = 0.0
+        self._wall_end = 0.0
+
+    def start(self, sim_time: float) -> None:
+        """
+        Start monitoring from the current simulated time.
+
+        :param sim_time: The current simulated time in seconds.
+        """
+        self._sim_start = self._window_sim_start = sim_time
+        self._wall_start = self._window_wall_start = time.perf_counter()
+
+    def sample(self, sim_time: float) -> None:
+        """
+        Record the current simulated time, completing the window if it has elapsed.
+
+        :param sim_time: The current simulated time in seconds.
+        """
+        if sim_time - self._window_sim_start >= self.window:
+            self._end_window(sim_time)
+
+    def finish(self, sim_time: float) -> None:
+        """
+        Stop monitoring, recording any partial window.
+
+        :param sim_time: The current simulated time in seconds.
+        """
+        if sim_time > self._window_sim_start:
+            self._end_window(sim_time)
+        self._sim_end = sim_time
+        self._wall_end = time.perf_counter()
+
+    def _end_window(self, sim_time: float) -> None:
+        wall_time = time.perf_counter()
+        window = SpeedWindow(
+            self._window_sim_start,
+            sim_time,
+            wall_time - self._window_wall_start,
+        )
+        self.windows.append(window)
+        if window.real_time_factor is not None:
+            print(
+                f"Real-time factor {window.real_time_factor:0.2f}x "
+                f"over {window.sim_start:0.3f}-{window.sim_end:0.3f}s"
+            )
+        self._window_sim_start = sim_time
+        self._window_wall_start = wall_time
+
+    def summary(self) -> dict[str, Any]:
+        """
+        Return a JSON serialisable summary of the monitored speed.
+
+        Real-time factors that can't be measured are None, so the summary
+        never contains an infinite value, which isn't valid JSON.
+        """
+        overall = SpeedWindow(
+            self._sim_start,
+            self._sim_end,
+            self._wall_end - self._wall_start,
+        )
+        measured = [
+            (factor, window) for window in self.windows
+            if (factor := window.real_time_factor) is not None
+        ]
+        slowest = sorted(measured, key=lambda item: item[0])
+        factors = [factor for factor, _ in measured]
+        return {
+            'sim_duration_s': round(overall.sim_end - overall.sim_start, 3),
+            'wall_duration_s': round(overall.wall_duration, 3),
+            'real_time_factor': _round(overall.real_time_factor),
+            'min_real_time_factor': _round(min(factors, default=None)),
+            'max_real_time_factor': _round(max(factors, default=None)),
+            'window_s': self.window,
+            'slowest_windows': [
+                {
+                    'sim_start_s': round(window.sim_start, 3),
+                    'sim_end_s': round(window.sim_end, 3),
+                    'real_time_factor': round(factor, 3),
+                }
+                for factor, window in slowest[:self.num_slowest]
+            ],
+        }
+
+    def print_summary(self) -> None:
+        """Print a summary of the monitored speed."""
+        summary = self.summary()
+        print(
+            f"Match ran {summary['sim_duration_s']}s of simulated time in "
+            f"{summary['wall_duration_s']}s, real-time factor "
+            f"{_format_factor(summary['real_time_factor'])} "
+            f"(min {_format_factor(summary['min_real_time_factor'])}, "
+            f"max {_format_factor(summary['max_real_time_factor'])})"
+        )
+        for window in summary['slowest_windows']:
+            print(
+                f"Slow window: {window['sim_start_s']}-{window['sim_end_s']}s "
+                f"at {window['real_time_factor']}x"
+            )
+
+
+def _round(value: float | None) -> float | None:
+    return None if value is None else round(value, 3)
+
+
+def _format_factor(value: float | None) -> str:
+    return 'unknown' if value is None else f'{value}x'
@@ -7,25 +7,49 @@ and running the usercode.
 The board simulators are run in a separate thread to allow the usercode to run
 in the main thread. This provides the interface between the sr-robot3 module and Webots.
 """
-import atexit
+from __future__ import annotations
+
 import json
 import logging
 import os
 import runpy
 import sys
 import threading
+import time
 from pathlib import Path
 from tempfile import TemporaryDirectory
+from typing import Any
+
+# The end time of each startup phase, starting from when this script started
+_STARTUP_PHASES: list[tuple[str, float]] = [('start', time.perf_counter())]
 
 from controller import Robot
 
 # Robot constructor lacks a return type annotation in R2023b
 sys.path.insert(0, Robot().getProjectPath())  # type: ignore[no-untyped-call]
+_STARTUP_PHASES.append(('create robot', time.perf_counter()))
 import environment  # configure path to include modules
-from robot_logging import get_match_identifier, prefix_and_tee_streams
-from robot_utils import get_game_mode, get_robot_file, print_simulation_version
+from resource_sampler import ResourceSampler
+from robot_logging import (
+    LogBudget,
+    flush_logs,
+    get_match_identifier,
+    log_records_from_env,
+    prefix_and_tee_streams,
+)
+from robot_utils import (
+    get_game_mode,
+    get_match_data,
+    get_robot_file,
+    print_simulation_version,
+)
+from sbot_interface.devices.util import get_globals
 from sbot_interface.setup import setup_devices
 from sbot_interface.socket_server import SocketServer
+from sbot_interface.tracing import TRACER
+from usercode_profiler import PROFILE_MODES, profile_usercode
+
+_STARTUP_PHASES.append(('import modules', time.perf_counter()))
 
 # Get the robot object that was created when setting up the environment
 _robot = Robot.created
@@ -35,7 +59,7 @@ robot = _robot
 LOGGER = logging.getLogger('usercode_runner')
 
 
-def start_devices() -> SocketServer:
+def start_devices(noise_seed: list[int] | None = None) -> SocketServer:
     """
     Create the board simulators and return the SocketServer object.
 
@@ -44,14 +68,42 @@ def start_devices() -> SocketServer:
 
     The WEBOTS_DEVICE_LOGGING environment variable, overrides the log level used.
     Default is WARNING.
+
+    The WEBOTS_DEVICE_CONFIG environment variable, overrides the device configuration
+    file used. Default is the configuration next to the robot proto.
+
+    :param noise_seed: The seed for the noise applied to devices, None for a random seed.
     """
+    kwargs: dict[str, Any] = {'noise_seed': noise_seed}
     if log_level := os.environ.get('WEBOTS_DEVICE_LOGGING'):
-        return setup_devices(log_level)
-    else:
-        return setup_devices()
+        kwargs['log_level'] = log_level
+    if config_path := os.environ.get('WEBOTS_DEVICE_CONFIG'):
+        kwargs['config_path'] = Path(config_path)
+    return setup_devices(**kwargs)
+
+
+def end_startup_phase(name: str) -> None:
+    """Record the end of a phase of the controller's startup."""
+    _STARTUP_PHASES.append((name, time.perf_counter()))
+
+
+def print_startup_phases() -> None:
+    """Print the time taken by each phase of the controller's startup and the total."""
+    durations = ', '.join(
+        f'{name} {end - start:0.3f}s'
+        for (_, start), (name, end) in zip(_STARTUP_PHASES, _STARTUP_PHASES[1:])
+    )
+    total = _STARTUP_PHASES[-1][1] - _STARTUP_PHASES[0][1]
+    print(f"Controller started in {total:0.3f}s ({durations})")
 
 
-def run_usercode(robot_file: Path, robot_zone: int, game_mode: str) -> None:
+def run_usercode(
+    robot_file: Path,
+    robot_zone: int,
+    game_mode: str,
+    profile_mode: str | None = None,
+    profile_stem: Path | None = None,
+) -> None:
     """
     Run the user's code from the given file.
 
@@ -62,6 +114,8 @@ def run_usercode(robot_file: Path, robot_zone: int, game_mode: str) -> None:
     :param robot_file: The path to the robot file
     :param robot_zone: The zone number
     :param game_mode: The game mode string ('dev' or 'comp')
+    :param profile_mode: The mode to profile the usercode in, None to disable profiling
+    :param profile_stem: The path, without a suffix, to write the profiles to
     :raises Exception: If the usercode raises an exception
     """
     # Remove this folder from the path
@@ -86,7 +140,8 @@ def run_usercode(robot_file: Path, robot_zone: int, game_mode: str) -> None:
 
         # Run the usercode
         # pass robot object to the usercode for keyboard robot control
-        runpy.run_path(str(robot_file), init_globals={'__robot__': robot})
+        with profile_usercode(profile_mode, profile_stem or robot_file.with_suffix('')):
+            runpy.run_path(str(robot_file), init_globals={'__robot__': robot})
 
 
 def main() -> bool:
@@ -99,7 +154,19 @@ def main() -> bool:
     The zone number is passed as the first argument to the script using
     controllerArgs on the robot.
 
-    On completion, the devices are stopped and atexit functions are run.
+    On completion, the output so far is flushed and the devices are stopped.
+    Cleanup code registered with atexit by the usercode runs when the
+    controller exits.
+
+    Setting the WEBOTS_DEVICE_TRACE environment variable records a timeline of the
+    controller's activity, which is saved as a Chrome trace file next to the log file.
+
+    Setting the WEBOTS_USERCODE_PROFILE environment variable to 'cprofile' or
+    'sample' profiles the usercode, saving the profiles next to the log file.
+
+    Setting the WEBOTS_CHARGE_COMPUTE environment variable to a number charges the
+    usercode simulated time for its computation, at that many simulated seconds
+    per second of wall-clock time.
     """
     zone = int(sys.argv[1])
     game_mode = get_game_mode()
@@ -113,35 +180,95 @@ def main() -> bool:
         # Not having a robot file is not an error in dev mode
         return game_mode != 'comp'
 
-    # Setup log file
+    match_id = get_match_identifier()
+
+    trace_path = None
+    if os.environ.get('WEBOTS_DEVICE_TRACE'):
+        TRACER.enable()
+        trace_path = robot_file.parent / f'trace-zone-{zone}-{match_id}.json'
+
+    # Setup log file, limiting the output so a runaway print loop can't flood it
     prefix_and_tee_streams(
-        robot_file.parent / f'log-zone-{zone}-{get_match_identifier()}.txt',
+        robot_file.parent / f'log-zone-{zone}-{match_id}.txt',
         prefix=lambda: f'[{zone}| {robot.getTime():0.3f}] ',
+        budget=LogBudget(robot.getTime),
+        records=log_records_from_env(robot.getTime, zone),
     )
+    end_startup_phase('setup logging')
 
     # Setup devices
-    devices = start_devices()
+    # Seed device noise from the match and zone so competition matches are reproducible
+    match_number = get_match_data().match_number
+    with TRACER.span('start devices', 'usercode'):
+        devices = start_devices(
+            noise_seed=None if match_number is None else [match_number, zone],
+        )
+    end_startup_phase('start devices')
+    # Write a summary of the device command metrics alongside the log when the devices stop
+    devices.metrics_path = robot_file.parent / f'metrics-zone-{zone}-{match_id}.json'
+    # Periodically record the time spent between steps for the supervisor to attribute stalls
+    get_globals().stalls.path = robot_file.parent / f'stalls-zone-{zone}-{match_id}.json'
+    if compute_scale := os.environ.get('WEBOTS_CHARGE_COMPUTE'):
+        try:
+            devices.compute_time_scale = float(compute_scale)
+        except ValueError:
+            pass
+        if devices.compute_time_scale is None or devices.compute_time_scale <= 0:
+            LOGGER.warning(f'Ignoring invalid WEBOTS_CHARGE_COMPUTE value {compute_scale!r}')
+            devices.compute_time_scale = None
+
+    profile_mode = os.environ.get('WEBOTS_USERCODE_PROFILE') or None
+    if profile_mode is not None and profile_mode not in PROFILE_MODES:
+        LOGGER.warning(
+            f'Ignoring invalid WEBOTS_USERCODE_PROFILE value {profile_mode!r}, '
+            f'expected one of {PROFILE_MODES}'
+        )
+        profile_mode = None
 
     # Print the simulation version
     print_simulation_version()
+    end_startup_phase('print version')
 
     # Pass the devices to the usercode
     os.environ['WEBOTS_SIMULATOR'] = '1'
     os.environ['WEBOTS_ROBOT'] = devices.links_formatted()
 
+    # Record the resources used by the controller alongside the log
+    resource_sampler = ResourceSampler(
+        robot_file.parent / f'resources-zone-{zone}-{match_id}.csv',
+        sim_time=robot.getTime,
+    )
+    resource_sampler.start()
+
     # Start devices in a separate thread
-    thread = threading.Thread(target=devices.run)
+    thread = threading.Thread(target=devices.run, name='devices')
     thread.start()
+    end_startup_phase('start threads')
+    print_startup_phases()
 
     # Run the usercode
     try:
-        run_usercode(robot_file, zone, game_mode)
+        with TRACER.span('run usercode', 'usercode'):
+            run_usercode(
+                robot_file,
+                zone,
+                game_mode,
+                profile_mode=profile_mode,
+                profile_stem=robot_file.parent / f'profile-zone-{zone}-{match_id}',
+            )
     finally:
-        # Run cleanup code registered in the usercode
-        atexit._run_exitfuncs()  # noqa: SLF001
+        # Write the usercode's output, leaving the exit handlers to write anything after
+        with TRACER.span('flush logs', 'usercode'):
+            flush_logs()
         # Cleanup devices
         devices.completed = True
         devices.stop_event.set()
+        resource_sampler.stop()
+
+        if trace_path is not None:
+            # Wait for the devices to stop so their spans are complete
+            thread.join()
+            TRACER.export(trace_path)
 
     return True
 
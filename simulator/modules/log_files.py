@@ -0,0 +1,211 @@
+"""
+Read and compress log files that may have been rotated or compressed.
+
+Logs are written as plain text. Once a log grows past a size limit it is
+rotated: the file is renamed to a numbered segment and compressed, and a new
+file is started in its place. So the log 'log.txt' may be made up of the
+segments 'log.1.txt.gz', 'log.2.txt.gz', ... followed by 'log.txt' itself.
+Logs may also be compressed as a whole when they are archived.
+
+The functions here read a log across all of its segments, whichever
+compression each segment uses, so it can be tailed while it is being written.
+"""
+from __future__ import annotations
+
+import gzip
+import io
+import lzma
+import os
+import shutil
+import time
+from collections import deque
+from pathlib import Path
+from typing import IO, Iterator, TextIO
+
+# The compression methods that can be used for logs and the suffix they add
+COMPRESSION_SUFFIXES = {'gzip': '.gz', 'lzma': '.xz'}
+_COMPRESSED_SUFFIXES = tuple(COMPRESSION_SUFFIXES.values())
+COPY_CHUNK_SIZE = 1024 * 1024
+
+
+def segment_path(path: Path, index: int) -> Path:
+    """
+    Get the uncompressed path of a rotated segment of a log.
+
+    :param path: The path the log is written to.
+    :param index: The number of the segment, starting at 1 for the oldest.
+    """
+    return path.with_name(f'{path.stem}.{index}{path.suffix}')
+
+
+def _existing(path: Path) -> Path | None:
+    # Prefer the uncompressed file, it is only removed once compression has finished
+    for candidate in (path, *(
+        path.with_name(path.name + suffix) for suffix in _COMPRESSED_SUFFIXES
+    )):
+        if candidate.exists():
+            return candidate
+    return None
+
+
+def log_segments(path: Path) -> list[Path]:
+    """
+    Find the files making up a log, oldest first.
+
+    :param path: The path the log is written to, or the compressed log itself.
+    :return: The existing segments of the log, compressed or not.
+    """
+    if path.suffix in _COMPRESSED_SUFFIXES:
+        path = path.with_suffix('')
+
+    segments = []
+    index = 1
+    while (segment := _existing(segment_path(path, index))) is not None:
+        segments.append(segment)
+        index += 1
+    if (active := _existing(path)) is not None:
+        segments.append(active)
+    return segments
+
+
+def open_log(path: Path) -> TextIO:
+    """Open a single log file for reading, decompressing it if needed."""
+    if path.suffix == '.gz':
+        return gzip.open(path, 'rt', encoding='utf-8', errors='replace')
+    if path.suffix == '.xz':
+        return lzma.open(path, 'rt', encoding='utf-8', errors='replace')
+    return path.open(encoding='utf-8', errors='replace')
+
+
+def wrap_log(log_file: IO[bytes], name: str) -> TextIO:
+    """
+    Read a single log from a binary file object, such as a member of a zip file.
+
+    :param log_file: The file object to read.
+    :param name: The name of the log, used to detect its compression.
+    """
+    if name.endswith('.gz'):
+        return gzip.open(  # type: ignore[return-value]
+            log_file, 'rt', encoding='utf-8', errors='replace')
+    if name.endswith('.xz'):
+        return lzma.open(  # type: ignore[return-value]
+            log_file, 'rt', encoding='utf-8', errors='replace')
+    return io.TextIOWrapper(log_file, encoding='utf-8', errors='replace')
+
+
+def read_log(path: Path) -> Iterator[str]:
+    """
+    Read the lines of a log across all of its segments.
+
+    :param path: The path the log is written to, or the compressed log itself.
+    """
+    for segment in log_segments(path):
+        with open_log(segment) as log_file:
+            yield from log_file
+
+
+def compress_log(path: Path, method: str = 'gzip') -> Path:
+    """
+    Compress a log file in place, removing the uncompressed file.
+
+    The compressed file is written under a temporary name, so an interrupted
+    compression never leaves a truncated log.
+
+    :param path: The log file to compress.
+    :param method: The compression method, one of COMPRESSION_SUFFIXES.
+    :return: The path of the compressed file.
+    """
+    compressed = path.with_name(path.name + COMPRESSION_SUFFIXES[method])
+    tmp_path = compressed.with_name(compressed.name + '.tmp')
+    destination: gzip.GzipFile | lzma.LZMAFile
+    if method == 'gzip':
+        destination = gzip.open(tmp_path, 'wb')
+    else:
+        destination = lzma.open(tmp_path, 'wb')
+    with path.open('rb') as source, destination:
+        shutil.copyfileobj(source, destination, COPY_CHUNK_SIZE)
+    os.replace(tmp_path, compressed)
+    path.unlink()
+    return compressed
+
+
+def _is_rotated(path: Path, log_file: TextIO) -> bool:
+    try:
+        return os.stat(path).st_ino != os.fstat(log_file.fileno()).st_ino
+    except FileNotFoundError:
+        return True
+
+
+def tail_log(
+    path: Path,
+    num_lines: int = 10,
+    follow: bool = False,
+    poll_interval: float = 0.5,
+) -> Iterator[str]:
+    """
+    Read the end of a log, optionally following it as it is written.
+
+    Only as many segments as are needed are read. When following, rotation of
+    the log is detected and the new file is followed, and following stops if
+    the log is compressed as a whole.
+
+    :param path: The path the log is written to.
+    :param num_lines: The number of lines from the end of the log to return.
+    :param follow: Whether to continue returning lines as they are written.
+    :param poll_interval: How often to check for new lines when following, in seconds.
+    """
+    if path.suffix in _COMPRESSED_SUFFIXES:
+        # A compressed log is no longer being written
+        follow = False
+
+    segments = log_segments(path)
+    active = None
+    if follow and segments and segments[-1] == path:
+        # Keep the active file open so nothing written after the tail is missed
+        active = open_log(segments.pop())
+
+    lines: list[str] = list(deque(active, maxlen=num_lines)) if active is not None else []
+    partial = ''
+    if lines and not lines[-1].endswith('\n'):
+        # Hold the incomplete line until it is finished
+        partial = lines.pop()
+    for segment in reversed(segments):
+        if len(lines) >= num_lines:
+            break
+        with open_log(segment) as log_file:
+            lines = list(deque(log_file, maxlen=num_lines - len(lines))) + lines
+    yield from lines[-num_lines:] if num_lines else []
+
+    if not follow:
+        return
+
+    while True:
+        if active is None:
+            if path.exists():
+                active = open_log(path)
+            elif _existing(path) is not None:
+                # The log has been compressed, so is no longer being written
+                return
+            else:
+                time.sleep(poll_interval)
+                continue
+
+        line = active.readline()
+        if line:
+            partial += line
+            if partial.endswith('\n'):
+                yield partial
+                partial = ''
+            continue
+
+        if _is_rotated(path, active):
+            # Read anything written to the old file before it was rotated
+            remaining = (partial + active.read()).splitlines(keepends=True)
+            partial = ''
+            if remaining and not remaining[-1].endswith('\n'):
+                partial = remaining.pop()
+            yield from remaining
+            active.close()
+            active = None
+            continue
+        time.sleep(poll_interval)
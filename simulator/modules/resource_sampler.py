@@ -0,0 +1,234 @@
+"""
+Sample the resources used by a robot controller process.
+
+A background thread records the process's CPU time, resident memory, thread
+count, context switches and garbage collection pauses at a fixed wall-clock
+period. Samples are appended to a CSV file so they survive the process being
+killed, and can be summarised after the match.
+
+Resource usage is read from /proc where available, otherwise falling back to
+the portable subset available from the standard library. That only gives the
+peak resident memory, so the current resident memory is left blank.
+"""
+from __future__ import annotations
+
+import csv
+import gc
+import os
+import sys
+import threading
+import time
+from pathlib import Path
+from typing import Any, Callable, TextIO
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None  # type: ignore[assignment]
+
+PROC_STATUS = Path('/proc/self/status')
+
+FIELDS = [
+    'wall_time_s',
+    'sim_time_s',
+    'cpu_user_s',
+    'cpu_system_s',
+    'rss_kb',
+    'peak_rss_kb',
+    'threads',
+    'voluntary_ctx_switches',
+    'involuntary_ctx_switches',
+    'gc_collections',
+    'gc_pause_ms',
+    'gc_max_pause_ms',
+]
+
+
+class GcPauseTracker:
+    """Record the time spent in garbage collection using gc.callbacks."""
+
+    def __init__(self) -> None:
+        self.collections = 0
+        self.pause_ns = 0
+        self.max_pause_ns = 0
+        self._start = 0
+
+    def _callback(self, phase: str, info: dict[str, int]) -> None:
+        if phase == 'start':
+            self._start = time.perf_counter_ns()
+        else:
+            pause = time.perf_counter_ns() - self._start
+            self.collections += 1
+            self.pause_ns += pause
+            if pause > self.max_pause_ns:
+                self.max_pause_ns = pause
+
+    def install(self) -> None:
+        """Start recording garbage collection pauses."""
+        gc.callbacks.append(self._callback)
+
+    def uninstall(self) -> None:
+        """Stop recording garbage collection pauses."""
+        if self._callback in gc.callbacks:
+            gc.callbacks.remove(self._callback)
+
+
+def _read_proc_status() -> dict[str, int]:
+    values = {}
+    with PROC_STATUS.open() as status:
+        for line in status:
+            key, _, value = line.partition(':')
+            if key in ('VmRSS', 'VmHWM', 'Threads', 'voluntary_ctxt_switches',
+                       'nonvoluntary_ctxt_switches'):
+                values[key] = int(value.split()[0])
+    return values
+
+
+class ResourceSampler:
+    """
+    Periodically sample the resources used by this process into a CSV file.
+
+    :param path: The CSV file to write the samples to.
+    :param period: The wall-clock time between samples in seconds.
+    :param sim_time: A function returning the current simulated time.
+    """
+
+    def __init__(
+        self,
+        path: Path,
+        period: float = 1.0,
+        sim_time: Callable[[], float] | None = None,
+    ) -> None:
+        self.path = path
+        self.period = period
+        self._sim_time = sim_time
+        self._gc = GcPauseTracker()
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+        self._file: TextIO | None = None
+        self._start = 0.0
+
+    def start(self) -> None:
+        """Start sampling in a background thread."""
+        self._file = self.path.open('w', newline='')
+        self._writer = csv.writer(self._file)
+        self._writer.writerow(FIELDS)
+        self._start = time.perf_counter()
+        self._gc.install()
+        self._write_sample()
+        self._thread = threading.Thread(
+            target=self._run, name='resource sampler', daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        """Stop sampling, recording a final sample."""
+        if self._thread is None or self._file is None:
+            return
+        self._stop.set()
+        self._thread.join()
+        self._gc.uninstall()
+        self._file.close()
+        self._thread = None
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.period):
+            self._write_sample()
+        self._write_sample()
+
+    def _write_sample(self) -> None:
+        assert self._file is not None
+        self._writer.writerow(self.sample())
+        # Flush each row so the samples survive the process being killed
+        self._file.flush()
+
+    def sample(self) -> list[Any]:
+        """Return the current resource usage, in the order of FIELDS."""
+        times = os.times()
+        try:
+            status = _read_proc_status()
+            rss_kb: int | str = status['VmRSS']
+            peak_rss_kb = status['VmHWM']
+            threads = status['Threads']
+            voluntary = status['voluntary_ctxt_switches']
+            involuntary = status['nonvoluntary_ctxt_switches']
+        except (OSError, KeyError, ValueError):
+            threads = threading.active_count()
+            # Only the peak resident memory is available
+            rss_kb = ''
+            peak_rss_kb = voluntary = involuntary = 0
+            if resource is not None:
+                usage = resource.getrusage(resource.RUSAGE_SELF)
+                peak_rss_kb = usage.ru_maxrss
+                if sys.platform == 'darwin':
+                    # macOS reports this in bytes rather than KiB
+                    peak_rss_kb //= 1024
+                voluntary = usage.ru_nvcsw
+                involuntary = usage.ru_nivcsw
+
+        return [
+            round(time.perf_counter() - self._start, 3),
+            round(self._sim_time(), 3) if self._sim_time is not None else '',
+            round(times.user, 3),
+            round(times.system, 3),
+            rss_kb,
+            peak_rss_kb,
+            threads,
+            voluntary,
+            involuntary,
+            self._gc.collections,
+            round(self._gc.pause_ns / 1e6, 3),
+            round(self._gc.max_pause_ns / 1e6, 3),
+        ]
+
+
+def summarise_resources(path: Path) -> dict[str, Any]:
+    """
+    Summarise the samples in a resource CSV file.
+
+    :param path: The CSV file written by a ResourceSampler.
+    :return: A JSON serialisable summary of the resources used.
+    :raises ValueError: If the file contains no samples.
+    """
+    with path.open(newline='') as csv_file:
+        rows = [
+            {key: float(value or 0) for key, value in row.items()}
+            for row in csv.DictReader(csv_file)
+        ]
+    if not rows:
+        raise ValueError(f'{path} contains no samples')
+
+    first, last = rows[0], rows[-1]
+    peak_cpu_percent = 0.0
+    for previous, current in zip(rows, rows[1:]):
+        wall = current['wall_time_s'] - previous['wall_time_s']
+        cpu = (
+            current['cpu_user_s'] + current['cpu_system_s']
+            - previous['cpu_user_s'] - previous['cpu_system_s']
+        )
+        if wall > 0:
+            peak_cpu_percent = max(peak_cpu_percent, 100 * cpu / wall)
+
+    # CPU time and context switches are cumulative since the process started
+    cpu_s = (
+        last['cpu_user_s'] + last['cpu_system_s']
+        - first['cpu_user_s'] - first['cpu_system_s']
+    )
+    return {
+        'samples': len(rows),
+        'wall_time_s': last['wall_time_s'],
+        'cpu_s': round(cpu_s, 3),
+        'mean_cpu_percent': round(100 * cpu_s / last['wall_time_s'], 1)
+        if last['wall_time_s'] > 0 else 0.0,
+        'peak_cpu_percent': round(peak_cpu_percent, 1),
+        'peak_rss_mb': round(max(
+            max(row['rss_kb'], row.get('peak_rss_kb', 0)) for row in rows
+        ) / 1024, 1),
+        'max_threads': int(max(row['threads'] for row in rows)),
+        'voluntary_ctx_switches': int(
+            last['voluntary_ctx_switches'] - first['voluntary_ctx_switches']),
+        'involuntary_ctx_switches': int(
+            last['involuntary_ctx_switches'] - first['involuntary_ctx_switches']),
+        'gc_collections': int(last['gc_collections']),
+        'gc_pause_ms': last['gc_pause_ms'],
+        'gc_max_pause_ms': last['gc_max_pause_ms'],
+    }
@@ -3,42 +3,600 @@ Classes and functions for logging robot data to a file.
 
 Includes utilities for prefixing log lines and teeing a stream to multiple
 destinations.
+
+Writes are batched by a background writer thread rather than flushed on every
+write, so printing in a tight loop doesn't hold up the simulation. The buffered
+output is flushed on exit, on uncaught exceptions and on termination signals so
+the tail of the log isn't lost.
+
+The output of robot code can also be limited, so a runaway print loop can't
+produce a log file too large to archive. Repeated lines are folded into a
+single line and output beyond the zone's budget is dropped, with a marker
+written in its place.
+
+Logs can optionally be written as JSON lines records, with the simulated and
+wall-clock time, zone and stream of each line, for analysis after the match.
+scripts/render_logs.py renders these back to text and merges logs by time.
+
+Log files are rotated once they grow past a size limit, with the older
+segments compressed. See log_files for reading rotated logs.
 """
 from __future__ import annotations
 
+import atexit
+import faulthandler
+import json
+import logging
+import os
+import signal
 import sys
+import threading
+import time
+from contextlib import suppress
 from datetime import datetime
 from io import TextIOWrapper
 from pathlib import Path
-from typing import Callable, TextIO
+from types import FrameType, TracebackType
+from typing import Any, Callable, TextIO
 
+from log_files import compress_log, segment_path
 from robot_utils import get_match_data
 
+LOGGER = logging.getLogger(__name__)
+
 DATE_IDENTIFIER = datetime.now().strftime("%Y_%m_%dT%H_%M_%S")
+# The log formats that can be selected with the WEBOTS_LOG_FORMAT environment variable
+LOG_FORMATS = ('text', 'jsonl')
+# The maximum time written data is buffered for, in seconds
+FLUSH_INTERVAL = 0.2
+# The amount of buffered data that triggers an early flush, in characters
+FLUSH_SIZE = 64 * 1024
+# The log output allowed for each zone, in bytes per simulated second
+LOG_RATE_LIMIT = 64 * 1024
+# The maximum log output for each zone, in bytes
+LOG_SIZE_LIMIT = 32 * 1024 * 1024
+# How often a run of folded repeated lines is reported, in simulated seconds
+FOLD_REPORT_INTERVAL = 1.0
+# Partial lines longer than this are written without waiting for the end of the line
+PARTIAL_LINE_LIMIT = 4096
+# The size a log file is rotated at, in bytes
+LOG_ROTATE_SIZE = 8 * 1024 * 1024
+
+# Write the output held by the teed streams, in order, run by flush_logs
+_FLUSH_HANDLERS: list[Callable[[], None]] = []
+
+
+class RotatingLogFile(TextIOWrapper):
+    """
+    A log file that is rotated once it grows past a size limit.
+
+    The size is checked when the file is flushed. The file is then renamed to
+    the next numbered segment and a new file is started. The segment is left to
+    be compressed by compress_segments, so that a flush doesn't wait for it.
+    If the file can't be renamed, for example because it is open elsewhere on
+    Windows, rotation is retried once it has grown by the limit again.
+
+    :param path: The path to write the log to.
+    :param max_size: The size in bytes to rotate the file at.
+    :param compression: The compression method for rotated segments.
+    """
+
+    def __init__(
+        self,
+        path: Path,
+        max_size: int = LOG_ROTATE_SIZE,
+        compression: str = 'gzip',
+    ) -> None:
+        self.path = path
+        self.max_size = max_size
+        self.compression = compression
+        # Called with the new file after each rotation
+        self.on_rotate: Callable[[TextIO], None] | None = None
+        self._file = path.open(mode='w')
+        self._next_rotation = max_size
+        self._segments = 0
+        # Rotated segments that are waiting to be compressed
+        self._uncompressed: list[Path] = []
+
+    def write(self, data: str, /) -> int:
+        """Writes the given data to the current file."""
+        return self._file.write(data)
+
+    def flush(self) -> None:
+        """Flushes the current file, rotating it if it has grown past the size limit."""
+        self._file.flush()
+        if os.fstat(self._file.fileno()).st_size >= self._next_rotation:
+            self._rotate()
+
+    def fileno(self) -> int:
+        """Returns the file descriptor of the current file."""
+        return self._file.fileno()
+
+    def close(self) -> None:
+        """Closes the current file."""
+        self._file.close()
+
+    def _rotate(self) -> None:
+        segment = segment_path(self.path, self._segments + 1)
+        self._file.close()
+        try:
+            os.replace(self.path, segment)
+        except OSError:
+            self._file = self.path.open(mode='a')
+            self._next_rotation = os.fstat(self._file.fileno()).st_size + self.max_size
+            return
+
+        self._segments += 1
+        self._file = self.path.open(mode='w')
+        self._next_rotation = self.max_size
+        if self.on_rotate is not None:
+            self.on_rotate(self._file)
+        self._uncompressed.append(segment)
+
+    def compress_segments(self) -> None:
+        """
+        Compress the segments rotated since the last call.
+
+        Should only be called from a single thread.
+        """
+        while self._uncompressed:
+            segment = self._uncompressed.pop(0)
+            with suppress(OSError):
+                # If compression fails the segment is left uncompressed
+                compress_log(segment, self.compression)
+
+
+class LogWriter:
+    """
+    Batches writes to console streams and a log file on a background thread.
+
+    Data is written to the console stream it was written for and, unless
+    excluded, to the log file, in the order it was written. The thread exits once the main
+    thread has finished, after writing any remaining data. Rotated segments of
+    the log file are compressed on the thread, so a flush from another thread
+    isn't held up by the compression.
+
+    :param log_file: The file that all data is also written to.
+    :param flush_interval: The maximum time data is buffered for in seconds.
+    :param flush_size: The amount of buffered data that triggers an early flush.
+    """
+
+    def __init__(
+        self,
+        log_file: TextIO,
+        flush_interval: float = FLUSH_INTERVAL,
+        flush_size: int = FLUSH_SIZE,
+    ) -> None:
+        self.log_file = log_file
+        self.flush_interval = flush_interval
+        self.flush_size = flush_size
+        self._pending: list[tuple[TextIO | None, str, bool]] = []
+        self._pending_size = 0
+        # Re-entrant as the signal handlers may flush while the main thread is writing
+        self._buffer_lock = threading.RLock()
+        self._write_lock = threading.RLock()
+        self._wake = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='log writer')
+        self._thread.start()
+
+    def write(self, stream: TextIO | None, data: str, log: bool = True) -> None:
+        """
+        Buffer data to be written to a console stream and the log file.
+
+        :param stream: The console stream to write the data to, None to only write to the log.
+        :param data: The data to write.
+        :param log: Whether to write the data to the log file.
+        """
+        with self._buffer_lock:
+            self._pending.append((stream, data, log))
+            self._pending_size += len(data)
+            if self._pending_size >= self.flush_size:
+                self._wake.set()
+
+    def flush(self) -> None:
+        """Write all buffered data and flush the streams."""
+        with self._write_lock:
+            with self._buffer_lock:
+                pending, self._pending = self._pending, []
+                self._pending_size = 0
+            if not pending:
+                return
+
+            streams: dict[int, TextIO] = {}
+            for stream, data, _ in pending:
+                if stream is not None:
+                    stream.write(data)
+                    streams[id(stream)] = stream
+            self.log_file.write(''.join(data for _, data, log in pending if log))
+
+            for stream in streams.values():
+                stream.flush()
+            self.log_file.flush()
+
+    def _run(self) -> None:
+        main_thread = threading.main_thread()
+        while main_thread.is_alive():
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            self.flush()
+            self._compress_segments()
+        # Write anything output during shutdown, such as an uncaught exception
+        self.flush()
+        self._compress_segments()
+
+    def _compress_segments(self) -> None:
+        if isinstance(self.log_file, RotatingLogFile):
+            self.log_file.compress_segments()
+
+    def install_handlers(self) -> None:
+        """
+        Flush the buffered data on exit, uncaught exceptions and termination signals.
+
+        Hard crashes, such as segmentation faults, can't run Python code, so a
+        traceback of each thread is written directly to the log file instead.
+        Must be called from the main thread.
+        """
+        atexit.register(self.flush)
+
+        previous_excepthook = sys.excepthook
+
+        def excepthook(
+            exc_type: type[BaseException],
+            exc_value: BaseException,
+            traceback: TracebackType | None,
+        ) -> None:
+            previous_excepthook(exc_type, exc_value, traceback)
+            self.flush()
+
+        sys.excepthook = excepthook
+
+        for signal_name in ('SIGTERM', 'SIGHUP'):
+            signum = getattr(signal, signal_name, None)
+            if signum is not None:
+                signal.signal(signum, self._handle_signal)
+
+        faulthandler.enable(self.log_file, all_threads=True)
+        if isinstance(self.log_file, RotatingLogFile):
+            self.log_file.on_rotate = lambda log_file: faulthandler.enable(
+                log_file, all_threads=True)
+
+    def _handle_signal(self, signum: int, frame: FrameType | None) -> None:
+        # The stream frontends may be holding a partial line
+        for stream in (sys.stdout, sys.stderr):
+            with suppress(Exception):
+                stream.flush()
+        self.flush()
+        # Restore the default action and resend the signal so the process exits as normal
+        signal.signal(signum, signal.SIG_DFL)
+        os.kill(os.getpid(), signum)
 
 
 class Tee(TextIOWrapper):
-    """Forwards calls from its `write` and `flush` methods to each of the given targets."""
+    """Forwards writes to a console stream and the log file through a LogWriter."""
 
-    def __init__(self, *streams: TextIO) -> None:
-        self.streams = streams
+    def __init__(self, stream: TextIO, writer: LogWriter, log: bool = True) -> None:
+        self.stream = stream
+        self.writer = writer
+        self.log = log
 
     def write(self, data: str, /) -> int:
         """
-        Writes the given data to all streams in the logger.
+        Buffers the given data to be written to the console stream and the log file.
 
         :param data: The data to be written to the stream.
         """
-        written = 0
-        for stream in self.streams:
-            written = stream.write(data)
-        self.flush()
-        return written
+        self.writer.write(self.stream, data, self.log)
+        return len(data)
 
     def flush(self) -> None:
-        """Flushes all the streams in the logger."""
-        for stream in self.streams:
-            stream.flush()
+        """Writes all buffered data and flushes the streams."""
+        self.writer.flush()
+
+    def __getattr__(self, name: str) -> Any:
+        # Forward other attributes, such as fileno, to the console stream
+        return getattr(self.stream, name)
+
+
+class LogRecords:
+    """
+    Formats the lines written to the log as JSON records.
+
+    Each record holds the simulated and wall-clock time the line was started,
+    the zone and stream it came from and the text of the line, including its
+    newline. A line is split over multiple records if it is flushed before it
+    ends.
+
+    :param sim_time: A function returning the current simulated time.
+    :param zone: The zone the output is from, None for the supervisor.
+    """
+
+    def __init__(self, sim_time: Callable[[], float], zone: int | None = None) -> None:
+        self.sim_time = sim_time
+        self.zone = zone
+
+    def format(self, stream: str, text: str, sim_time: float, wall_time: float) -> str:
+        """
+        Format a record as a line of JSON.
+
+        :param stream: The name of the stream the text was written to.
+        :param text: The text written.
+        :param sim_time: The simulated time the text was written.
+        :param wall_time: The wall-clock time the text was written, as a Unix timestamp.
+        """
+        return json.dumps(
+            {
+                'sim': round(sim_time, 3),
+                'wall': round(wall_time, 3),
+                'zone': self.zone,
+                'stream': stream,
+                'text': text,
+            },
+            separators=(',', ':'),
+        ) + '\n'
+
+
+class RecordTee(TextIOWrapper):
+    """
+    Forwards writes to a console stream and as JSON records to the log file.
+
+    :param console: The stream to forward the written text to.
+    :param writer: The LogWriter to write the records through.
+    :param records: The formatter for the records.
+    :param stream_name: The name of the stream, stored in the records.
+    """
+
+    def __init__(
+        self,
+        console: TextIO,
+        writer: LogWriter,
+        records: LogRecords,
+        stream_name: str,
+    ) -> None:
+        self.console = console
+        self.writer = writer
+        self.records = records
+        self.stream_name = stream_name
+        self._partial = ''
+        self._started = (0.0, 0.0)
+
+    def write(self, data: str, /) -> int:
+        """
+        Writes the given data to the console and each complete line as a record.
+
+        :param data: The data to be written to the stream.
+        """
+        self.console.write(data)
+        now = (self.records.sim_time(), time.time())
+        if not self._partial:
+            self._started = now
+
+        *lines, rest = data.split('\n')
+        for line in lines:
+            self._write_record(self._partial + line + '\n')
+            self._partial = ''
+            self._started = now
+        self._partial += rest
+        return len(data)
+
+    def flush(self) -> None:
+        """Writes any partial line as a record and flushes the console stream."""
+        if self._partial:
+            self._write_record(self._partial)
+            self._partial = ''
+        self.console.flush()
+
+    def _write_record(self, text: str) -> None:
+        self.writer.write(None, self.records.format(self.stream_name, text, *self._started))
+
+
+def log_records_from_env(
+    sim_time: Callable[[], float],
+    zone: int | None = None,
+) -> LogRecords | None:
+    """
+    Get the record formatter for the log format set by WEBOTS_LOG_FORMAT.
+
+    :param sim_time: A function returning the current simulated time.
+    :param zone: The zone the output is from, None for the supervisor.
+    :return: The formatter, or None if logs should be written as text.
+    """
+    log_format = os.environ.get('WEBOTS_LOG_FORMAT') or 'text'
+    if log_format not in LOG_FORMATS:
+        LOGGER.warning(
+            f'Ignoring invalid WEBOTS_LOG_FORMAT value {log_format!r}, '
+            f'expected one of {LOG_FORMATS}'
+        )
+        return None
+    if log_format == 'text':
+        return None
+    return LogRecords(sim_time, zone)
+
+
+class LogBudget:
+    """
+    Limits the rate and total size of the output written to a log.
+
+    An allowance of rate bytes accrues per simulated second, up to one second's
+    worth. A write is allowed while any allowance remains, so a single large
+    write can overdraw it. Once the allowance is used up, output is dropped
+    until a full second's worth has accrued again, so that a sustained flood
+    is logged in bursts rather than a line at a time. No output is allowed once
+    size_limit bytes have been written.
+
+    :param sim_time: A function returning the current simulated time.
+    :param rate: The output allowed in bytes per simulated second.
+    :param size_limit: The maximum total output in bytes.
+    """
+
+    def __init__(
+        self,
+        sim_time: Callable[[], float],
+        rate: int = LOG_RATE_LIMIT,
+        size_limit: int = LOG_SIZE_LIMIT,
+    ) -> None:
+        self.sim_time = sim_time
+        self.rate = rate
+        self.size_limit = size_limit
+        self.total = 0
+        self.dropped = 0
+        self._allowance = float(rate)
+        self._throttled = False
+        self._last_time = sim_time()
+        self._lock = threading.Lock()
+
+    @property
+    def exhausted(self) -> bool:
+        """Whether the maximum total output has been reached."""
+        return self.total >= self.size_limit
+
+    def consume(self, size: int) -> bool:
+        """
+        Check whether output is allowed, deducting it from the budget if so.
+
+        :param size: The size of the output in bytes.
+        :return: Whether the output should be written.
+        """
+        with self._lock:
+            now = self.sim_time()
+            self._allowance = min(
+                self.rate,
+                self._allowance + (now - self._last_time) * self.rate,
+            )
+            self._last_time = now
+            if self._allowance <= 0:
+                self._throttled = True
+            elif self._allowance >= self.rate:
+                self._throttled = False
+
+            if self._throttled or self.exhausted:
+                self.dropped += size
+                return False
+            self._allowance -= size
+            self.total += size
+            return True
+
+
+class LimitOutput(TextIOWrapper):
+    """
+    Folds repeated lines and drops output that exceeds a LogBudget.
+
+    Output is held until the end of each line so that repeated lines can be
+    detected, unless the stream is flushed or the line grows too long.
+    """
+
+    def __init__(self, stream: TextIO, budget: LogBudget) -> None:
+        self.stream = stream
+        self.budget = budget
+        self._partial = ''
+        # Whether the start of the current line has already been written
+        self._mid_line = False
+        self._line_start = True
+        self._last_line: str | None = None
+        self._repeats = 0
+        self._repeats_since = 0.0
+        self._dropped = 0
+        self._lock = threading.RLock()
+
+    def write(self, data: str, /) -> int:
+        """
+        Writes complete lines to the stream, folding repeats and dropping output over budget.
+
+        :param data: The data to be written to the stream.
+        """
+        with self._lock:
+            *lines, rest = data.split('\n')
+            for line in lines:
+                self._end_line(self._partial + line + '\n')
+                self._partial = ''
+            self._partial += rest
+            if len(self._partial) >= PARTIAL_LINE_LIMIT:
+                self._write_partial()
+            if (
+                self._repeats
+                and self.budget.sim_time() - self._repeats_since >= FOLD_REPORT_INTERVAL
+            ):
+                self._report_repeats()
+        return len(data)
+
+    def flush(self) -> None:
+        """Writes any partial line and flushes the stream."""
+        with self._lock:
+            self._write_partial()
+            self.stream.flush()
+
+    def finish(self) -> None:
+        """Writes all held output, including any pending count of repeated lines."""
+        with self._lock:
+            self._report_repeats()
+            self._write_partial()
+            self._report_dropped()
+            self.stream.flush()
+
+    def _end_line(self, line: str) -> None:
+        if self._mid_line:
+            # The start of this line has already been written, so it can't be folded
+            self._mid_line = False
+            self._emit(line)
+            return
+
+        if line == self._last_line:
+            if not self._repeats:
+                self._repeats_since = self.budget.sim_time()
+            self._repeats += 1
+            return
+
+        self._report_repeats()
+        self._last_line = line
+        self._emit(line)
+
+    def _write_partial(self) -> None:
+        if not self._partial:
+            return
+        self._report_repeats()
+        self._emit(self._partial)
+        self._partial = ''
+        self._mid_line = True
+        self._last_line = None
+
+    def _report_repeats(self) -> None:
+        if not self._repeats:
+            return
+        plural = 's' if self._repeats > 1 else ''
+        self._marker(f'Previous line repeated {self._repeats} more time{plural}')
+        self._repeats = 0
+
+    def _emit(self, data: str) -> None:
+        size = len(data.encode(errors='replace'))
+        if not self.budget.consume(size):
+            if not self._dropped:
+                if self.budget.exhausted:
+                    self._marker(
+                        f'Log size limit of {self.budget.size_limit / 1024**2:.0f}MiB '
+                        'reached, dropping all further output'
+                    )
+                else:
+                    self._marker(
+                        f'Log rate limit of {self.budget.rate / 1024:.0f}KiB per '
+                        'simulated second exceeded, dropping output'
+                    )
+            self._dropped += size
+            return
+
+        self._report_dropped()
+        self.stream.write(data)
+        self._line_start = data.endswith('\n')
+
+    def _report_dropped(self) -> None:
+        if self._dropped:
+            self._marker(f'Dropped {self._dropped} bytes of output')
+            self._dropped = 0
+
+    def _marker(self, message: str) -> None:
+        # Markers are always written on a line of their own and bypass the budget
+        if not self._line_start:
+            self.stream.write('\n')
+        self.stream.write(f'[{message}]\n')
+        self._line_start = True
 
 
 class InsertPrefix(TextIOWrapper):
@@ -62,6 +620,11 @@ class InsertPrefix(TextIOWrapper):
 
         :param data: The data to be written to the stream.
         """
+        if not self._line_start and '\n' not in data[:-1]:
+            # No new lines start within this data, so the prefix isn't needed
+            self._line_start = data.endswith('\n')
+            return self.stream.write(data)
+
         prefix = self._get_prefix()
         if not prefix:
             return self.stream.write(data)
@@ -87,34 +650,83 @@ class InsertPrefix(TextIOWrapper):
         to the underlying file or device.
         """
         self.stream.flush()
-        self.stream.flush()
 
 
-def prefix_and_tee_streams(name: Path, prefix: Callable[[], str] | str | None = None) -> None:
+def prefix_and_tee_streams(
+    name: Path,
+    prefix: Callable[[], str] | str | None = None,
+    budget: LogBudget | None = None,
+    records: LogRecords | None = None,
+) -> None:
     """
     Tee stdout and stderr also to the named log file.
 
+    If a budget is given, repeated lines on stdout are folded and output beyond
+    the budget is dropped. stderr is always written in full, so errors such as
+    an uncaught exception's traceback are never lost.
+
+    If records is given, the log file is written as JSON records, one per line,
+    with a .jsonl suffix. The console output is unchanged.
+
+    The log file is rotated once it grows past LOG_ROTATE_SIZE, with the older
+    segments compressed.
+
     Note: we intentionally don't provide a way to clean up the stream
     replacement so that any error handling from Python which causes us to exit
     is also captured by the log file.
     """
-    log_file = name.open(mode='w')
+    if records is not None:
+        name = name.with_suffix('.jsonl')
+    log_file = RotatingLogFile(name)
+    writer = LogWriter(log_file)
+    writer.install_handlers()
 
-    sys.stdout = InsertPrefix(
+    stdout: TextIO = InsertPrefix(
         Tee(
             sys.stdout,
-            log_file,
+            writer,
+            log=records is None,
         ),
         prefix=prefix,
     )
-    sys.stderr = InsertPrefix(
+    stderr: TextIO = InsertPrefix(
         Tee(
             sys.stderr,
-            log_file,
+            writer,
+            log=records is None,
         ),
         prefix=prefix,
     )
 
+    if records is not None:
+        stdout = RecordTee(stdout, writer, records, 'stdout')
+        stderr = RecordTee(stderr, writer, records, 'stderr')
+
+    if budget is not None:
+        # stderr isn't limited so that errors and tracebacks are never dropped
+        limited_stdout = LimitOutput(stdout, budget)
+        # Registered after the writer's flush so it runs first
+        atexit.register(limited_stdout.finish)
+        _FLUSH_HANDLERS.append(limited_stdout.finish)
+        stdout = limited_stdout
+    else:
+        _FLUSH_HANDLERS.append(stdout.flush)
+    _FLUSH_HANDLERS.extend((stderr.flush, writer.flush))
+
+    sys.stdout = stdout
+    sys.stderr = stderr
+
+
+def flush_logs() -> None:
+    """
+    Write all output held by the teed streams to the console and log file.
+
+    The streams are also flushed at exit, so this only needs to be called to
+    write the output before then, such as once the usercode has finished.
+    """
+    for handler in _FLUSH_HANDLERS:
+        handler()
+
 
 def get_match_identifier() -> str:
     """
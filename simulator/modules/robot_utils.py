@@ -1,12 +1,14 @@
 """General utilities that are useful across runners."""
 from __future__ import annotations
 
+import hashlib
 import json
+import os
 import platform
-import subprocess
 import sys
+import tempfile
 from pathlib import Path
-from typing import NamedTuple
+from typing import Any, Mapping, NamedTuple
 
 # Configure path to import the environment configuration
 sys.path.insert(0, str(Path(__file__).parents[1]))
@@ -15,6 +17,8 @@ import environment
 # Reset the path
 del sys.path[0]
 
+VERSION_CACHE_DIR = Path(tempfile.gettempdir()) / 'sbot_simulator_version'
+
 
 class MatchData(NamedTuple):
     """
@@ -24,12 +28,14 @@ class MatchData(NamedTuple):
     :param match_duration: The duration of the match in seconds
     :param video_enabled: Whether video recording is enabled
     :param video_resolution: The resolution of the video recording
+    :param teams: The teams in the match by TLA, each with the zone they are in
     """
 
     match_number: int | None = None
     match_duration: int = environment.DEFAULT_MATCH_DURATION
     video_enabled: bool = True
     video_resolution: tuple[int, int] = (1920, 1080)
+    teams: Mapping[str, Mapping[str, Any]] = {}
 
 
 def get_robot_file(robot_zone: int) -> Path:
@@ -80,13 +86,7 @@ def print_simulation_version() -> None:
     if version_file.exists():
         version = version_file.read_text().strip()
     else:
-        try:
-            version = subprocess.check_output(
-                ['git', 'describe', '--tags', '--always'],
-                cwd=str(environment.SIM_ROOT.resolve()),
-            ).decode().strip()
-        except subprocess.CalledProcessError:
-            version = 'unknown'
+        version = _git_version()
 
     print(
         f"Running simulator version: {version} in Python {platform.python_version()} "
@@ -94,6 +94,77 @@ def print_simulation_version() -> None:
     )
 
 
+def _git_version() -> str:
+    """
+    Get the version of the simulator from git describe.
+
+    As each controller runs this at startup, the result is cached keyed on the
+    current commit and tags, so the git subprocess only runs when they change.
+    """
+    cache_file = None
+    cache_key = _git_cache_key(environment.SIM_ROOT.resolve())
+    if cache_key is not None:
+        cache_file = VERSION_CACHE_DIR / f'{cache_key}.txt'
+        try:
+            return cache_file.read_text()
+        except OSError:
+            pass
+
+    import subprocess
+
+    try:
+        version = subprocess.check_output(
+            ['git', 'describe', '--tags', '--always'],
+            cwd=str(environment.SIM_ROOT.resolve()),
+        ).decode().strip()
+    except (subprocess.CalledProcessError, OSError):
+        return 'unknown'
+
+    if cache_file is not None:
+        try:
+            VERSION_CACHE_DIR.mkdir(parents=True, exist_ok=True)
+            # Write to a temporary file first as several controllers may start at once
+            tmp_file = cache_file.with_suffix(f'.{os.getpid()}.tmp')
+            tmp_file.write_text(version)
+            os.replace(tmp_file, cache_file)
+        except OSError:
+            pass
+    return version
+
+
+def _git_cache_key(path: Path) -> str | None:
+    """
+    Get a key identifying the current commit and tags of the git repository.
+
+    The git metadata is read directly to avoid running a subprocess.
+    Returns None if the repository can't be found or read.
+    """
+    for directory in (path, *path.parents):
+        git_dir = directory / '.git'
+        if git_dir.is_dir():
+            break
+    else:
+        return None
+
+    try:
+        head = (git_dir / 'HEAD').read_text().strip()
+        if head.startswith('ref: '):
+            ref = head[len('ref: '):]
+            try:
+                head = (git_dir / ref).read_text().strip()
+            except FileNotFoundError:
+                # The ref is only in packed-refs, which is included in the key below
+                pass
+        key_parts = [str(git_dir), head]
+        # Tags affect the described version
+        for tag_file in (git_dir / 'packed-refs', git_dir / 'refs' / 'tags'):
+            if tag_file.exists():
+                key_parts.append(str(tag_file.stat().st_mtime_ns))
+    except OSError:
+        return None
+    return hashlib.sha256('\n'.join(key_parts).encode()).hexdigest()
+
+
 def get_match_data() -> MatchData:
     """Load the match data from the match data file."""
     match_data_file = environment.ARENA_ROOT / 'match.json'
@@ -113,8 +184,28 @@ def get_match_data() -> MatchData:
                 raw_data.get('recording_config', {})
                 .get('video_resolution', default_match_data.video_resolution)
             ),
+            teams=raw_data.get('teams', default_match_data.teams),
         )
     else:
         match_data = default_match_data
 
     return match_data
+
+
+def update_match_file(updates: dict[str, Any]) -> None:
+    """
+    Add or replace top-level keys in the match data file.
+
+    The match file is created if it does not exist.
+
+    :param updates: The keys and values to set in the match file.
+    """
+    match_data_file = environment.ARENA_ROOT / 'match.json'
+
+    if match_data_file.exists():
+        raw_data = json.loads(match_data_file.read_text())
+    else:
+        raw_data = {}
+
+    raw_data.update(updates)
+    match_data_file.write_text(json.dumps(raw_data, indent=4))
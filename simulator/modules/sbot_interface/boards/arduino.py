@@ -10,6 +10,7 @@ from __future__ import annotations
 import logging
 
 from sbot_interface.devices.arduino_devices import BasePin, GPIOPinMode, UltrasonicSensor
+from sbot_interface.devices.util import LazyDevices
 
 LOGGER = logging.getLogger(__name__)
 
@@ -18,14 +19,19 @@ class Arduino:
     """
     A simulator for the SR Arduino board.
 
-    :param pins: A list of simulated devices connected to the Arduino board.
+    :param pins: The simulated devices connected to the Arduino board.
                  The list is indexed by the pin number and EmptyPin is used for
-                 unconnected pins.
+                 unconnected pins. Each device is only constructed when first used.
     :param asset_tag: The asset tag to report for the Arduino board.
     :param software_version: The software version to report for the Arduino board.
     """
 
-    def __init__(self, pins: list[BasePin], asset_tag: str, software_version: str = '2'):
+    def __init__(
+        self,
+        pins: LazyDevices[BasePin],
+        asset_tag: str,
+        software_version: str = '2',
+    ):
         self.pins = pins
         self.asset_tag = asset_tag
         self.software_version = software_version
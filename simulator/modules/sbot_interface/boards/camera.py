@@ -8,6 +8,7 @@ from __future__ import annotations
 
 import logging
 import struct
+from typing import Callable
 
 from sbot_interface.devices.camera import BaseCamera
 
@@ -25,15 +26,29 @@ class CameraBoard:
     """
     A simulator for the SRO Camera interface.
 
-    :param camera: The camera object to interface with.
+    :param camera: A factory for the camera object to interface with.
+                   The camera is only constructed when first used.
     :param asset_tag: The asset tag to report for the camera board.
     :param software_version: The software version to report for the camera board.
     """
 
-    def __init__(self, camera: BaseCamera, asset_tag: str, software_version: str = '1.0'):
+    def __init__(
+        self,
+        camera: Callable[[], BaseCamera],
+        asset_tag: str,
+        software_version: str = '1.0',
+    ):
         self.asset_tag = asset_tag
         self.software_version = software_version
-        self.camera = camera
+        self._camera_factory = camera
+        self._camera: BaseCamera | None = None
+
+    @property
+    def camera(self) -> BaseCamera:
+        """The camera object, constructed on first access."""
+        if self._camera is None:
+            self._camera = self._camera_factory()
+        return self._camera
 
     def handle_command(self, command: str) -> str | bytes:
         """
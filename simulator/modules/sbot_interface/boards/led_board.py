@@ -8,6 +8,7 @@ from __future__ import annotations
 import logging
 
 from sbot_interface.devices.led import RGB_COLOURS, BaseLed
+from sbot_interface.devices.util import LazyDevices
 
 LOGGER = logging.getLogger(__name__)
 
@@ -26,13 +27,19 @@ class LedBoard:
     """
     A simulator for the SRO LED hat.
 
-    :param leds: A list of simulated LEDs connected to the LED hat.
-                    The list is indexed by the LED number.
+    :param leds: The simulated LEDs connected to the LED hat.
+                    The list is indexed by the LED number and each LED
+                    is only constructed when first used.
     :param asset_tag: The asset tag to report for the LED hat.
     :param software_version: The software version to report for the LED hat.
     """
 
-    def __init__(self, leds: list[BaseLed], asset_tag: str, software_version: str = '1.0'):
+    def __init__(
+        self,
+        leds: LazyDevices[BaseLed],
+        asset_tag: str,
+        software_version: str = '1.0',
+    ):
         self.leds = leds
         self.asset_tag = asset_tag
         self.software_version = software_version
@@ -53,7 +60,7 @@ class LedBoard:
             return 'ACK'
         elif args[0] == '*RESET':
             LOGGER.info(f'Resetting led board {self.asset_tag}')
-            for led in self.leds:
+            for led in self.leds.constructed():
                 led.set_colour(0)
             return 'ACK'
         elif args[0] == 'LED':
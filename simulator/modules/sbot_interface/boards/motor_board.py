@@ -10,6 +10,7 @@ from __future__ import annotations
 import logging
 
 from sbot_interface.devices.motor import MAX_POWER, MIN_POWER, BaseMotor
+from sbot_interface.devices.util import LazyDevices
 
 LOGGER = logging.getLogger(__name__)
 
@@ -18,15 +19,16 @@ class MotorBoard:
     """
     A simulator for the SRv4 Motor Board.
 
-    :param motors: A list of simulated motors connected to the motor board.
-                     The list is indexed by the motor number.
+    :param motors: The simulated motors connected to the motor board.
+                     The list is indexed by the motor number and each motor
+                     is only constructed when first used.
     :param asset_tag: The asset tag to report for the motor board.
     :param software_version: The software version to report for the motor board.
     """
 
     def __init__(
         self,
-        motors: list[BaseMotor],
+        motors: LazyDevices[BaseMotor],
         asset_tag: str,
         software_version: str = '4.4.1'
     ):
@@ -51,7 +53,7 @@ class MotorBoard:
             return "0,0:12000"
         elif args[0] == '*RESET':
             LOGGER.info(f'Resetting motor board {self.asset_tag}')
-            for motor in self.motors:
+            for motor in self.motors.constructed():
                 motor.disable()
             return 'ACK'
         elif args[0] == 'MOT':
@@ -104,4 +106,4 @@ class MotorBoard:
 
         :return: The total current draw of all motors in mA.
         """
-        return sum(motor.get_current() for motor in self.motors)
+        return sum(motor.get_current() for motor in self.motors.constructed())
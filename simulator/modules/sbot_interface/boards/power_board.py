@@ -11,6 +11,7 @@ import logging
 
 from sbot_interface.devices.led import BaseLed
 from sbot_interface.devices.power import BaseButton, BaseBuzzer, Output
+from sbot_interface.devices.util import LazyDevices
 
 LOGGER = logging.getLogger(__name__)
 
@@ -25,8 +26,9 @@ class PowerBoard:
     """
     A simulator for the SRv4 Power Board.
 
-    :param outputs: A list of simulated outputs connected to the power board.
-                        The list is indexed by the output number.
+    :param outputs: The simulated outputs connected to the power board.
+                        The list is indexed by the output number and each output
+                        is only constructed when first used.
     :param buzzer: A simulated buzzer connected to the power board.
     :param button: A simulated button connected to the power board.
     :param leds: A tuple of simulated LEDs connected to the power board.
@@ -36,7 +38,7 @@ class PowerBoard:
 
     def __init__(
         self,
-        outputs: list[Output],
+        outputs: LazyDevices[Output],
         buzzer: BaseBuzzer,
         button: BaseButton,
         leds: tuple[BaseLed, BaseLed],
@@ -70,7 +72,7 @@ class PowerBoard:
             return f"0,0,0,0,0,0,0:{self.temp}:0:5000"
         elif args[0] == '*RESET':
             LOGGER.info(f'Resetting power board {self.asset_tag}')
-            for output in self.outputs:
+            for output in self.outputs.constructed():
                 output.set_output(False)
             self.buzzer.set_note(0, 0)
             self.leds[RUN_LED].set_colour(0)
@@ -189,4 +191,4 @@ class PowerBoard:
 
         :return: The total current draw of all outputs in mA.
         """
-        return sum(output.get_current() for output in self.outputs)
+        return sum(output.get_current() for output in self.outputs.constructed())
@@ -10,6 +10,7 @@ from __future__ import annotations
 import logging
 
 from sbot_interface.devices.servo import MAX_POSITION, MIN_POSITION, BaseServo
+from sbot_interface.devices.util import LazyDevices
 
 LOGGER = logging.getLogger(__name__)
 
@@ -18,13 +19,19 @@ class ServoBoard:
     """
     A simulator for the SRv4 Servo Board.
 
-    :param servos: A list of simulated servos connected to the servo board.
-                        The list is indexed by the servo number.
+    :param servos: The simulated servos connected to the servo board.
+                        The list is indexed by the servo number and each servo
+                        is only constructed when first used.
     :param asset_tag: The asset tag to report for the servo board.
     :param software_version: The software version to report for the servo board.
     """
 
-    def __init__(self, servos: list[BaseServo], asset_tag: str, software_version: str = '4.4'):
+    def __init__(
+        self,
+        servos: LazyDevices[BaseServo],
+        asset_tag: str,
+        software_version: str = '4.4',
+    ):
         self.servos = servos
         self.asset_tag = asset_tag
         self.software_version = software_version
@@ -47,7 +54,7 @@ class ServoBoard:
             return f"{self.watchdog_fail}:{self.pgood}"
         elif args[0] == '*RESET':
             LOGGER.info(f'Resetting servo board {self.asset_tag}')
-            for servo in self.servos:
+            for servo in self.servos.constructed():
                 servo.disable()
             return 'ACK'
         elif args[0] == 'SERVO':
@@ -102,4 +109,4 @@ class ServoBoard:
 
         :return: The total current draw of all servos in mA.
         """
-        return sum(servo.get_current() for servo in self.servos)
+        return sum(servo.get_current() for servo in self.servos.constructed())
@@ -0,0 +1,428 @@
+"""
+Load the configuration of the devices connected to the robot.
+
+The configuration is a JSON file listing the boards connected to the robot and
+the Webots device attached to each channel of those boards. It is validated once
+and compiled into a table of board and device entries which is cached, keyed on
+the hash of the file, so later controller startups skip parsing the
+configuration. The cache is private to the user, and the structure of cached
+entries is checked when loaded, falling back to the configuration file if it
+is invalid.
+
+Unconnected channels are listed as null and use the board's null device.
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+import os
+import tempfile
+from functools import partial
+from pathlib import Path
+from typing import Any, Callable, NamedTuple
+
+from sbot_interface.boards import (
+    Arduino,
+    CameraBoard,
+    LedBoard,
+    MotorBoard,
+    PowerBoard,
+    ServoBoard,
+    TimeServer,
+)
+from sbot_interface.boards.power_board import NUM_OUTPUTS
+from sbot_interface.devices.arduino_devices import (
+    EmptyPin,
+    MicroSwitch,
+    PressureSensor,
+    ReflectanceSensor,
+    UltrasonicSensor,
+)
+from sbot_interface.devices.arduino_devices import Led as PinLed
+from sbot_interface.devices.camera import Camera, NullCamera
+from sbot_interface.devices.led import Led, NullLed
+from sbot_interface.devices.motor import Motor, NullMotor
+from sbot_interface.devices.power import ConnectorOutput, NullBuzzer, Output, StartButton
+from sbot_interface.devices.servo import NullServo, Servo
+from sbot_interface.devices.util import LazyDevices, get_globals
+from sbot_interface.socket_server import Board
+
+LOGGER = logging.getLogger(__name__)
+
+DEFAULT_CONFIG = Path(__file__).parents[2] / 'protos' / 'SR2025bot.json'
+# Each user has their own cache directory so others can't plant entries in it
+CACHE_DIR = Path(tempfile.gettempdir()) / (
+    f'sbot_simulator_config-{os.getuid()}' if hasattr(os, 'getuid')
+    else f'sbot_simulator_config-{os.environ.get("USERNAME", "user")}'
+)
+# Increment when the compiled format changes to invalidate existing cache entries
+COMPILED_VERSION = 2
+
+
+class DeviceEntry(NamedTuple):
+    """
+    A device attached to a channel of a board.
+
+    :param device_type: The name of the device wrapper class.
+    :param device_name: The name of the Webots device.
+    :param options: Additional keyword arguments for the device wrapper.
+    """
+
+    device_type: str
+    device_name: str
+    options: dict[str, float]
+
+
+class BoardEntry(NamedTuple):
+    """
+    A board and the devices attached to its channels.
+
+    :param board_type: The name of the board class.
+    :param asset_tag: The asset tag to report for the board.
+    :param channels: The device on each channel, None for unconnected channels.
+    """
+
+    board_type: str
+    asset_tag: str
+    channels: list[DeviceEntry | None]
+
+
+class OptionSpec(NamedTuple):
+    """
+    An option that can be given for a device.
+
+    :param kind: The type of the option, integers must be positive and
+                 floats must be non-negative.
+    :param required: Whether the option must be given.
+    """
+
+    kind: type[int] | type[float]
+    required: bool = False
+
+
+class ChannelSpec(NamedTuple):
+    """
+    The devices that can be attached to the channels of a board type.
+
+    :param key: The key in the board configuration listing the channels.
+    :param devices: A mapping of device type names to the device wrapper class and
+                    its options.
+    :param null_device: The device used for unconnected channels.
+    :param num_channels: The fixed number of channels on the board, if any.
+                         Missing channels are treated as unconnected.
+    :param single: Whether the board has a single device rather than a list.
+    """
+
+    key: str
+    devices: dict[str, tuple[Callable[..., Any], dict[str, OptionSpec]]]
+    null_device: Callable[[], Any]
+    num_channels: int | None = None
+    single: bool = False
+
+
+BOARD_CHANNELS: dict[str, ChannelSpec | None] = {
+    'PowerBoard': ChannelSpec(
+        'outputs',
+        {'ConnectorOutput': (ConnectorOutput, {})},
+        Output,
+        num_channels=NUM_OUTPUTS,
+    ),
+    'MotorBoard': ChannelSpec('motors', {'Motor': (Motor, {})}, NullMotor),
+    'ServoBoard': ChannelSpec('servos', {'Servo': (Servo, {})}, NullServo),
+    'LedBoard': ChannelSpec('leds', {'Led': (Led, {'num_colours': OptionSpec(int)})}, NullLed),
+    'Arduino': ChannelSpec(
+        'pins',
+        {
+            'UltrasonicSensor': (UltrasonicSensor, {'std_dev_percent': OptionSpec(float)}),
+            'MicroSwitch': (MicroSwitch, {}),
+            'PressureSensor': (PressureSensor, {'std_dev_percent': OptionSpec(float)}),
+            'ReflectanceSensor': (ReflectanceSensor, {'std_dev_percent': OptionSpec(float)}),
+            'Led': (PinLed, {}),
+        },
+        EmptyPin,
+    ),
+    'CameraBoard': ChannelSpec(
+        'camera',
+        {'Camera': (Camera, {'frame_rate': OptionSpec(int, required=True)})},
+        NullCamera,
+        single=True,
+    ),
+    'TimeServer': None,
+}
+
+
+def load_config(config_path: Path = DEFAULT_CONFIG) -> list[BoardEntry]:
+    """
+    Load the compiled device configuration from a configuration file.
+
+    The compiled form is cached keyed on the hash of the file contents, if the
+    cache is unavailable or invalid the file is validated and compiled again.
+
+    :param config_path: The path to the JSON configuration file.
+    :return: The compiled board entries.
+    :raises ValueError: If the configuration is invalid.
+    """
+    raw_config = config_path.read_bytes()
+    digest = hashlib.sha256(raw_config).hexdigest()
+    cache_file = CACHE_DIR / f'{digest}-v{COMPILED_VERSION}.json'
+
+    if _is_private_dir(CACHE_DIR):
+        try:
+            entries = decode_compiled(json.loads(cache_file.read_text()))
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            LOGGER.debug(f'Ignoring invalid compiled device configuration {cache_file}: {e}')
+        else:
+            LOGGER.debug(f'Loaded compiled device configuration from {cache_file}')
+            return entries
+
+    try:
+        config = json.loads(raw_config)
+    except ValueError as e:
+        raise ValueError(f'{config_path}: Invalid JSON: {e}') from e
+    entries = compile_config(config, str(config_path))
+
+    try:
+        CACHE_DIR.mkdir(mode=0o700, parents=True, exist_ok=True)
+        if not _is_private_dir(CACHE_DIR):
+            raise OSError(f'{CACHE_DIR} is not private to the current user')
+        # Write to a temporary file first as several controllers may start at once
+        tmp_file = cache_file.with_suffix(f'.{os.getpid()}.tmp')
+        tmp_file.write_text(json.dumps(entries))
+        os.replace(tmp_file, cache_file)
+    except OSError as e:
+        LOGGER.debug(f'Failed to cache compiled device configuration: {e}')
+
+    return entries
+
+
+def _is_private_dir(path: Path) -> bool:
+    """Check the directory exists and, where supported, only its owner can access it."""
+    try:
+        stat = path.stat()
+    except OSError:
+        return False
+    if not hasattr(os, 'getuid'):
+        return True
+    return stat.st_uid == os.getuid() and not stat.st_mode & 0o077
+
+
+def compile_config(config: Any, source: str = '<config>') -> list[BoardEntry]:
+    """
+    Validate a parsed configuration and compile it into board entries.
+
+    :param config: The parsed JSON configuration.
+    :param source: The name of the configuration, used in error messages.
+    :return: The compiled board entries.
+    :raises ValueError: If the configuration is invalid.
+    """
+    if not isinstance(config, dict) or not isinstance(config.get('boards'), list):
+        raise ValueError(f'{source}: Configuration must contain a list of boards')
+
+    entries: list[BoardEntry] = []
+    asset_tags: set[str] = set()
+
+    for idx, board in enumerate(config['boards']):
+        location = f'{source}: boards[{idx}]'
+        if not isinstance(board, dict):
+            raise ValueError(f'{location}: Board must be an object')
+
+        board_type = board.get('type')
+        if board_type not in BOARD_CHANNELS:
+            raise ValueError(f'{location}: Unknown board type {board_type!r}')
+
+        asset_tag = board.get('asset_tag')
+        if not isinstance(asset_tag, str) or not asset_tag:
+            raise ValueError(f'{location}: Missing asset tag')
+        if asset_tag in asset_tags:
+            raise ValueError(f'{location}: Duplicate asset tag {asset_tag!r}')
+        asset_tags.add(asset_tag)
+
+        spec = BOARD_CHANNELS[board_type]
+        allowed_keys = {'type', 'asset_tag'} | ({spec.key} if spec is not None else set())
+        unknown_keys = set(board) - allowed_keys
+        if unknown_keys:
+            raise ValueError(f'{location}: Unknown keys {sorted(unknown_keys)}')
+
+        channels: list[DeviceEntry | None] = []
+        if spec is not None:
+            location = f'{location}.{spec.key}'
+            if spec.single:
+                channels.append(_compile_device(spec, board.get(spec.key), location))
+            else:
+                raw_channels = board.get(spec.key)
+                if not isinstance(raw_channels, list):
+                    raise ValueError(f'{location}: Channels must be a list')
+                if spec.num_channels is not None:
+                    if len(raw_channels) > spec.num_channels:
+                        raise ValueError(
+                            f'{location}: At most {spec.num_channels} channels supported'
+                        )
+                    # Pad with unconnected channels
+                    raw_channels = (
+                        raw_channels + [None] * (spec.num_channels - len(raw_channels))
+                    )
+                channels.extend(
+                    _compile_device(spec, device, f'{location}[{channel}]')
+                    for channel, device in enumerate(raw_channels)
+                )
+
+        entries.append(BoardEntry(board_type, asset_tag, channels))
+
+    return entries
+
+
+def _compile_device(spec: ChannelSpec, device: Any, location: str) -> DeviceEntry | None:
+    if device is None:
+        return None
+    if not isinstance(device, dict):
+        raise ValueError(f'{location}: Device must be an object or null')
+
+    device_type = device.get('type')
+    if device_type not in spec.devices:
+        raise ValueError(
+            f'{location}: Unknown device type {device_type!r}, '
+            f'expected one of {sorted(spec.devices)}'
+        )
+
+    device_name = device.get('device')
+    if not isinstance(device_name, str) or not device_name:
+        raise ValueError(f'{location}: Missing Webots device name')
+
+    _, allowed_options = spec.devices[device_type]
+    options = {
+        key: value for key, value in device.items()
+        if key not in ('type', 'device')
+    }
+    unknown_options = set(options) - set(allowed_options)
+    if unknown_options:
+        raise ValueError(f'{location}: Unknown options {sorted(unknown_options)}')
+    for option, option_spec in allowed_options.items():
+        if option_spec.required and option not in options:
+            raise ValueError(f'{location}: Missing option {option!r}')
+    for option, value in options.items():
+        if allowed_options[option].kind is int:
+            if not isinstance(value, int) or isinstance(value, bool) or value <= 0:
+                raise ValueError(f'{location}: Option {option!r} must be a positive integer')
+        elif not isinstance(value, (int, float)) or isinstance(value, bool) or value < 0:
+            raise ValueError(f'{location}: Option {option!r} must be a non-negative number')
+
+    return DeviceEntry(device_type, device_name, options)
+
+
+def decode_compiled(data: Any) -> list[BoardEntry]:
+    """
+    Convert the JSON form of compiled board entries back into board entries.
+
+    The entries were validated when they were compiled and the cache is private
+    to the user, so only their structure is checked, enough that building the
+    boards from a corrupt cache fails here rather than part way through.
+
+    :param data: The decoded JSON of a list of board entries.
+    :return: The compiled board entries.
+    :raises ValueError: If the data is not a valid list of board entries.
+    :raises TypeError: If the data is not in the compiled format.
+    """
+    if not isinstance(data, list):
+        raise ValueError('Compiled configuration must be a list of boards')
+
+    entries = []
+    for board_type, asset_tag, channels in data:
+        if board_type not in BOARD_CHANNELS:
+            raise ValueError(f'Unknown board type {board_type!r}')
+        spec = BOARD_CHANNELS[board_type]
+        devices: list[DeviceEntry | None] = []
+        for device in channels:
+            if device is None:
+                devices.append(None)
+                continue
+            device_type, device_name, options = device
+            if spec is None or device_type not in spec.devices:
+                raise ValueError(f'Unknown device type {device_type!r} on {board_type}')
+            devices.append(DeviceEntry(device_type, str(device_name), dict(options)))
+        if spec is not None and spec.single and len(devices) != 1:
+            raise ValueError(f'{board_type} must have a single device')
+        entries.append(BoardEntry(board_type, str(asset_tag), devices))
+    return entries
+
+
+def configure_devices(entries: list[BoardEntry]) -> None:
+    """
+    Put the Webots device on every connected channel in its initial state.
+
+    Actuators must be configured whether or not the robot code uses them, as
+    Webots' defaults behave differently, and enabling the sensors here means
+    their first read doesn't have to wait for a step. All the sensors are
+    enabled and then the simulation is stepped once.
+
+    :param entries: The compiled board entries.
+    """
+    for entry in entries:
+        spec = BOARD_CHANNELS[entry.board_type]
+        if spec is None:
+            continue
+        for device in entry.channels:
+            if device is None:
+                continue
+            device_class, _ = spec.devices[device.device_type]
+            configure = getattr(device_class, 'configure', None)
+            if configure is not None:
+                configure(device.device_name)
+    get_globals().wait_for_sensors()
+
+
+def build_boards(entries: list[BoardEntry]) -> list[Board]:
+    """
+    Create the board simulators from compiled board entries.
+
+    The Webots devices are configured immediately, while the device wrappers
+    on each board are created lazily on first use.
+
+    :param entries: The compiled board entries.
+    :return: The board simulators.
+    """
+    configure_devices(entries)
+    boards: list[Board] = []
+
+    for entry in entries:
+        spec = BOARD_CHANNELS[entry.board_type]
+        factories = [] if spec is None else [
+            _device_factory(spec, device) for device in entry.channels
+        ]
+
+        board: Board
+        if entry.board_type == 'PowerBoard':
+            board = PowerBoard(
+                outputs=LazyDevices(factories),
+                buzzer=NullBuzzer(),
+                button=StartButton(),
+                leds=(NullLed(), NullLed()),
+                asset_tag=entry.asset_tag,
+            )
+        elif entry.board_type == 'MotorBoard':
+            board = MotorBoard(motors=LazyDevices(factories), asset_tag=entry.asset_tag)
+        elif entry.board_type == 'ServoBoard':
+            board = ServoBoard(servos=LazyDevices(factories), asset_tag=entry.asset_tag)
+        elif entry.board_type == 'LedBoard':
+            board = LedBoard(leds=LazyDevices(factories), asset_tag=entry.asset_tag)
+        elif entry.board_type == 'Arduino':
+            board = Arduino(pins=LazyDevices(factories), asset_tag=entry.asset_tag)
+        elif entry.board_type == 'CameraBoard':
+            board = CameraBoard(factories[0], asset_tag=entry.asset_tag)
+        elif entry.board_type == 'TimeServer':
+            board = TimeServer(asset_tag=entry.asset_tag)
+        else:
+            raise ValueError(f'Unknown board type {entry.board_type!r}')
+
+        boards.append(board)
+
+    return boards
+
+
+def _device_factory(spec: ChannelSpec, device: DeviceEntry | None) -> Callable[[], Any]:
+    if device is None:
+        return spec.null_device
+    device_class, _ = spec.devices[device.device_type]
+    return partial(device_class, device.device_name, **device.options)
@@ -1,9 +1,15 @@
 """A collection of wrappers for the devices that can be connected to the Arduino."""
+import math
 from abc import ABC, abstractmethod
 from enum import Enum
 
 from sbot_interface.devices.led import Led as _Led
-from sbot_interface.devices.util import WebotsDevice, get_globals, get_robot_device
+from sbot_interface.devices.util import (
+    TDevice,
+    WebotsDevice,
+    get_globals,
+    get_robot_device,
+)
 
 ANALOG_MAX = 1023
 
@@ -16,6 +22,11 @@ class GPIOPinMode(str, Enum):
     OUTPUT = 'OUTPUT'
 
 
+def _enable_sensor(device_name: str, kind: 'type[TDevice]') -> None:
+    g = get_globals()
+    g.enable_sensor(get_robot_device(g.robot, device_name, kind), device_name, wait=False)
+
+
 class BasePin(ABC):
     """The base class for all the devices that can be connected to the Arduino."""
 
@@ -79,14 +90,27 @@ class UltrasonicSensor(BasePin):
     A sensor that can measure the distance to an object.
 
     This is attached to the pin specified to be the echo pin, with the trigger pin unused.
+
+    :param device_name: The name of the distance sensor device.
+    :param std_dev_percent: The standard deviation of noise added to each reading,
+                            as a percentage of the reading. Default is no noise
+                            beyond that of the device's lookup table.
     """
 
-    def __init__(self, device_name: str) -> None:
+    def __init__(self, device_name: str, std_dev_percent: float = 0.0) -> None:
         g = get_globals()
+        self._std_dev_percent = std_dev_percent
+        self._noise = g.noise.stream(device_name)
         self._device = get_robot_device(g.robot, device_name, WebotsDevice.DistanceSensor)
-        self._device.enable(g.timestep)
+        self._sensors = g.sensors
+        self._index = g.enable_sensor(self._device, device_name)
         self._mode = GPIOPinMode.INPUT
 
+    @staticmethod
+    def configure(device_name: str) -> None:
+        """Enable the sensor, run for every sensor at startup."""
+        _enable_sensor(device_name, WebotsDevice.DistanceSensor)
+
     def get_mode(self) -> GPIOPinMode:
         """Get the current mode of the pin."""
         return self._mode
@@ -117,7 +141,10 @@ class UltrasonicSensor(BasePin):
 
         Relies on the lookup table mapping to the distance in mm.
         """
-        return int(self._device.getValue())
+        value = self._sensors[self._index]
+        if self._std_dev_percent:
+            value = self._noise.jitter(value, (0, math.inf), self._std_dev_percent)
+        return int(value)
 
 
 class MicroSwitch(BasePin):
@@ -126,9 +153,15 @@ class MicroSwitch(BasePin):
     def __init__(self, device_name: str) -> None:
         g = get_globals()
         self._device = get_robot_device(g.robot, device_name, WebotsDevice.TouchSensor)
-        self._device.enable(g.timestep)
+        self._sensors = g.sensors
+        self._index = g.enable_sensor(self._device, device_name)
         self._mode = GPIOPinMode.INPUT
 
+    @staticmethod
+    def configure(device_name: str) -> None:
+        """Enable the sensor, run for every sensor at startup."""
+        _enable_sensor(device_name, WebotsDevice.TouchSensor)
+
     def get_mode(self) -> GPIOPinMode:
         """Get the current mode of the pin."""
         return self._mode
@@ -139,7 +172,7 @@ class MicroSwitch(BasePin):
 
     def get_digital(self) -> bool:
         """Get the digital input value of the pin."""
-        return bool(self._device.getValue())
+        return bool(self._sensors[self._index])
 
     def set_digital(self, value: bool) -> None:
         """
@@ -159,15 +192,27 @@ class PressureSensor(BasePin):
     A sensor that can measure the force applied to it.
 
     This is attached to the pin specified, with the force proportional to the analog value.
+
+    :param device_name: The name of the touch sensor device.
+    :param std_dev_percent: The standard deviation of noise added to each reading,
+                            as a percentage of the reading. Default is no noise.
     """
 
     # Use lookupTable [0 0 0, 50 1023 0] // 50 Newton max force
-    def __init__(self, device_name: str) -> None:
+    def __init__(self, device_name: str, std_dev_percent: float = 0.0) -> None:
         g = get_globals()
+        self._std_dev_percent = std_dev_percent
+        self._noise = g.noise.stream(device_name)
         self._device = get_robot_device(g.robot, device_name, WebotsDevice.TouchSensor)
-        self._device.enable(g.timestep)
+        self._sensors = g.sensors
+        self._index = g.enable_sensor(self._device, device_name)
         self._mode = GPIOPinMode.INPUT
 
+    @staticmethod
+    def configure(device_name: str) -> None:
+        """Enable the sensor, run for every sensor at startup."""
+        _enable_sensor(device_name, WebotsDevice.TouchSensor)
+
     def get_mode(self) -> GPIOPinMode:
         """Get the current mode of the pin."""
         return self._mode
@@ -194,7 +239,10 @@ class PressureSensor(BasePin):
 
     def get_analog(self) -> int:
         """Get the analog input value of the pin. This is proportional to the force applied."""
-        return int(self._device.getValue())
+        value = self._sensors[self._index]
+        if self._std_dev_percent:
+            value = self._noise.jitter(value, (0, ANALOG_MAX), self._std_dev_percent)
+        return int(value)
 
 
 class ReflectanceSensor(BasePin):
@@ -202,14 +250,27 @@ class ReflectanceSensor(BasePin):
     A simple sensor that can detect the reflectance of a surface.
 
     Used for line following, with a higher value indicating a lighter surface.
+
+    :param device_name: The name of the distance sensor device.
+    :param std_dev_percent: The standard deviation of noise added to each reading,
+                            as a percentage of the reading. Default is no noise
+                            beyond that of the device's lookup table.
     """
 
-    def __init__(self, device_name: str) -> None:
+    def __init__(self, device_name: str, std_dev_percent: float = 0.0) -> None:
         g = get_globals()
+        self._std_dev_percent = std_dev_percent
+        self._noise = g.noise.stream(device_name)
         self._device = get_robot_device(g.robot, device_name, WebotsDevice.DistanceSensor)
-        self._device.enable(g.timestep)
+        self._sensors = g.sensors
+        self._index = g.enable_sensor(self._device, device_name)
         self._mode = GPIOPinMode.INPUT
 
+    @staticmethod
+    def configure(device_name: str) -> None:
+        """Enable the sensor, run for every sensor at startup."""
+        _enable_sensor(device_name, WebotsDevice.DistanceSensor)
+
     def get_mode(self) -> GPIOPinMode:
         """Get the current mode of the pin."""
         return self._mode
@@ -240,7 +301,10 @@ class ReflectanceSensor(BasePin):
 
         This is proportional to the reflectance of the surface.
         """
-        return int(self._device.getValue())
+        value = self._sensors[self._index]
+        if self._std_dev_percent:
+            value = self._noise.jitter(value, (0, ANALOG_MAX), self._std_dev_percent)
+        return int(value)
 
 
 class Led(BasePin):
@@ -6,6 +6,7 @@ from functools import lru_cache
 from math import tan
 
 from sbot_interface.devices.util import WebotsDevice, get_globals, get_robot_device
+from sbot_interface.tracing import TRACER
 
 g = get_globals()
 
@@ -80,12 +81,13 @@ class Camera(BaseCamera):
         # A frame is only captured every sample_time milliseconds the camera is enabled
         # so we need to wait for a frame to be captured after enabling the camera.
         # The image data buffer is automatically freed at the end of the timestep.
-        self._device.enable(self.sample_time)
-        g.sleep(self.sample_time / 1000)
+        with TRACER.span('camera capture', 'camera'):
+            self._device.enable(self.sample_time)
+            g.sleep(self.sample_time / 1000)
 
-        image_data_raw = self._device.getImage()
-        # Disable the camera to save computation
-        self._device.disable()  # type: ignore[no-untyped-call]
+            image_data_raw = self._device.getImage()
+            # Disable the camera to save computation
+            self._device.disable()  # type: ignore[no-untyped-call]
 
         return image_data_raw
 
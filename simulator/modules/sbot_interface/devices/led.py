@@ -2,6 +2,9 @@
 A wrapper for the Webots LED device.
 
 Supports both single and multi-colour non-PWM LEDs.
+
+Colour changes are buffered and only the final value is sent to Webots before
+each simulation step.
 """
 from abc import ABC, abstractmethod
 
@@ -62,6 +65,7 @@ class Led(BaseLed):
     def __init__(self, device_name: str, num_colours: int = 1) -> None:
         g = get_globals()
         self.num_colours = num_colours
+        self._actuators = g.actuators
         self._device = get_robot_device(g.robot, device_name, WebotsDevice.LED)
 
     def set_colour(self, colour: int) -> None:
@@ -73,7 +77,7 @@ class Led(BaseLed):
         """
         if 0 <= colour < self.num_colours:
             # NOTE: value 0 is OFF
-            self._device.set(colour)
+            self._actuators.write(self._device.set, colour)
         else:
             raise ValueError(f'Invalid colour: {colour}')
 
@@ -84,5 +88,8 @@ class Led(BaseLed):
         :return: The colour of the LED. A 1-based index for the lookup table of the LED.
                  0 is OFF.
         """
+        pending_colour = self._actuators.pending(self._device.set)
+        if pending_colour is not None:
+            return int(pending_colour)
         # webots uses 1-based indexing
         return self._device.get()
@@ -3,13 +3,15 @@ A wrapper for the Webots motor device.
 
 The motor will apply a small amount of variation to the power setting to simulate
 inaccuracies in the motor.
+
+Velocity changes are buffered and only the final value is sent to Webots before
+each simulation step.
 """
 import logging
 from abc import ABC, abstractmethod
 
 from sbot_interface.devices.util import (
     WebotsDevice,
-    add_jitter,
     get_globals,
     get_robot_device,
     map_to_range,
@@ -89,19 +91,33 @@ class Motor(BaseMotor):
 
     def __init__(self, device_name: str) -> None:
         self.power = 0
+        self._requested_power = 0
         self._enabled = False
         g = get_globals()
+        self._actuators = g.actuators
+        self._noise = g.noise.stream(device_name)
         self._device = get_robot_device(g.robot, device_name, WebotsDevice.Motor)
-        # Put the motor in velocity control mode
-        self._device.setPosition(float('inf'))
-        self._device.setVelocity(0)
         self._max_speed = self._device.getMaxVelocity()
+
+    @staticmethod
+    def configure(device_name: str) -> None:
+        """
+        Put the Webots motor in its initial state.
+
+        This is run for every motor at startup, whether or not the robot code uses it.
+
+        :param device_name: The name of the motor device.
+        """
+        device = get_robot_device(get_globals().robot, device_name, WebotsDevice.Motor)
+        # Put the motor in velocity control mode
+        device.setPosition(float('inf'))
+        device.setVelocity(0)
         # Limit the torque the motor can apply to have realistic acceleration
-        self._device.setAvailableTorque(2)
+        device.setAvailableTorque(2)
 
     def disable(self) -> None:
         """Disable the motor."""
-        self._device.setVelocity(0)
+        self._actuators.write(self._device.setVelocity, 0)
         self._enabled = False
 
     def set_power(self, value: int) -> None:
@@ -110,6 +126,11 @@ class Motor(BaseMotor):
 
         :param value: The power setting for the motor. A value between -1000 and 1000.
         """
+        if self._enabled and value == self._requested_power:
+            # Setting the same power keeps the existing variation
+            return
+        self._requested_power = value
+
         if value != 0:
             if abs(value) < 0.05:
                 logging.warning(
@@ -119,9 +140,11 @@ class Motor(BaseMotor):
             else:
                 # Apply a small amount of variation to the power setting to simulate
                 # inaccuracies in the motor
-                value = int(add_jitter(value, (MIN_POWER, MAX_POWER), std_dev_percent=1))
+                value = int(self._noise.jitter(
+                    value, (MIN_POWER, MAX_POWER), std_dev_percent=1,
+                ))
 
-        self._device.setVelocity(map_to_range(
+        self._actuators.write(self._device.setVelocity, map_to_range(
             value,
             (MIN_POWER, MAX_POWER),
             (-self._max_speed, self._max_speed),
@@ -0,0 +1,114 @@
+"""
+Seedable noise used to simulate inaccuracies in devices.
+
+Each device draws from its own stream of normally distributed samples, seeded
+from the noise source's seed and the device name. This makes the noise applied
+to each device reproducible regardless of the order devices are created in.
+Samples are generated in blocks to keep the per-value cost low.
+
+NumPy is only imported when the first sample is drawn, to keep it off the
+controller's startup path. The robot's code will usually have imported it by then.
+"""
+from __future__ import annotations
+
+import zlib
+from typing import TYPE_CHECKING, Callable, Sequence
+
+if TYPE_CHECKING:
+    import numpy as np
+
+BLOCK_SIZE = 256
+
+
+class NoiseStream:
+    """
+    A stream of normally distributed noise for a single device.
+
+    :param make_rng: A function creating the random generator to draw samples from,
+                     called when the first sample is drawn.
+    :param block_size: The number of samples to generate at once.
+    """
+
+    def __init__(
+        self,
+        make_rng: Callable[[], np.random.Generator],
+        block_size: int = BLOCK_SIZE,
+    ) -> None:
+        self._make_rng = make_rng
+        self._rng: np.random.Generator | None = None
+        self._block_size = block_size
+        self._block: list[float] = []
+        self._index = 0
+
+    def standard_normal(self) -> float:
+        """Return the next sample from the standard normal distribution."""
+        if self._index >= len(self._block):
+            if self._rng is None:
+                self._rng = self._make_rng()
+            self._block = self._rng.standard_normal(self._block_size).tolist()
+            self._index = 0
+        sample = self._block[self._index]
+        self._index += 1
+        return sample
+
+    def jitter(
+        self,
+        value: float,
+        value_range: tuple[float, float],
+        std_dev_percent: float = 2.0,
+        offset_percent: float = 0.0,
+    ) -> float:
+        """
+        Add normally distributed jitter to a given value.
+
+        The standard deviation and mean offset are proportional to the value.
+
+        :param value: The value to add jitter to.
+        :param value_range: The minimum and maximum values to clamp the result to.
+        :param std_dev_percent: The standard deviation as a percentage of the value.
+        :param offset_percent: The mean offset as a percentage of the value.
+        :return: The value with jitter applied.
+        """
+        std_dev = value * (std_dev_percent / 100.0)
+        mean_offset = value * (offset_percent / 100.0)
+
+        error = mean_offset + std_dev * self.standard_normal()
+        # Ensure the error is within the range
+        return max(value_range[0], min(value_range[1], value + error))
+
+
+class NoiseSource:
+    """
+    A source of independent noise streams for each device.
+
+    :param seed: The seed for all noise streams, an integer or sequence of integers.
+                 If None, a random seed is used.
+    """
+
+    def __init__(self, seed: int | Sequence[int] | None = None) -> None:
+        self._seed = seed
+        self._seed_sequence: np.random.SeedSequence | None = None
+        self._streams: dict[str, NoiseStream] = {}
+
+    def stream(self, device_name: str) -> NoiseStream:
+        """
+        Get the noise stream for a device.
+
+        :param device_name: The name of the device, used to derive the stream's seed.
+        :return: The noise stream for the device.
+        """
+        if device_name not in self._streams:
+            self._streams[device_name] = NoiseStream(lambda: self._make_rng(device_name))
+        return self._streams[device_name]
+
+    def _make_rng(self, device_name: str) -> np.random.Generator:
+        import numpy as np
+
+        if self._seed_sequence is None:
+            # If no seed was given, the entropy is drawn here and shared by all streams
+            self._seed_sequence = np.random.SeedSequence(self._seed)
+        seed = np.random.SeedSequence(
+            self._seed_sequence.entropy,
+            spawn_key=(zlib.crc32(device_name.encode()),),
+        )
+        return np.random.default_rng(seed)
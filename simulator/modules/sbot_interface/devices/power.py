@@ -51,20 +51,31 @@ class ConnectorOutput(Output):
     ) -> None:
         super().__init__(downstream_current)
         g = get_globals()
+        self._actuators = g.actuators
         self._device = get_robot_device(g.robot, device_name, WebotsDevice.Connector)
         self._enabled = False
 
     def set_output(self, enable: bool) -> None:
-        """Set the output state."""
-        if enable:
-            self._device.lock()  # type: ignore[no-untyped-call]
-        else:
-            self._device.unlock()  # type: ignore[no-untyped-call]
+        """
+        Set the output state.
+
+        The change is buffered and applied to the connector before the next step.
+        """
+        self._actuators.write(self._apply_output, enable)
 
     def get_output(self) -> bool:
         """Get the output state."""
+        pending_output = self._actuators.pending(self._apply_output)
+        if pending_output is not None:
+            return bool(pending_output)
         return self._device.isLocked()
 
+    def _apply_output(self, enable: bool) -> None:
+        if enable:
+            self._device.lock()  # type: ignore[no-untyped-call]
+        else:
+            self._device.unlock()  # type: ignore[no-untyped-call]
+
 
 class BaseBuzzer(ABC):
     """The base class for the buzzer device."""
@@ -121,17 +132,24 @@ class StartButton(BaseButton):
     A button to represent the start button on the robot.
 
     Uses the robot's custom data to determine if the robot is ready to start.
+    The custom data is read from the sensor snapshot taken after each step.
     """
 
     def __init__(self) -> None:
         self._initialized = False
+        self._started = False
 
     def get_state(self) -> bool:
         """Return whether the start button is pressed."""
+        if self._started:
+            # The start signal is only sent once, so there is no need to check again
+            return True
+
         g = get_globals()
         if not self._initialized:
-            if g.robot.getCustomData() != 'start':
+            if g.sensors.custom_data() != 'start':
                 g.robot.setCustomData('ready')
             self._initialized = True
 
-        return bool(g.robot.getCustomData() == 'start')
+        self._started = g.sensors.custom_data() == 'start'
+        return self._started
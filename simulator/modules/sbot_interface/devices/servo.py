@@ -11,7 +11,6 @@ from typing import TYPE_CHECKING
 
 from sbot_interface.devices.util import (
     WebotsDevice,
-    add_jitter,
     get_globals,
     get_robot_device,
     map_to_range,
@@ -99,15 +98,34 @@ class Servo(BaseServo):
 
     def __init__(self, device_name: str) -> None:
         self.position = (MAX_POSITION + MIN_POSITION) // 2
+        self._requested_position = self.position
         # TODO use setAvailableForce to simulate disabled
         self._enabled = False
         g = get_globals()
+        self._actuators = g.actuators
+        self._noise = g.noise.stream(device_name)
         self._device = get_robot_device(g.robot, device_name, WebotsDevice.Motor)
         self._pos_sensor: PositionSensor | None = self._device.getPositionSensor()  # type: ignore[no-untyped-call]
         self._max_position = self._device.getMaxPosition()
         self._min_position = self._device.getMinPosition()
+        self._sensors = g.sensors
         if self._pos_sensor is not None:
-            self._pos_sensor.enable(g.timestep)
+            self._pos_index = g.enable_sensor(self._pos_sensor, f'{device_name}:position')
+
+    @staticmethod
+    def configure(device_name: str) -> None:
+        """
+        Enable the servo's position sensor, if it has one.
+
+        This is run for every servo at startup, whether or not the robot code uses it.
+
+        :param device_name: The name of the servo's motor device.
+        """
+        g = get_globals()
+        device = get_robot_device(g.robot, device_name, WebotsDevice.Motor)
+        pos_sensor = device.getPositionSensor()  # type: ignore[no-untyped-call]
+        if pos_sensor is not None:
+            g.enable_sensor(pos_sensor, f'{device_name}:position', wait=False)
 
     def disable(self) -> None:
         """Disable the servo."""
@@ -119,11 +137,18 @@ class Servo(BaseServo):
 
         Position is the pulse width in microseconds.
         """
+        if self._enabled and value == self._requested_position:
+            # Setting the same position keeps the existing variation
+            return
+        self._requested_position = value
+
         # Apply a small amount of variation to the power setting to simulate
         # inaccuracies in the servo
-        value = int(add_jitter(value, (MIN_POSITION, MAX_POSITION), std_dev_percent=0.5))
+        value = int(self._noise.jitter(
+            value, (MIN_POSITION, MAX_POSITION), std_dev_percent=0.5,
+        ))
 
-        self._device.setPosition(map_to_range(
+        self._actuators.write(self._device.setPosition, map_to_range(
             value,
             (MIN_POSITION, MAX_POSITION),
             (self._min_position + 0.001, self._max_position - 0.001),
@@ -139,7 +164,7 @@ class Servo(BaseServo):
         """
         if self._pos_sensor is not None:
             self.position = int(map_to_range(
-                self._pos_sensor.getValue(),
+                self._sensors[self._pos_index],
                 (self._min_position + 0.001, self._max_position - 0.001),
                 (MIN_POSITION, MAX_POSITION),
             ))
@@ -2,10 +2,10 @@
 from __future__ import annotations
 
 import threading
-from dataclasses import dataclass
+from array import array
+from dataclasses import dataclass, field
 from math import ceil
-from random import gauss
-from typing import TypeVar
+from typing import Any, Callable, Generic, Iterable, Iterator, TypeVar
 
 from controller import (
     GPS,
@@ -32,7 +32,12 @@ from controller import (
 )
 from controller.device import Device
 
+from sbot_interface.devices.noise import NoiseSource
+from sbot_interface.metrics import StallRecorder
+from sbot_interface.tracing import TRACER
+
 TDevice = TypeVar('TDevice', bound=Device)
+TWrapper = TypeVar('TWrapper')
 __GLOBALS: 'GlobalData' | None = None
 
 
@@ -65,6 +70,106 @@ class WebotsDevice:
     VacuumGripper = VacuumGripper
 
 
+class ActuatorWriter:
+    """
+    Buffers writes to Webots actuators until the next simulation step.
+
+    Webots only applies actuator values when the simulation is stepped, so only
+    the last value written to each actuator before a step needs to be sent.
+    Writes of the value the actuator already has are skipped.
+
+    Actuators are identified by their setter, so each bound setter method is
+    treated as a separate actuator.
+    """
+
+    def __init__(self) -> None:
+        self._pending: dict[Callable[[Any], None], Any] = {}
+        self._applied: dict[Callable[[Any], None], Any] = {}
+
+    def write(self, setter: Callable[[Any], None], value: Any) -> None:
+        """
+        Queue a value to be written to an actuator at the next step.
+
+        :param setter: The function that applies the value to the actuator.
+        :param value: The value to write.
+        """
+        if setter in self._applied and self._applied[setter] == value:
+            # The actuator already has this value, discard any pending change
+            self._pending.pop(setter, None)
+        else:
+            self._pending[setter] = value
+
+    def pending(self, setter: Callable[[Any], None]) -> Any:
+        """
+        Get the value waiting to be written to an actuator.
+
+        :param setter: The function that applies the value to the actuator.
+        :return: The pending value, or None if there is no pending write.
+        """
+        return self._pending.get(setter)
+
+    def flush(self) -> None:
+        """Write all pending values to their actuators."""
+        for setter, value in self._pending.items():
+            setter(value)
+            self._applied[setter] = value
+        self._pending.clear()
+
+
+class SensorSnapshot:
+    """
+    The values of all enabled sensors, captured once after each simulation step.
+
+    Webots sensor values only change when the simulation is stepped, so reads
+    are served from this snapshot rather than calling into Webots each time.
+    All sensors are read at the same point in each step.
+
+    :param robot: The robot object, used to read the custom data field.
+    """
+
+    def __init__(self, robot: Robot) -> None:
+        self._robot = robot
+        self._readers: list[Callable[[], float]] = []
+        self._values = array('d')
+        self._custom_data: str | None = None
+
+    def register(self, reader: Callable[[], float]) -> int:
+        """
+        Add a sensor to the snapshot.
+
+        The value is not available until the next capture.
+
+        :param reader: The function that reads the sensor value from Webots.
+        :return: The index of the sensor's value in the snapshot.
+        """
+        self._readers.append(reader)
+        self._values.append(float('nan'))
+        return len(self._readers) - 1
+
+    def capture(self) -> None:
+        """Read the current value of every registered sensor."""
+        values = self._values
+        for index, reader in enumerate(self._readers):
+            values[index] = reader()
+        if self._custom_data is not None and self._custom_data != 'start':
+            # Once the robot has started its custom data no longer changes
+            self._custom_data = self._robot.getCustomData()
+
+    def __getitem__(self, index: int) -> float:
+        return self._values[index]
+
+    def custom_data(self) -> str:
+        """
+        Get the robot's custom data field.
+
+        The field is only captured after the first time it is requested, and
+        stops being captured once the robot has been started.
+        """
+        if self._custom_data is None:
+            self._custom_data = self._robot.getCustomData()
+        return self._custom_data
+
+
 @dataclass
 class GlobalData:
     """
@@ -76,11 +181,24 @@ class GlobalData:
     :param robot: The robot object.
     :param timestep: The timestep size of the simulation.
     :param stop_event: The event to stop the simulation.
+    :param actuators: The buffer of actuator writes applied before each step.
+    :param sensors: The snapshot of sensor values captured after each step.
+    :param noise: The source of noise used to simulate device inaccuracies.
+    :param stalls: The record of the time spent between simulation steps.
     """
 
     robot: Robot
     timestep: int
     stop_event: threading.Event | None = None
+    actuators: ActuatorWriter = field(default_factory=ActuatorWriter)
+    sensors: SensorSnapshot = field(init=False)
+    noise: NoiseSource = field(default_factory=NoiseSource)
+    stalls: StallRecorder = field(default_factory=StallRecorder)
+    _sensor_indices: dict[str, int] = field(default_factory=dict, init=False, repr=False)
+    _sensors_pending: bool = field(default=False, init=False, repr=False)
+
+    def __post_init__(self) -> None:
+        self.sensors = SensorSnapshot(self.robot)
 
     def sleep(self, secs: float) -> None:
         """Sleeps for a given duration in simulator time."""
@@ -92,12 +210,57 @@ class GlobalData:
         # Convert to a multiple of the timestep
         msecs = ceil((secs * 1000) / self.timestep) * self.timestep
 
+        # Apply the final actuator values before the simulation advances
+        self.actuators.flush()
+
         # Sleep for the given duration
-        result = self.robot.step(msecs)
+        self.stalls.step_requested()
+        with TRACER.span('robot.step', 'webots', duration_ms=msecs):
+            result = self.robot.step(msecs)
 
         # If the simulation has stopped, set the stop event
         if (result == -1) and (self.stop_event is not None):
             self.stop_event.set()
+        elif result != -1:
+            self.sensors.capture()
+            self.stalls.step_returned(self.robot.getTime())
+
+    def enable_sensor(
+        self,
+        sensor: DistanceSensor | TouchSensor | PositionSensor,
+        name: str,
+        wait: bool = True,
+    ) -> int:
+        """
+        Enable a Webots sensor and add it to the sensor snapshot.
+
+        Sensors only have a value once the simulation has been stepped after
+        enabling them. When the devices are configured at startup, sensors are
+        enabled without waiting and wait_for_sensors steps once for all of them.
+        Enabling a sensor that is already enabled returns its existing index.
+
+        :param sensor: The Webots sensor device.
+        :param name: The unique name of the sensor, used to find it if it is already enabled.
+        :param wait: Whether to step the simulation by one timestep so the value is available.
+        :return: The index of the sensor's value in the snapshot.
+        """
+        index = self._sensor_indices.get(name)
+        if index is not None:
+            return index
+        sensor.enable(self.timestep)
+        index = self.sensors.register(sensor.getValue)
+        self._sensor_indices[name] = index
+        if wait:
+            self.sleep(self.timestep / 1000)
+        else:
+            self._sensors_pending = True
+        return index
+
+    def wait_for_sensors(self) -> None:
+        """Step the simulation once if any sensors were enabled without waiting."""
+        if self._sensors_pending:
+            self._sensors_pending = False
+            self.sleep(self.timestep / 1000)
 
 
 def get_globals() -> GlobalData:
@@ -114,6 +277,42 @@ def get_globals() -> GlobalData:
     return __GLOBALS
 
 
+class LazyDevices(Generic[TWrapper]):
+    """
+    A list of device wrappers that are only constructed when first accessed.
+
+    Each entry is a factory that creates the device wrapper for that channel.
+    This avoids creating wrappers for channels the robot code never uses. The
+    Webots devices themselves are configured when the boards are built, so
+    unused actuators are still put in their initial state.
+
+    :param factories: The device factories, indexed by channel number.
+    """
+
+    def __init__(self, factories: Iterable[Callable[[], TWrapper]]) -> None:
+        self._factories = list(factories)
+        self._devices: list[TWrapper | None] = [None] * len(self._factories)
+
+    def __len__(self) -> int:
+        return len(self._factories)
+
+    def __getitem__(self, index: int) -> TWrapper:
+        device = self._devices[index]
+        if device is None:
+            device = self._factories[index]()
+            self._devices[index] = device
+        return device
+
+    def constructed(self) -> Iterator[TWrapper]:
+        """
+        Iterate over the device wrappers that have already been constructed.
+
+        Devices that have not been constructed are still in their initial state,
+        so can be skipped when resetting or summing current draw.
+        """
+        return (device for device in self._devices if device is not None)
+
+
 def map_to_range(
     value: float,
     old_min_max: tuple[float, float],
@@ -142,18 +341,3 @@ def get_robot_device(robot: Robot, name: str, kind: type[TDevice]) -> TDevice:
     if not isinstance(device, kind):
         raise TypeError(f"Failed to get device: {name}.")
     return device
-
-
-def add_jitter(
-    value: float,
-    value_range: tuple[float, float],
-    std_dev_percent: float = 2.0,
-    offset_percent: float = 0.0,
-) -> float:
-    """Adds normally distributed jitter to a given value."""
-    std_dev = value * (std_dev_percent / 100.0)
-    mean_offset = value * (offset_percent / 100.0)
-
-    error = gauss(mean_offset, std_dev)
-    # Ensure the error is within the range
-    return max(value_range[0], min(value_range[1], value + error))
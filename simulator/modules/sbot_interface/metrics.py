@@ -0,0 +1,233 @@
+"""
+Low overhead metrics for the commands handled by the board simulators.
+
+Commands are grouped by board and by command verb, the command with its
+numeric arguments removed. For each group the number of commands, the wall
+clock and simulated time spent handling them and the bytes received and sent
+are recorded. Wall clock handling times are recorded in a log-linear histogram
+so percentiles can be reported without storing every sample.
+
+The time the controller spends between simulation steps is also recorded, to
+identify which robot is holding up the simulation.
+"""
+from __future__ import annotations
+
+import json
+import logging
+import os
+import time
+from pathlib import Path
+from typing import Any
+
+LOGGER = logging.getLogger(__name__)
+
+# Each power of two is split into 2**SUB_BUCKET_BITS buckets, giving ~3% precision
+SUB_BUCKET_BITS = 5
+SUB_BUCKETS = 1 << SUB_BUCKET_BITS
+# Gaps between steps longer than this are counted as stalls
+STALL_THRESHOLD_NS = 50_000_000
+# How often the stall summary file is updated, in simulated seconds
+STALL_WRITE_INTERVAL = 1.0
+
+
+class LatencyHistogram:
+    """
+    A log-linear histogram of integer values, in the style of HdrHistogram.
+
+    Values below SUB_BUCKETS are recorded exactly, larger values are recorded
+    in buckets whose width is a fixed fraction of their value.
+    """
+
+    def __init__(self) -> None:
+        self.counts: list[int] = []
+        self.count = 0
+        self.total = 0
+        self.max = 0
+
+    @staticmethod
+    def _index(value: int) -> int:
+        if value < SUB_BUCKETS:
+            return value
+        shift = value.bit_length() - SUB_BUCKET_BITS - 1
+        return SUB_BUCKETS * (shift + 1) + (value >> shift) - SUB_BUCKETS
+
+    @staticmethod
+    def _bucket_upper(index: int) -> int:
+        if index < SUB_BUCKETS:
+            return index
+        shift = index // SUB_BUCKETS - 1
+        mantissa = index % SUB_BUCKETS + SUB_BUCKETS
+        return ((mantissa + 1) << shift) - 1
+
+    def record(self, value: int) -> None:
+        """Record a non-negative integer value."""
+        value = max(value, 0)
+        index = self._index(value)
+        if index >= len(self.counts):
+            self.counts.extend([0] * (index + 1 - len(self.counts)))
+        self.counts[index] += 1
+        self.count += 1
+        self.total += value
+        if value > self.max:
+            self.max = value
+
+    def merge(self, other: LatencyHistogram) -> None:
+        """Add the values recorded in another histogram to this one."""
+        if len(other.counts) > len(self.counts):
+            self.counts.extend([0] * (len(other.counts) - len(self.counts)))
+        for index, bucket_count in enumerate(other.counts):
+            self.counts[index] += bucket_count
+        self.count += other.count
+        self.total += other.total
+        self.max = max(self.max, other.max)
+
+    def percentile(self, percent: float) -> int:
+        """
+        Get the value at the given percentile.
+
+        The upper bound of the bucket containing the percentile is returned.
+
+        :param percent: The percentile to return, between 0 and 100.
+        :return: The value at the percentile, 0 if no values have been recorded.
+        """
+        if self.count == 0:
+            return 0
+        target = max(1, round(self.count * percent / 100))
+        seen = 0
+        for index, bucket_count in enumerate(self.counts):
+            seen += bucket_count
+            if seen >= target:
+                return min(self._bucket_upper(index), self.max)
+        return self.max
+
+
+class CommandStats:
+    """The metrics for a group of commands."""
+
+    def __init__(self) -> None:
+        self.wall_ns = LatencyHistogram()
+        self.sim_time = 0.0
+        self.bytes_in = 0
+        self.bytes_out = 0
+
+    def record(self, wall_ns: int, sim_time: float, bytes_in: int, bytes_out: int) -> None:
+        """
+        Record the handling of a single command.
+
+        :param wall_ns: The wall clock time spent handling the command in nanoseconds.
+        :param sim_time: The simulated time consumed by the command in seconds.
+        :param bytes_in: The number of bytes in the command.
+        :param bytes_out: The number of bytes in the response.
+        """
+        self.wall_ns.record(wall_ns)
+        self.sim_time += sim_time
+        self.bytes_in += bytes_in
+        self.bytes_out += bytes_out
+
+    def summary(self) -> dict[str, Any]:
+        """Return a JSON serialisable summary of the metrics."""
+        wall = self.wall_ns
+        return {
+            'count': wall.count,
+            'wall_total_ms': wall.total / 1e6,
+            'wall_p50_ms': wall.percentile(50) / 1e6,
+            'wall_p90_ms': wall.percentile(90) / 1e6,
+            'wall_p99_ms': wall.percentile(99) / 1e6,
+            'wall_max_ms': wall.max / 1e6,
+            'sim_time_s': round(self.sim_time, 6),
+            'bytes_in': self.bytes_in,
+            'bytes_out': self.bytes_out,
+        }
+
+
+def command_verb(command: str) -> str:
+    """
+    Get the verb of a command, used to group commands in the metrics.
+
+    Numeric arguments are removed from colon separated commands, so
+    'MOT:0:SET:500' becomes 'MOT:SET'. Arduino commands are a single lowercase
+    letter followed by pin letters, so only the first character is kept.
+    """
+    if command[:1].islower():
+        return command[:1]
+    return ':'.join(
+        part for part in command.split(':')
+        if not part.lstrip('-').isdigit()
+    )
+
+
+class StallRecorder:
+    """
+    Records how long the controller takes between simulation steps.
+
+    Webots only advances once every controller has requested the next step, so
+    the wall-clock time between a step returning and the next being requested
+    is time this controller may be holding up the whole simulation.
+
+    If path is set, a summary is periodically written to it so that the
+    supervisor can attribute stalls to zones during the match.
+    """
+
+    def __init__(self) -> None:
+        self.gaps_ns = LatencyHistogram()
+        self.num_stalls = 0
+        self.stall_ns = 0
+        self.longest_sim_time = 0.0
+        self.path: Path | None = None
+        self._last_return: int | None = None
+        self._last_sim_time = 0.0
+        self._next_write = STALL_WRITE_INTERVAL
+
+    def step_requested(self) -> None:
+        """Record that a simulation step is about to be requested."""
+        if self._last_return is None:
+            return
+        gap = time.perf_counter_ns() - self._last_return
+        if gap > self.gaps_ns.max:
+            self.longest_sim_time = self._last_sim_time
+        self.gaps_ns.record(gap)
+        if gap > STALL_THRESHOLD_NS:
+            self.num_stalls += 1
+            self.stall_ns += gap
+
+    def step_returned(self, sim_time: float) -> None:
+        """
+        Record that a simulation step has completed.
+
+        :param sim_time: The simulated time after the step.
+        """
+        self._last_return = time.perf_counter_ns()
+        self._last_sim_time = sim_time
+        if self.path is not None and sim_time >= self._next_write:
+            self._next_write = sim_time + STALL_WRITE_INTERVAL
+            self.write()
+
+    def since_last_step_ns(self) -> int:
+        """Return the wall-clock time since the last step completed, 0 before any step."""
+        if self._last_return is None:
+            return 0
+        return time.perf_counter_ns() - self._last_return
+
+    def summary(self) -> dict[str, Any]:
+        """Return a JSON serialisable summary of the time spent between steps."""
+        gaps = self.gaps_ns
+        return {
+            'steps': gaps.count,
+            'between_steps_total_s': round(gaps.total / 1e9, 3),
+            'between_steps_p99_ms': gaps.percentile(99) / 1e6,
+            'longest_ms': gaps.max / 1e6,
+            'longest_at_sim_time_s': round(self.longest_sim_time, 3),
+            'stalls': self.num_stalls,
+            'stall_total_s': round(self.stall_ns / 1e9, 3),
+        }
+
+    def write(self) -> None:
+        """Write the summary to the stall file, replacing it atomically."""
+        if self.path is None:
+            return
+        try:
+            tmp_path = self.path.with_suffix('.tmp')
+            tmp_path.write_text(json.dumps(self.summary()))
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            LOGGER.warning(f'Failed to write stall summary: {e}')
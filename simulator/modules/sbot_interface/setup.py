@@ -1,115 +1,44 @@
 """
 Setup the devices connected to the robot.
 
-The main configuration for the devices connected to the robot is the devices
-list in the setup_devices function.
+The configuration of the devices connected to the robot is loaded from the
+JSON file next to the robot proto, see sbot_interface.config for the format.
+The Webots devices are configured when the boards are built, while the device
+wrappers are created from factories when a channel is first used.
 """
 from __future__ import annotations
 
 import logging
+from pathlib import Path
+from typing import Sequence
 
-from sbot_interface.boards import (
-    Arduino,
-    CameraBoard,
-    LedBoard,
-    MotorBoard,
-    PowerBoard,
-    ServoBoard,
-    TimeServer,
-)
-from sbot_interface.devices.arduino_devices import (
-    EmptyPin,
-    MicroSwitch,
-    ReflectanceSensor,
-    UltrasonicSensor,
-)
-from sbot_interface.devices.camera import Camera
-from sbot_interface.devices.led import Led, NullLed
-from sbot_interface.devices.motor import Motor
-from sbot_interface.devices.power import ConnectorOutput, NullBuzzer, Output, StartButton
-from sbot_interface.devices.servo import NullServo, Servo
-from sbot_interface.socket_server import Board, DeviceServer, SocketServer
-
-
-def setup_devices(log_level: int | str = logging.WARNING) -> SocketServer:
+from sbot_interface.config import DEFAULT_CONFIG, build_boards, load_config
+from sbot_interface.devices.noise import NoiseSource
+from sbot_interface.devices.util import get_globals
+from sbot_interface.socket_server import DeviceServer, SocketServer
+
+
+def setup_devices(
+    log_level: int | str = logging.WARNING,
+    config_path: Path = DEFAULT_CONFIG,
+    noise_seed: int | Sequence[int] | None = None,
+) -> SocketServer:
     """
     Setup the devices connected to the robot.
 
-    Contains the main configuration for the devices connected to the robot.
+    The devices are created from the configuration file.
 
     :param log_level: The logging level to use for the device logger.
+    :param config_path: The path to the device configuration file.
+    :param noise_seed: The seed for the noise applied to devices, None for a random seed.
     :return: The socket server which will handle all connections and commands.
     """
     device_logger = logging.getLogger('sbot_interface')
     device_logger.setLevel(log_level)
 
-    # this is the configuration of devices connected to the robot
-    devices: list[Board] = [
-        PowerBoard(
-            outputs=(
-                [ConnectorOutput('vacuum sucker')]
-                + [Output() for _ in range(6)]
-            ),
-            buzzer=NullBuzzer(),
-            button=StartButton(),
-            leds=(NullLed(), NullLed()),
-            asset_tag='PWR',
-        ),
-        MotorBoard(
-            motors=[
-                Motor('left motor'),
-                Motor('right motor'),
-            ],
-            asset_tag='MOT',
-        ),
-        ServoBoard(
-            servos=(
-                [Servo('vacuum sucker motor::main')]
-                + [NullServo() for _ in range(7)]
-            ),
-            asset_tag='SERVO',
-        ),
-        LedBoard(
-            leds=[
-                Led('led 1', num_colours=8),
-                Led('led 2', num_colours=8),
-                Led('led 3', num_colours=8),
-            ],
-            asset_tag='LED',
-        ),
-        Arduino(
-            pins=[
-                EmptyPin(),  # pin 0
-                EmptyPin(),  # pin 1
-                EmptyPin(),  # ultrasonic trigger pin, pin 2
-                UltrasonicSensor('ultrasound front'),  # pin 3
-                EmptyPin(),  # ultrasonic trigger pin, pin 4
-                UltrasonicSensor('ultrasound left'),  # pin 5
-                EmptyPin(),  # ultrasonic trigger pin, pin 6
-                UltrasonicSensor('ultrasound right'),  # pin 7
-                EmptyPin(),  # ultrasonic trigger pin, pin 8
-                UltrasonicSensor('ultrasound back'),  # pin 9
-                MicroSwitch('front left bump sensor'),  # pin 10
-                MicroSwitch('front right bump sensor'),  # pin 11
-                MicroSwitch('rear left bump sensor'),  # pin 12
-                MicroSwitch('rear right bump sensor'),  # pin 13
-                ReflectanceSensor('left reflectance sensor'),  # pin A0
-                ReflectanceSensor('center reflectance sensor'),  # pin A1
-                ReflectanceSensor('right reflectance sensor'),  # pin A2
-                EmptyPin(),  # pin A3
-                EmptyPin(),  # pin A4
-                EmptyPin(),  # pin A5
-            ],
-            asset_tag='Arduino1',
-        ),
-        TimeServer(
-            asset_tag='TimeServer',
-        ),
-        CameraBoard(
-            Camera('camera', frame_rate=15),
-            asset_tag='Camera',
-        ),
-    ]
+    get_globals().noise = NoiseSource(noise_seed)
+
+    devices = build_boards(load_config(config_path))
 
     device_servers: list[DeviceServer] = []
 
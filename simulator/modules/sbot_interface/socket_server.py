@@ -1,16 +1,21 @@
 """A server for multiple devices that can be connected to the simulator."""
 from __future__ import annotations
 
+import json
 import logging
 import os
 import select
 import signal
 import socket
 import sys
+import time
+from pathlib import Path
 from threading import Event
-from typing import Protocol
+from typing import Any, Protocol
 
 from sbot_interface.devices.util import get_globals
+from sbot_interface.metrics import CommandStats, command_verb
+from sbot_interface.tracing import TRACER
 
 LOGGER = logging.getLogger(__name__)
 g = get_globals()
@@ -37,6 +42,9 @@ class DeviceServer:
 
     The process_data method is called when data is received from the socket.
     Line-delimited commands are processed and responses are sent back.
+
+    Metrics for the handled commands are recorded in the stats attribute,
+    grouped by command verb.
     """
 
     def __init__(self, board: Board) -> None:
@@ -53,15 +61,33 @@ class DeviceServer:
 
         self.device_socket: socket.socket | None = None
         self.buffer = b''
+        self.stats: dict[str, CommandStats] = {}
 
     def process_data(self, data: bytes) -> bytes | None:
         """Process incoming data if a line has been received and return the response."""
         self.buffer += data
         if b'\n' in self.buffer:
-            # Sleep to simulate processing time
-            g.sleep(g.timestep / 1000)
+            start_wall = time.perf_counter_ns()
+            start_sim = g.robot.getTime()
             data, self.buffer = self.buffer.split(b'\n', 1)
-            return self.run_command(data.decode().strip())
+            command = data.decode().strip()
+            verb = command_verb(command)
+
+            with TRACER.span(verb, 'command', board=self.asset_tag):
+                # Sleep to simulate processing time
+                g.sleep(g.timestep / 1000)
+                response = self.run_command(command)
+
+            stats = self.stats.get(verb)
+            if stats is None:
+                stats = self.stats[verb] = CommandStats()
+            stats.record(
+                time.perf_counter_ns() - start_wall,
+                g.robot.getTime() - start_sim,
+                len(data) + 1,
+                len(response),
+            )
+            return response
         else:
             return None
 
@@ -148,6 +174,14 @@ class SocketServer:
     A server for multiple devices that can be connected to the simulator.
 
     The run method blocks until the stop_event is set.
+    If metrics_path is set, a summary of the command metrics is written to it
+    when the server stops.
+
+    If compute_time_scale is set, the usercode is charged simulated time for its
+    computation. Once the robot has started, whenever the usercode has not
+    stepped the simulation for a timestep's worth of wall-clock time, divided by
+    the scale, the server steps the simulation itself. This stops a busy robot
+    from holding up the rest of the arena.
     """
 
     def __init__(self, devices: list[DeviceServer]) -> None:
@@ -156,6 +190,12 @@ class SocketServer:
         g.stop_event = self.stop_event
         # flag to indicate that we are exiting because the usercode has completed
         self.completed = False
+        self.metrics_path: Path | None = None
+        self.compute_time_scale: float | None = None
+        self.charged_steps = 0
+        self.select_calls = 0
+        self.select_wait_ns = 0
+        self.busy_ns = 0
 
     def run(self) -> None:
         """
@@ -167,7 +207,18 @@ class SocketServer:
             # select on all server sockets and device sockets
             sockets = [device.socket() for device in self.devices]
 
-            readable, _, _ = select.select(sockets, [], [], 0.5)
+            charge_interval_ns = self._charge_interval_ns()
+            if charge_interval_ns is None:
+                timeout = 0.5
+            else:
+                timeout = max(0, charge_interval_ns - g.stalls.since_last_step_ns()) / 1e9
+
+            select_start = time.perf_counter_ns()
+            with TRACER.span('select', 'server'):
+                readable, _, _ = select.select(sockets, [], [], timeout)
+            select_end = time.perf_counter_ns()
+            self.select_calls += 1
+            self.select_wait_ns += select_end - select_start
 
             for device in self.devices:
                 try:
@@ -197,14 +248,66 @@ class SocketServer:
                 except Exception as e:
                     LOGGER.exception(f"Failure in simulated boards: {e}")
 
+            if (
+                charge_interval_ns is not None
+                and g.stalls.since_last_step_ns() >= charge_interval_ns
+            ):
+                # The usercode is busy, advance the simulation on its behalf
+                with TRACER.span('charge compute', 'server'):
+                    g.sleep(g.timestep / 1000)
+                self.charged_steps += 1
+
+            self.busy_ns += time.perf_counter_ns() - select_end
+
         LOGGER.info('Stopping server')
         for device in self.devices:
             device.close()
 
+        g.stalls.write()
+        if self.metrics_path is not None:
+            try:
+                self.metrics_path.write_text(json.dumps(self.metrics_summary(), indent=4))
+            except OSError as e:
+                LOGGER.warning(f'Failed to write device metrics: {e}')
+
         if self.stop_event.is_set() and self.completed is False:
             # Stop the usercode
             os.kill(os.getpid(), signal.SIGINT)
 
+    def _charge_interval_ns(self) -> float | None:
+        """
+        Get the wall-clock time the usercode may compute for before being charged a step.
+
+        Returns None if compute is not being charged or the robot has not started.
+        """
+        if self.compute_time_scale is None or g.sensors.custom_data() != 'start':
+            return None
+        return g.timestep * 1e6 / self.compute_time_scale
+
+    def metrics_summary(self) -> dict[str, Any]:
+        """
+        Return a summary of the metrics recorded for all devices.
+
+        Command metrics are grouped by board asset tag and command verb.
+        """
+        return {
+            'select_calls': self.select_calls,
+            'select_wait_ms': self.select_wait_ns / 1e6,
+            'busy_ms': self.busy_ns / 1e6,
+            'charged_steps': self.charged_steps,
+            'between_steps': g.stalls.summary(),
+            'boards': {
+                device.asset_tag: {
+                    'board_type': device.board_type,
+                    'commands': {
+                        verb: stats.summary()
+                        for verb, stats in sorted(device.stats.items())
+                    },
+                }
+                for device in self.devices
+            },
+        }
+
     def links(self) -> dict[str, dict[str, str]]:
         """Return a mapping of asset tags to ports, grouped by board type."""
         return {
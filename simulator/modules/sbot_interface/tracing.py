@@ -0,0 +1,144 @@
+"""
+An opt-in tracer for recording a timeline of the controller's activity.
+
+Spans are recorded into a ring buffer so long matches only keep the most recent
+events, and can be exported in the Chrome trace event format to be viewed in
+chrome://tracing or Perfetto.
+
+Tracing is disabled by default, in which case starting a span costs a single
+attribute check.
+"""
+from __future__ import annotations
+
+import json
+import os
+import threading
+import time
+from collections import deque
+from contextlib import nullcontext
+from pathlib import Path
+from types import TracebackType
+from typing import Any, ContextManager, NamedTuple
+
+DEFAULT_CAPACITY = 100_000
+
+_NULL_SPAN: ContextManager[None] = nullcontext()
+
+
+class TraceEvent(NamedTuple):
+    """A completed span."""
+
+    name: str
+    category: str
+    start_ns: int
+    duration_ns: int
+    thread_id: int
+    args: dict[str, Any] | None
+
+
+class _Span:
+    def __init__(self, tracer: Tracer, name: str, category: str, args: dict[str, Any]):
+        self._tracer = tracer
+        self._name = name
+        self._category = category
+        self._args = args or None
+        self._start = 0
+
+    def __enter__(self) -> None:
+        self._start = time.perf_counter_ns()
+
+    def __exit__(
+        self,
+        exc_type: type[BaseException] | None,
+        exc_value: BaseException | None,
+        traceback: TracebackType | None,
+    ) -> None:
+        end = time.perf_counter_ns()
+        self._tracer.add(TraceEvent(
+            self._name,
+            self._category,
+            self._start,
+            end - self._start,
+            threading.get_ident(),
+            self._args,
+        ))
+
+
+class Tracer:
+    """
+    Records spans of activity into a ring buffer.
+
+    :param capacity: The maximum number of events to keep.
+    """
+
+    def __init__(self, capacity: int = DEFAULT_CAPACITY) -> None:
+        self.enabled = False
+        self._events: deque[TraceEvent] = deque(maxlen=capacity)
+        self._thread_names: dict[int, str] = {}
+
+    def enable(self, capacity: int | None = None) -> None:
+        """
+        Start recording spans.
+
+        :param capacity: The maximum number of events to keep, if changing it.
+        """
+        if capacity is not None:
+            self._events = deque(self._events, maxlen=capacity)
+        self.enabled = True
+
+    def span(self, name: str, category: str, **args: Any) -> ContextManager[None]:
+        """
+        Return a context manager that records a span while it is active.
+
+        :param name: The name of the span.
+        :param category: The category of the span.
+        :param args: Additional values to record with the span.
+        """
+        if not self.enabled:
+            return _NULL_SPAN
+        return _Span(self, name, category, args)
+
+    def add(self, event: TraceEvent) -> None:
+        """Add a completed span to the ring buffer."""
+        if event.thread_id not in self._thread_names:
+            self._thread_names[event.thread_id] = threading.current_thread().name
+        self._events.append(event)
+
+    def export(self, path: Path) -> None:
+        """
+        Write the recorded spans to a file in the Chrome trace event format.
+
+        :param path: The file to write the trace to.
+        """
+        pid = os.getpid()
+        trace_events: list[dict[str, Any]] = [
+            {
+                'name': 'thread_name',
+                'ph': 'M',
+                'pid': pid,
+                'tid': thread_id,
+                'args': {'name': thread_name},
+            }
+            for thread_id, thread_name in list(self._thread_names.items())
+        ]
+        for event in list(self._events):
+            trace_event = {
+                'name': event.name,
+                'cat': event.category,
+                'ph': 'X',
+                'ts': event.start_ns / 1000,
+                'dur': event.duration_ns / 1000,
+                'pid': pid,
+                'tid': event.thread_id,
+            }
+            if event.args:
+                trace_event['args'] = event.args
+            trace_events.append(trace_event)
+
+        path.write_text(json.dumps({
+            'traceEvents': trace_events,
+            'displayTimeUnit': 'ms',
+        }))
+
+
+TRACER = Tracer()
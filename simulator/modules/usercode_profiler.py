@@ -0,0 +1,116 @@
+"""
+Profile the robot's code without modifying it.
+
+Two profilers are available:
+- A deterministic profiler using cProfile, saved as a .pstats file that can be
+  loaded with the pstats module or viewers such as snakeviz.
+- A statistical profiler that periodically samples the stack of the profiled
+  thread from a background thread, saved as a .collapsed file of folded stacks
+  that can be rendered with flamegraph.pl, speedscope or inferno.
+
+The statistical profiler has a much lower overhead, so is run on its own in
+'sample' mode. In 'cprofile' mode both profilers are run.
+"""
+from __future__ import annotations
+
+import cProfile
+import sys
+import threading
+from collections import Counter
+from contextlib import contextmanager
+from pathlib import Path
+from types import FrameType
+from typing import Iterator
+
+PROFILE_MODES = ('cprofile', 'sample')
+DEFAULT_INTERVAL = 0.005
+
+
+class StackSampler:
+    """
+    Periodically sample the stack of a thread from a background thread.
+
+    :param thread_id: The ident of the thread to sample.
+    :param interval: The wall-clock time between samples in seconds.
+    """
+
+    def __init__(self, thread_id: int, interval: float = DEFAULT_INTERVAL) -> None:
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks: Counter[str] = Counter()
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    def start(self) -> None:
+        """Start sampling in a background thread."""
+        self._thread = threading.Thread(target=self._run, name='stack sampler', daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        """Stop sampling."""
+        if self._thread is None:
+            return
+        self._stop.set()
+        self._thread.join()
+        self._thread = None
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)  # noqa: SLF001
+            if frame is not None:
+                self.stacks[self._fold(frame)] += 1
+
+    @staticmethod
+    def _fold(frame: FrameType | None) -> str:
+        names = []
+        while frame is not None:
+            code = frame.f_code
+            filename = Path(code.co_filename).name
+            names.append(f'{code.co_name} ({filename}:{code.co_firstlineno})')
+            frame = frame.f_back
+        return ';'.join(reversed(names))
+
+    def write_collapsed(self, path: Path) -> None:
+        """
+        Write the sampled stacks in the collapsed stack format.
+
+        Each line is a semicolon separated stack, root first, followed by the
+        number of samples of that stack.
+        """
+        path.write_text(''.join(
+            f'{stack} {count}\n' for stack, count in self.stacks.most_common()
+        ))
+
+
+@contextmanager
+def profile_usercode(mode: str | None, output_stem: Path) -> Iterator[None]:
+    """
+    Profile the code run within the context in the current thread.
+
+    The profiles are written when the context exits, including when the code
+    raises an exception.
+
+    :param mode: The profiling mode, one of PROFILE_MODES, or None to disable profiling.
+    :param output_stem: The path, without a suffix, to write the profiles to.
+    :raises ValueError: If the mode is not recognised.
+    """
+    if mode is None:
+        yield
+        return
+    if mode not in PROFILE_MODES:
+        raise ValueError(f'Unknown profile mode {mode!r}, expected one of {PROFILE_MODES}')
+
+    sampler = StackSampler(threading.get_ident())
+    profiler = cProfile.Profile() if mode == 'cprofile' else None
+
+    sampler.start()
+    if profiler is not None:
+        profiler.enable()
+    try:
+        yield
+    finally:
+        if profiler is not None:
+            profiler.disable()
+            profiler.dump_stats(output_stem.with_suffix('.pstats'))
+        sampler.stop()
+        sampler.write_collapsed(output_stem.with_suffix('.collapsed'))
@@ -1,67 +1,398 @@
 """
-Test runner for the simulator.
+Benchmark the transports that can be used to send camera images to the usercode.
 
-Testing the performance of sending camera images over a socket.
+Each transport sends frames from a frame source to a receiver thread, which
+reassembles and decodes them. For each transport and resolution the frames per
+second, bytes per frame and CPU time per frame are reported. The bytes sent over
+the socket and the bytes copied through shared memory are reported separately.
+Only the time spent in the transport is measured, not the time to acquire each
+frame.
+
+The transports compared are:
+- tcp_bgra: Raw BGRA frames over TCP, as the CameraBoard sends them today.
+- unix_bgra: Raw BGRA frames over an AF_UNIX socket.
+- shm_ring: Raw BGRA frames written to a ring of shared memory slots, with only
+  the slot index sent over a socket.
+- tcp_gray: Frames converted to 8-bit grayscale before sending over TCP.
+- tcp_jpeg: Frames encoded as JPEG before sending over TCP, requires OpenCV.
+
+When run as a Webots controller, frames are captured from the robot's camera at
+the resolution set in the world file, so only that resolution is measured. When
+run directly, or with --synthetic, frames are generated for each of the given
+resolutions so Webots isn't required. Comparing across resolutions needs
+synthetic frames.
 """
-import os
+from __future__ import annotations
+
+import argparse
+import itertools
+import json
+import platform
+import queue
 import socket
-import sys
+import struct
 import threading
-from pprint import pprint
+import time
+from datetime import datetime
+from multiprocessing import shared_memory
+from pathlib import Path
+from typing import Any, Callable, Iterator
 
-from controller import Camera, Robot
+import numpy as np
+
+try:
+    import cv2
+except ImportError:
+    cv2 = None
 
 FRAME_TIME = 64
+DEFAULT_RESOLUTIONS = [(640, 360), (800, 450), (1280, 720), (1920, 1080)]
+SHM_SLOTS = 4
+JPEG_QUALITY = 90
+# The header used by the CameraBoard, a type byte and a 4 byte length
+HEADER = struct.Struct('>BI')
 
-robot = Robot()
 
-sys.path.insert(0, robot.getProjectPath())
-import environment  # noqa: E402
+def synthetic_frames(width: int, height: int) -> Iterator[bytes]:
+    """
+    Generate BGRA frames of a gradient with a moving block.
 
-environment.setup_environment()
+    The frames have enough structure for the compressed transports to be
+    representative, rather than being blank or random noise.
+    """
+    y, x = np.mgrid[0:height, 0:width]
+    base = np.empty((height, width, 4), dtype=np.uint8)
+    base[..., 0] = (x * 255 // max(width - 1, 1)).astype(np.uint8)
+    base[..., 1] = (y * 255 // max(height - 1, 1)).astype(np.uint8)
+    base[..., 2] = ((x + y) % 256).astype(np.uint8)
+    base[..., 3] = 255
+    block = max(height // 8, 1)
 
-print(f"{robot.getProjectPath()=}")
+    index = 0
+    while True:
+        frame = base.copy()
+        left = (index * 16) % max(width - block, 1)
+        frame[block:2 * block, left:left + block, :3] = 0
+        index += 1
+        yield frame.tobytes()
 
-print(f"""
-{os.getcwd()=}
-{environment.SIM_ROOT=}
-{environment.ZONE_ROOT=}
-{environment.MODULES_ROOT=}
-""")
 
-print("Environment variables:")
-pprint(dict(os.environ))
-print('')
-print("Path:")
-pprint(sys.path)
+def webots_frames() -> tuple[int, int, Iterator[bytes]]:
+    """Capture BGRA frames from the robot's camera, returning its resolution and the frames."""
+    from controller import Robot
 
-camera: Camera = robot.getDevice("camera")
-camera.enable(FRAME_TIME)
+    robot = Robot()
+    camera = robot.getDevice("camera")
+    camera.enable(FRAME_TIME)
 
+    def frames() -> Iterator[bytes]:
+        while robot.step(FRAME_TIME) != -1:
+            yield camera.getImage()
 
-def test_recv_setup():
-    """Set up a socket to receive data."""
-    soc = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-    soc.bind(('localhost', 0))
-    soc.listen(1)
-    return soc
+    return camera.getWidth(), camera.getHeight(), frames()
 
 
-def recv_runner(soc):
-    """Run a receiver for the socket that just accepts data."""
-    while True:
-        client = soc.accept()
-        while client[0].recv(4096):
+def recv_exact(sock: socket.socket, length: int) -> bytearray:
+    """Receive exactly the given number of bytes from a socket."""
+    data = bytearray(length)
+    view = memoryview(data)
+    received = 0
+    while received < length:
+        count = sock.recv_into(view[received:])
+        if count == 0:
+            raise ConnectionError("Socket closed")
+        received += count
+    return data
+
+
+def to_gray(frame: bytes, width: int, height: int) -> bytes:
+    """Convert a BGRA frame to 8-bit grayscale using the ITU-R BT.601 weights."""
+    pixels = np.frombuffer(frame, dtype=np.uint8).reshape(height, width, 4).astype(np.uint16)
+    gray = (pixels[..., 0] * 29 + pixels[..., 1] * 150 + pixels[..., 2] * 77) >> 8
+    return gray.astype(np.uint8).tobytes()
+
+
+def to_jpeg(frame: bytes, width: int, height: int) -> bytes:
+    """Encode a BGRA frame as a JPEG."""
+    pixels = np.frombuffer(frame, dtype=np.uint8).reshape(height, width, 4)
+    ok, encoded = cv2.imencode(
+        '.jpg', pixels[..., :3], [cv2.IMWRITE_JPEG_QUALITY, JPEG_QUALITY])
+    if not ok:
+        raise ValueError("Failed to encode frame")
+    return encoded.tobytes()
+
+
+def from_jpeg(data: bytes | bytearray) -> Any:
+    """Decode a JPEG frame."""
+    return cv2.imdecode(np.frombuffer(data, dtype=np.uint8), cv2.IMREAD_COLOR)
+
+
+def socket_pair(family: int) -> tuple[socket.socket, socket.socket]:
+    """Create a connected pair of stream sockets of the given family."""
+    if family == socket.AF_INET:
+        server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        server.bind(('localhost', 0))
+        server.listen(1)
+        sender = socket.create_connection(server.getsockname())
+        receiver, _ = server.accept()
+        server.close()
+        sender.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        return sender, receiver
+    return socket.socketpair(family, socket.SOCK_STREAM)
+
+
+class StreamTransport:
+    """
+    Send frames over a stream socket, prefixed with the CameraBoard's header.
+
+    :param family: The socket family to use.
+    :param encode: A function to encode each frame before sending, given the
+                   frame, width and height.
+    :param decode: A function to decode each frame after receiving.
+    """
+
+    def __init__(
+        self,
+        family: int,
+        encode: Callable[[bytes, int, int], bytes] | None = None,
+        decode: Callable[[bytearray], Any] | None = None,
+    ) -> None:
+        self.family = family
+        self.encode = encode
+        self.decode = decode
+
+    def open(self, width: int, height: int, done: queue.Queue[int]) -> None:
+        """Connect the sockets and start the receiver thread."""
+        self.width = width
+        self.height = height
+        self.sender, self.receiver = socket_pair(self.family)
+        self.thread = threading.Thread(target=self._receive, args=(done,), daemon=True)
+        self.thread.start()
+
+    def send(self, frame: bytes) -> tuple[int, int]:
+        """
+        Send a frame.
+
+        :return: The number of bytes sent over the socket and copied through shared memory.
+        """
+        if self.encode is not None:
+            frame = self.encode(frame, self.width, self.height)
+        self.sender.sendall(HEADER.pack(0, len(frame)) + frame)
+        return HEADER.size + len(frame), 0
+
+    def _receive(self, done: queue.Queue[int]) -> None:
+        try:
+            while True:
+                _, length = HEADER.unpack(recv_exact(self.receiver, HEADER.size))
+                data = recv_exact(self.receiver, length)
+                if self.decode is not None:
+                    self.decode(data)
+                done.put(length)
+        except (ConnectionError, OSError):
+            pass
+
+    def close(self) -> None:
+        """Close the sockets and stop the receiver thread."""
+        self.sender.close()
+        self.thread.join()
+        self.receiver.close()
+
+
+class SharedMemoryTransport:
+    """
+    Write frames to a ring of shared memory slots, sending only the slot index.
+
+    The receiver copies each frame out of its slot before acknowledging it, so
+    a slot is never overwritten while it is being read.
+    """
+
+    def open(self, width: int, height: int, done: queue.Queue[int]) -> None:
+        """Create the shared memory and start the receiver thread."""
+        self.frame_size = width * height * 4
+        self.memory = shared_memory.SharedMemory(create=True, size=self.frame_size * SHM_SLOTS)
+        self.slot = 0
+        self.sender, self.receiver = socket.socketpair()
+        self.thread = threading.Thread(target=self._receive, args=(done,), daemon=True)
+        self.thread.start()
+
+    def send(self, frame: bytes) -> tuple[int, int]:
+        """
+        Write a frame to the next slot.
+
+        :return: The number of bytes sent over the socket and copied through shared memory.
+        """
+        offset = self.slot * self.frame_size
+        self.memory.buf[offset:offset + len(frame)] = frame
+        self.sender.sendall(HEADER.pack(self.slot, len(frame)))
+        self.slot = (self.slot + 1) % SHM_SLOTS
+        return HEADER.size, len(frame)
+
+    def _receive(self, done: queue.Queue[int]) -> None:
+        try:
+            while True:
+                slot, length = HEADER.unpack(recv_exact(self.receiver, HEADER.size))
+                offset = slot * self.frame_size
+                _ = bytes(self.memory.buf[offset:offset + length])
+                done.put(length)
+        except (ConnectionError, OSError):
             pass
 
+    def close(self) -> None:
+        """Close the socket and release the shared memory."""
+        self.sender.close()
+        self.thread.join()
+        self.receiver.close()
+        self.memory.close()
+        self.memory.unlink()
+
+
+def get_transports() -> dict[str, Any]:
+    """Return the transports available on this system."""
+    transports: dict[str, Any] = {
+        'tcp_bgra': StreamTransport(socket.AF_INET),
+    }
+    if hasattr(socket, 'AF_UNIX'):
+        transports['unix_bgra'] = StreamTransport(socket.AF_UNIX)
+    else:
+        print("Skipping unix_bgra, AF_UNIX sockets are not supported")
+    transports['shm_ring'] = SharedMemoryTransport()
+    transports['tcp_gray'] = StreamTransport(socket.AF_INET, encode=to_gray)
+    if cv2 is not None:
+        transports['tcp_jpeg'] = StreamTransport(
+            socket.AF_INET, encode=to_jpeg, decode=from_jpeg)
+    else:
+        print("Skipping tcp_jpeg, OpenCV is not installed")
+    return transports
+
+
+def benchmark_transport(
+    transport: Any,
+    frames: Iterator[bytes],
+    width: int,
+    height: int,
+    num_frames: int,
+) -> dict[str, Any]:
+    """
+    Send frames over a transport one at a time, measuring only the transport.
+
+    Each frame is sent and then received before the next is sent.
+    """
+    done: queue.Queue[int] = queue.Queue()
+    transport.open(width, height, done)
+
+    wall_time = 0.0
+    cpu_time = 0.0
+    socket_bytes = 0
+    copied_bytes = 0
+    frames_sent = 0
+    try:
+        # The Webots camera stops producing frames if the simulation ends
+        for frame in itertools.islice(frames, num_frames):
+            wall_start = time.perf_counter()
+            cpu_start = time.process_time()
+            sent, copied = transport.send(frame)
+            socket_bytes += sent
+            copied_bytes += copied
+            done.get(timeout=10)
+            cpu_time += time.process_time() - cpu_start
+            wall_time += time.perf_counter() - wall_start
+            frames_sent += 1
+    finally:
+        transport.close()
+
+    if frames_sent == 0:
+        raise RuntimeError("No frames were available to send")
+
+    return {
+        'width': width,
+        'height': height,
+        'frames': frames_sent,
+        'frames_per_s': round(frames_sent / wall_time, 1),
+        'socket_bytes_per_frame': socket_bytes // frames_sent,
+        'copied_bytes_per_frame': copied_bytes // frames_sent,
+        'wall_ms_per_frame': round(wall_time * 1000 / frames_sent, 3),
+        'cpu_ms_per_frame': round(cpu_time * 1000 / frames_sent, 3),
+    }
+
+
+def parse_args() -> argparse.Namespace:
+    """Parse command line arguments."""
+    parser = argparse.ArgumentParser(description="Benchmark camera image transports.")
+    parser.add_argument(
+        '--synthetic',
+        action='store_true',
+        help="Use generated frames rather than a Webots camera.",
+    )
+    parser.add_argument(
+        '--resolution',
+        type=int,
+        nargs=2,
+        action='append',
+        metavar=('width', 'height'),
+        dest='resolutions',
+        help="A resolution to generate synthetic frames at, can be given multiple times.",
+    )
+    parser.add_argument(
+        '--frames',
+        type=int,
+        default=100,
+        help="The number of frames to send over each transport.",
+    )
+    parser.add_argument(
+        '--output',
+        type=Path,
+        help="The file to save the results to as JSON.",
+    )
+    return parser.parse_args()
+
+
+def main() -> None:
+    """Run the camera transport benchmark."""
+    args = parse_args()
+
+    sources: list[tuple[int, int, Callable[[], Iterator[bytes]]]] = []
+    try:
+        if args.synthetic:
+            raise ImportError
+        width, height, webots_source = webots_frames()
+        sources.append((width, height, lambda: webots_source))
+        source_name = 'webots'
+        print(
+            f"Measuring the camera's resolution of {width}x{height} from the world file, "
+            "use --synthetic to compare resolutions"
+        )
+    except ImportError:
+        source_name = 'synthetic'
+        for width, height in args.resolutions or DEFAULT_RESOLUTIONS:
+            sources.append((
+                width,
+                height,
+                lambda width=width, height=height: synthetic_frames(width, height),
+            ))
+
+    results: dict[str, list[dict[str, Any]]] = {}
+    for name, transport in get_transports().items():
+        for width, height, frames in sources:
+            result = benchmark_transport(
+                transport, frames(), width, height, args.frames)
+            results.setdefault(name, []).append(result)
+            print(
+                f"{name:>10} {width}x{height}: {result['frames_per_s']} frames/s, "
+                f"{result['socket_bytes_per_frame']} socket bytes/frame, "
+                f"{result['copied_bytes_per_frame']} shared memory bytes/frame, "
+                f"{result['cpu_ms_per_frame']}ms CPU/frame"
+            )
+
+    if args.output is not None:
+        args.output.write_text(json.dumps({
+            'timestamp': datetime.now().isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'platform': f'{platform.system()}-{platform.machine()}',
+            'source': source_name,
+            'results': results,
+        }, indent=4))
+        print(f"Saved results to {args.output}")
 
-srv_soc = test_recv_setup()
-srv_port = srv_soc.getsockname()[1]
-threading.Thread(target=recv_runner, args=(srv_soc,)).start()
 
-soc = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-soc.connect(("localhost", srv_port))
-while robot.step(FRAME_TIME) != -1:
-    image = camera.getImage()
-    soc.sendall(bytes(len(image)))
-    soc.sendall(image)
+if __name__ == '__main__':
+    main()